@@ -1,5 +1,6 @@
 const express = require('express');
-const { spawn } = require('child_process');
+const http = require('http');
+const https = require('https');
 const bodyParser = require('body-parser');
 const cors = require('cors');
 const path = require('path');
@@ -7,6 +8,42 @@ const path = require('path');
 const app = express();
 const PORT = process.env.PORT || 5000;
 
+// Long-lived Python query service (src/query_service.py); connections to it are kept alive
+const QUERY_SERVICE_URL = new URL('/api/query', process.env.QUERY_SERVICE_URL || 'http://127.0.0.1:8000');
+const QUERY_SERVICE_TIMEOUT_MS = Number(process.env.QUERY_SERVICE_TIMEOUT_MS || 120000);
+const queryServiceClient = QUERY_SERVICE_URL.protocol === 'https:' ? https : http;
+const queryServiceAgent = new queryServiceClient.Agent({
+  keepAlive: true,
+  maxSockets: Number(process.env.QUERY_SERVICE_MAX_SOCKETS || 32),
+});
+
+// POST a query to the query service; resolves with its HTTP status and JSON body
+function askQueryService(query) {
+  return new Promise((resolve, reject) => {
+    const body = JSON.stringify({ query });
+    const request = queryServiceClient.request(QUERY_SERVICE_URL, {
+      method: 'POST',
+      agent: queryServiceAgent,
+      timeout: QUERY_SERVICE_TIMEOUT_MS,
+      headers: { 'Content-Type': 'application/json', 'Content-Length': Buffer.byteLength(body) },
+    }, (response) => {
+      let data = '';
+      response.setEncoding('utf8');
+      response.on('data', (chunk) => { data += chunk; });
+      response.on('end', () => {
+        try {
+          resolve({ status: response.statusCode, payload: JSON.parse(data) });
+        } catch (e) {
+          reject(new Error(`Invalid response from query service: ${data.slice(0, 200)}`));
+        }
+      });
+    });
+    request.on('timeout', () => request.destroy(new Error('Query service timed out')));
+    request.on('error', reject);
+    request.end(body);
+  });
+}
+
 // Middleware
 app.use(cors());
 app.use(bodyParser.json());
@@ -15,54 +52,24 @@ app.use(bodyParser.json());
 app.use(express.static(path.join(__dirname, 'build')));
 
 // Chat API endpoint
-app.post('/api/chat', (req, res) => {
+app.post('/api/chat', async (req, res) => {
   const { query } = req.body;
   
   if (!query) {
     return res.status(400).json({ error: 'No query content provided' });
   }
 
-  // Set environment variable for query passing
-  const env = { ...process.env };
-  env.TEST_QUERY = query;
-
-  // Run Python script
-  const pythonProcess = spawn('python', [
-    path.join(__dirname, 'src/rag.py')
-  ], { env });
-
-  let result = '';
-  let error = '';
-
-  // Collect data
-  pythonProcess.stdout.on('data', (data) => {
-    result += data.toString();
-  });
-
-  pythonProcess.stderr.on('data', (data) => {
-    error += data.toString();
-  });
-
-  // When script is finished
-  pythonProcess.on('close', (code) => {
-    if (code !== 0) {
-      console.error(`Python script exited with error code ${code}`);
-      console.error(`Error: ${error}`);
-      return res.status(500).json({ error: 'Failed to process query' });
+  try {
+    const { status, payload } = await askQueryService(query);
+    if (status !== 200) {
+      console.error(`Query service responded with ${status}: ${payload.error}`);
+      return res.status(status === 400 ? 400 : 502).json({ error: payload.error || 'Failed to process query' });
     }
-    
-    // Try to extract answer part
-    try {
-      // Find content after "Answer from GPT-4o:"
-      const answerMatch = result.match(/Answer from GPT-4o:\s*\n\s*([\s\S]*)/);
-      const answer = answerMatch ? answerMatch[1].trim() : result.trim();
-      
-      res.json({ answer });
-    } catch (e) {
-      console.error('Error parsing Python script output:', e);
-      res.json({ answer: result.trim() });
-    }
-  });
+    res.json({ answer: payload.answer });
+  } catch (e) {
+    console.error('Error calling query service:', e.message);
+    res.status(502).json({ error: 'Failed to process query' });
+  }
 });
 
 // All other GET requests return React application
@@ -1,9 +1,16 @@
-from flask import Flask, request
+from flask import Flask, Response, request
 from src.data_pipeline.process_pdf import main as process_pdf_main  # Import your process_pdf_main function
+from src.data_pipeline.metrics import get_metrics
+from src.data_pipeline.embed_models import get_model_registry
+import os
 
 
 app = Flask(__name__)
 
+# Load the embedding model once at server start, so no request pays for it
+if os.getenv("EMBEDDING_PRELOAD", "1") == "1":
+    get_model_registry().warmup()
+
 @app.route("/", methods=["POST"])
 def main(request):
     """Cloud Function entry point to trigger the PDF processing."""
@@ -32,8 +39,19 @@ def main(request):
         print(f"Error: {str(e)}")  # Log the error for debugging.
         return f"Error: {str(e)}", 500
 
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Per-stage ingestion latencies and counters in the Prometheus text format."""
+    if request.args.get("format") == "json":
+        return get_metrics().to_dict(), 200
+    return Response(get_metrics().to_prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/models", methods=["GET"])
+def models():
+    """Embedding models loaded in this process, with their load time and resident memory."""
+    return get_model_registry().stats(), 200
+
 if __name__ == "__main__":
     # Ensure the app listens on the port specified by the PORT environment variable.
-    import os
     port = int(os.environ.get("PORT", 8080))
     app.run(host="0.0.0.0", port=port)
\ No newline at end of file
@@ -6,9 +6,12 @@ extracting text, chunking content, creating embeddings, and building
 a knowledge base for retrieval-augmented generation (RAG) applications.
 """ 
 
-from .embed import generate_embedding_vector
+from .embed import generate_embedding_batch, generate_embedding_vector
+from .embedding_batch import EmbeddingBatch
 from .embed_models import EmbeddingModel, all_minilm_l6_v2
-from .chunks import generate_chunks
-from .utils import upload_json_to_gcs, initialize_pinecone, upload_pinecone
+from .chunks import ChunkRecord, generate_chunk_records, generate_chunks
+from .utils import upload_json_to_gcs, initialize_pinecone, upload_pinecone, get_pinecone_index
+from .vector_writer import BatchedVectorWriter
+from .metrics import get_metrics
 from .utils import setup_logger
 from .models import BlockData
\ No newline at end of file
@@ -0,0 +1,107 @@
+"""
+Memory and throughput benchmark for chunk metadata.
+
+Chunks a large synthetic PDF (500 pages by default, or the PDF given with
+--file) two ways:
+
+- dicts: the previous call pattern, converting every BlockData with .dict()
+  and building a metadata dictionary per chunk (generate_chunks)
+- records: chunking the BlockData objects directly into slotted ChunkRecords
+  (generate_chunk_records), as the pipeline now does
+
+and reports the best-of-repeat chunking time, the peak memory allocated
+while chunking and the memory retained by the result, measured with
+tracemalloc. A second table chunks a single heading with an increasing
+number of child paragraphs to show that parent/child linking stays linear.
+
+Usage:
+    python -m src.data_pipeline.benchmarks.chunk_metadata --pages 500
+    python -m src.data_pipeline.benchmarks.chunk_metadata --file data/uscis_pdf/i-485instr.pdf
+"""
+import argparse
+import gc
+import logging
+import os
+import time
+import tracemalloc
+from typing import Any, Callable, List, Tuple
+
+from src.data_pipeline.benchmarks.corpus import make_synthetic_pdf
+from src.data_pipeline.chunks import generate_chunk_records, generate_chunks
+from src.data_pipeline.models import BlockData
+from src.data_pipeline.process_pdf import parse_pdf_document
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Tuple[float, float, float, int]:
+    """
+    Run fn repeatedly and measure it.
+
+    Returns:
+        Best seconds, peak MB allocated during one run, MB retained by its
+        result and the number of chunks it produced
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    result = fn()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = len(result[1]) if isinstance(result, tuple) else len(result)
+    return best, (peak - baseline) / 1e6, (retained - baseline) / 1e6, count
+
+
+def wide_section(children: int) -> List[BlockData]:
+    """One heading followed by the given number of child paragraphs."""
+    blocks = [BlockData(id="heading", page=1, bbox=[0, 0, 1, 1], text="Eligibility Requirements", type="heading")]
+    blocks.extend(BlockData(id=f"p{i}", page=1 + i // 40, bbox=[0, 0, 1, 1], parent="heading",
+                            text="You must be physically present in the United States.", type="paragraph")
+                  for i in range(children))
+    return blocks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", default="", help="PDF file to chunk instead of the synthetic PDF")
+    parser.add_argument("--pages", type=int, default=500, help="Pages of the synthetic PDF")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions (best is reported)")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--chunk-overlap", type=int, default=25)
+    args = parser.parse_args()
+    # Measure chunking alone, in chunking tokens, without log formatting
+    os.environ["CHUNK_BUDGET"] = "tokens"
+    logging.getLogger("src.data_pipeline.chunks").setLevel(logging.ERROR)
+
+    if args.file:
+        with open(args.file, "rb") as f:
+            pdf_data = f.read()
+    else:
+        pdf_data = make_synthetic_pdf(args.pages)
+    blocks = parse_pdf_document(pdf_data).blocks
+    print(f"{len(blocks)} blocks")
+
+    variants = {
+        "dicts": lambda: generate_chunks([block.dict() for block in blocks], args.chunk_size, "benchmark.pdf",
+                                         args.chunk_overlap),
+        "records": lambda: generate_chunk_records(blocks, args.chunk_size, "benchmark.pdf", args.chunk_overlap),
+    }
+    print(f"{'metadata':<10}{'chunks':>8}{'seconds':>9}{'chunks/s':>10}{'peak MB':>9}{'retained MB':>13}")
+    for name, fn in variants.items():
+        seconds, peak, retained, count = measure(fn, args.repeat)
+        print(f"{name:<10}{count:>8}{seconds:>9.3f}{count / seconds:>10.0f}{peak:>9.1f}{retained:>13.1f}")
+
+    print(f"\n{'children':>10}{'seconds':>9}{'us/child':>10}")
+    for children in (1000, 4000, 16000):
+        section = wide_section(children)
+        seconds, _, _, _ = measure(lambda: generate_chunk_records(section, args.chunk_size, "benchmark.pdf",
+                                                                  args.chunk_overlap), 1)
+        print(f"{children:>10}{seconds:>9.3f}{seconds / children * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
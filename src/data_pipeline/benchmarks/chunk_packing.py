@@ -0,0 +1,60 @@
+"""
+Report on chunk counts and fill with and without hierarchy packing.
+
+Chunks every document of a synthetic USCIS-like corpus (or the PDFs given
+with --files) with CHUNK_PACKING=none and =hierarchy and prints the number
+of chunks (= vectors) per document, the mean tokens per chunk, how full the
+chunks are relative to chunk_size, and the chunking time.
+
+Usage:
+    python -m src.data_pipeline.benchmarks.chunk_packing --chunk-size 256
+"""
+import argparse
+import statistics
+import time
+from typing import List
+
+from src.data_pipeline.benchmarks.corpus import make_synthetic_corpus
+from src.data_pipeline.chunks import generate_chunks
+from src.data_pipeline.process_pdf import parse_pdf_document
+from src.data_pipeline.tokenizer import span_tokenize
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", nargs="*", default=[], help="PDF files to chunk instead of the synthetic corpus")
+    parser.add_argument("--documents", type=int, default=6)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--chunk-overlap", type=int, default=25)
+    args = parser.parse_args()
+
+    if args.files:
+        corpus: List[bytes] = []
+        for path in args.files:
+            with open(path, "rb") as f:
+                corpus.append(f.read())
+    else:
+        corpus = make_synthetic_corpus(args.documents, args.pages)
+    documents = [[block.dict() for block in parse_pdf_document(pdf_data).blocks] for pdf_data in corpus]
+    print(f"{len(documents)} documents, {sum(len(blocks) for blocks in documents)} blocks")
+
+    print(f"{'packing':<12}{'chunks/doc':>12}{'tokens/chunk':>14}{'fill':>8}{'chunk ms/doc':>14}")
+    for packing in ("none", "hierarchy"):
+        counts: List[int] = []
+        tokens: List[int] = []
+        start = time.perf_counter()
+        for index, blocks in enumerate(documents):
+            # generate_chunks fills in children and may re-link parents, so give it fresh copies
+            _, metadata = generate_chunks([dict(block) for block in blocks], args.chunk_size,
+                                          f"doc{index}.pdf", args.chunk_overlap, packing=packing)
+            counts.append(len(metadata))
+            tokens.extend(len(span_tokenize(meta["raw_text"])) for meta in metadata)
+        elapsed = time.perf_counter() - start
+        mean_tokens = statistics.mean(tokens) if tokens else 0.0
+        print(f"{packing:<12}{statistics.mean(counts):>12.1f}{mean_tokens:>14.1f}"
+              f"{mean_tokens / args.chunk_size:>8.0%}{elapsed / len(documents) * 1000:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Synthetic USCIS-like corpus for offline benchmarks.
+
+Generates multi-page PDFs laid out like USCIS form instructions (upper-case
+section headings, title-case subheadings and paragraphs) so that layout
+extraction, classification and chunking see realistic block structure, and
+structured JSON documents shaped like the uscis_html and reddit_post output
+of src/data_ingestion/scripts/raw_to_structured.py.
+"""
+import json
+import random
+from typing import Dict, List
+
+import fitz  # pymupdf
+
+SECTION_TITLES = [
+    "GENERAL INSTRUCTIONS", "WHO MAY FILE", "FILING FEE", "BIOMETRIC SERVICES APPOINTMENT",
+    "EVIDENCE", "SIGNATURE", "PENALTIES", "PRIVACY ACT NOTICE", "PAPERWORK REDUCTION ACT",
+    "WHERE TO FILE", "PROCESSING INFORMATION", "SPECIFIC INSTRUCTIONS",
+]
+
+SUBSECTION_TITLES = [
+    "Information About You", "Mailing Address", "Employment Authorization", "Travel Document",
+    "Translations", "Copies", "Interpreter's Contact Information", "Preparer's Statement",
+]
+
+WORDS = (
+    "you must submit form I-765 with the required evidence and the correct filing fee "
+    "USCIS may request additional documentation or schedule a biometrics appointment "
+    "if you fail to submit required documents your application may be denied "
+    "each applicant must sign the form and include a copy of their Form I-94 "
+    "see www.uscis.gov/fees for the current fee of $410 payable to the Department "
+    "of Homeland Security the information you provide is used to determine eligibility"
+).split()
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+MARGIN = 54
+LINE_HEIGHT = 13
+
+
+def make_paragraph(rng: random.Random, min_words: int = 20, max_words: int = 120) -> str:
+    """Return a random sentence-cased paragraph built from USCIS-like vocabulary."""
+    words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+    return " ".join(words).capitalize() + "."
+
+
+def make_synthetic_pdf(pages: int, seed: int = 0) -> bytes:
+    """
+    Generate a synthetic USCIS-like instructions PDF.
+
+    Args:
+        pages: Number of pages
+        seed: Random seed, so the same arguments always produce the same document
+
+    Returns:
+        The PDF file as bytes
+    """
+    rng = random.Random(seed)
+    document = fitz.open()
+    for _ in range(pages):
+        page = document.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        y = MARGIN
+        while y < PAGE_HEIGHT - 4 * MARGIN:
+            roll = rng.random()
+            if roll < 0.12:
+                text, fontsize = rng.choice(SECTION_TITLES), 12
+            elif roll < 0.3:
+                text, fontsize = rng.choice(SUBSECTION_TITLES), 11
+            else:
+                text, fontsize = make_paragraph(rng), 9
+            rect = fitz.Rect(MARGIN, y, PAGE_WIDTH - MARGIN, PAGE_HEIGHT - MARGIN)
+            # insert_textbox returns the unused height, or a negative value if the text did not fit
+            remaining = page.insert_textbox(rect, text, fontsize=fontsize)
+            if remaining < 0:
+                break
+            y = PAGE_HEIGHT - MARGIN - remaining + LINE_HEIGHT
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+def make_synthetic_corpus(documents: int, pages_per_document: int, seed: int = 0) -> List[bytes]:
+    """
+    Generate several synthetic PDFs with different content.
+
+    Args:
+        documents: Number of documents
+        pages_per_document: Number of pages per document
+        seed: Base random seed
+
+    Returns:
+        List of PDF files as bytes
+    """
+    return [make_synthetic_pdf(pages_per_document, seed=seed + i) for i in range(documents)]
+
+
+def make_synthetic_json_document(source: str, seed: int = 0) -> bytes:
+    """
+    Generate a structured JSON document like those uploaded under structured_data/.
+
+    Args:
+        source: "uscis_html" or "reddit_post"
+        seed: Random seed, so the same arguments always produce the same document
+
+    Returns:
+        The JSON file as UTF-8 bytes
+    """
+    rng = random.Random(seed)
+    content = " ".join(make_paragraph(rng) for _ in range(rng.randint(2, 12)))
+    if source == "reddit_post":
+        doc = {
+            "source": source,
+            "post_id": f"p{seed}",
+            "score_rank": "top_all",
+            "content": content,
+            "metadata": {"post_id": f"p{seed}", "subreddit": "USCIS", "score": rng.randint(0, 500),
+                         "num_comments": rng.randint(0, 80), "retrieval_method": "top"},
+        }
+    else:
+        doc = {
+            "source": source,
+            "title": rng.choice(SUBSECTION_TITLES),
+            "url": f"https://www.uscis.gov/synthetic/{seed}",
+            "content": content,
+            "metadata": {"category": rng.choice(SECTION_TITLES).title()},
+        }
+    doc["cleaned"] = True
+    return json.dumps(doc, indent=2).encode("utf-8")
+
+
+def make_synthetic_bucket_objects(pdfs: int, pages_per_pdf: int, html_docs: int, reddit_posts: int,
+                                  seed: int = 0) -> Dict[str, bytes]:
+    """
+    Generate a mixed corpus laid out like the ingestion bucket.
+
+    Args:
+        pdfs: Number of PDF documents
+        pages_per_pdf: Number of pages per PDF
+        html_docs: Number of uscis_html JSON documents
+        reddit_posts: Number of reddit_post JSON documents
+        seed: Base random seed
+
+    Returns:
+        Mapping of blob name (structured_data/<source>/...) to content
+    """
+    objects: Dict[str, bytes] = {}
+    for i in range(pdfs):
+        objects[f"structured_data/uscis_pdf/form-{i:04d}.pdf"] = make_synthetic_pdf(pages_per_pdf, seed=seed + i)
+    for i in range(html_docs):
+        objects[f"structured_data/uscis_html/page-{i:04d}.json"] = make_synthetic_json_document(
+            "uscis_html", seed=seed + i)
+    for i in range(reddit_posts):
+        objects[f"structured_data/reddit_post/post-{i:04d}.json"] = make_synthetic_json_document(
+            "reddit_post", seed=seed + i)
+    return objects
+
+
+BOILERPLATE = [
+    ("FILING FEE", "The filing fee for this form is $410. Pay the fee with a check or money order drawn on "
+                   "a bank located in the United States and made payable to the U.S. Department of Homeland "
+                   "Security. Do not use the initials DHS or USDHS. The fee is non-refundable regardless of "
+                   "any action USCIS takes on your application."),
+    ("BIOMETRIC SERVICES APPOINTMENT", "After you file, USCIS may require you to appear at an Application "
+                   "Support Center to provide fingerprints, photographs and a signature. USCIS will send you "
+                   "a written notice with the date, time and location of your appointment. If you fail to "
+                   "attend, USCIS may deny your application."),
+    ("SIGNATURE", "Each application must be properly signed and filed. A stamped or typewritten name in "
+                  "place of a signature is not acceptable. If you are under 14 years of age, your parent or "
+                  "legal guardian may sign the application on your behalf."),
+    ("PENALTIES", "If you knowingly and willfully falsify or conceal a material fact or submit a false "
+                  "document with this request, USCIS will deny the request and may deny any other immigration "
+                  "benefit. In addition, you will face severe penalties provided by law and may be subject "
+                  "to criminal prosecution."),
+    ("PRIVACY ACT NOTICE", "We ask for the information on this form, and associated evidence, to determine "
+                           "if you have established eligibility for the immigration benefit for which you "
+                           "are filing. Our legal right to ask for this information can be found in the "
+                           "Immigration and Nationality Act, as amended."),
+]
+
+
+def make_boilerplate_pdf(pages: int, seed: int = 0, shared: float = 0.5, variants: float = 0.3) -> bytes:
+    """
+    Generate a synthetic instructions PDF that repeats standard USCIS boilerplate.
+
+    Each section is either one of the BOILERPLATE sections shared by every
+    form or a random section unique to this document. Shared sections are
+    laid out with different widths, so their line breaks differ, and some
+    get a small wording change, as they do across real form instructions.
+
+    Args:
+        pages: Number of pages
+        seed: Random seed, so the same arguments always produce the same document
+        shared: Fraction of sections taken from BOILERPLATE
+        variants: Fraction of shared sections whose wording is slightly changed
+
+    Returns:
+        The PDF file as bytes
+    """
+    rng = random.Random(seed)
+    document = fitz.open()
+    for _ in range(pages):
+        page = document.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        y = MARGIN
+        while y < PAGE_HEIGHT - 4 * MARGIN:
+            if rng.random() < shared:
+                title, text = rng.choice(BOILERPLATE)
+                if rng.random() < variants:
+                    words = text.split()
+                    position = rng.randrange(len(words))
+                    words[position] = rng.choice(["also", "the", "your", "this", "any"])
+                    text = " ".join(words)
+                right = PAGE_WIDTH - MARGIN - rng.choice([0, 40, 90])
+            else:
+                title, text = rng.choice(SUBSECTION_TITLES), make_paragraph(rng)
+                right = PAGE_WIDTH - MARGIN
+            for block, fontsize in ((title, 12), (text, 9)):
+                rect = fitz.Rect(MARGIN, y, right, PAGE_HEIGHT - MARGIN)
+                remaining = page.insert_textbox(rect, block, fontsize=fontsize)
+                if remaining < 0:
+                    break
+                y = PAGE_HEIGHT - MARGIN - remaining + LINE_HEIGHT
+            else:
+                continue
+            break
+    data = document.tobytes()
+    document.close()
+    return data
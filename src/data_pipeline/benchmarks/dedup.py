@@ -0,0 +1,101 @@
+"""
+Duplicate-rate benchmark for corpus-wide chunk deduplication.
+
+Generates a corpus of synthetic instruction PDFs that repeat the standard
+USCIS boilerplate (fee, biometrics, signature, penalties and privacy
+sections) with varying line breaks and small wording changes, chunks every
+document and runs the chunks through a ChunkDeduplicator as the embed stage
+does. Reports how many chunks would be embedded without and with
+deduplication, split into exact and near-duplicates, the time spent per
+chunk and the lowest true shingle similarity among the near-duplicates that
+were merged, as a check on the MinHash estimate.
+
+Usage:
+    python -m src.data_pipeline.benchmarks.dedup --documents 50 --pages 4
+    python -m src.data_pipeline.benchmarks.dedup --threshold 0.9 --shared 0.3
+"""
+import argparse
+import os
+import time
+from typing import Dict, List, Set
+
+from src.data_pipeline.benchmarks import setup_benchmark
+from src.data_pipeline.benchmarks.corpus import make_boilerplate_pdf
+from src.data_pipeline.chunks import ChunkRecord, generate_chunk_records
+from src.data_pipeline.dedup import ChunkDeduplicator, content_key, normalize_text
+from src.data_pipeline.process_pdf import parse_pdf_document
+
+
+def shingles(text: str, size: int) -> Set[str]:
+    """Word shingles of a chunk, as MinHasher builds them."""
+    words = normalize_text(text).split(" ")
+    return {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=50, help="Documents in the corpus")
+    parser.add_argument("--pages", type=int, default=4, help="Pages per document")
+    parser.add_argument("--shared", type=float, default=0.5, help="Fraction of sections that are boilerplate")
+    parser.add_argument("--variants", type=float, default=0.3,
+                        help="Fraction of boilerplate sections with a changed word")
+    parser.add_argument("--threshold", type=float, default=None, help="CHUNK_DEDUP_THRESHOLD")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--chunk-overlap", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    setup_benchmark()
+    os.environ["CHUNK_BUDGET"] = "tokens"
+
+    documents: Dict[str, List[ChunkRecord]] = {}
+    for i in range(args.documents):
+        pdf_data = make_boilerplate_pdf(args.pages, seed=args.seed + i, shared=args.shared, variants=args.variants)
+        name = f"structured_data/uscis_pdf/form-{i:04d}.pdf"
+        documents[name] = generate_chunk_records(parse_pdf_document(pdf_data).blocks, args.chunk_size, name,
+                                                 args.chunk_overlap)
+
+    deduplicator = ChunkDeduplicator(threshold=args.threshold)
+    texts: Dict[str, str] = {}
+    seen_keys: Set[str] = set()
+    total = embedded = exact = 0
+    min_similarity = 1.0
+    seconds = 0.0
+    for name, records in documents.items():
+        keys = [content_key(normalize_text(record.raw_text)) for record in records]
+        start = time.perf_counter()
+        session = deduplicator.start(name)
+        kept = session.filter(records)
+        session.commit()
+        seconds += time.perf_counter() - start
+
+        kept_ids = {id(record) for record in kept}
+        total += len(records)
+        embedded += len(kept)
+        for record, key in zip(records, keys):
+            if id(record) in kept_ids:
+                texts[record.id] = record.raw_text
+            elif key in seen_keys:
+                exact += 1
+            else:
+                # A near-duplicate: compare it with the canonical chunk it was merged into
+                canonical = texts[next(iter(session.aliases[record.id]))]
+                a, b = shingles(record.raw_text, 3), shingles(canonical, 3)
+                min_similarity = min(min_similarity, len(a & b) / len(a | b))
+            seen_keys.add(key)
+
+    duplicates = total - embedded
+    print(f"{args.documents} documents, {total} chunks, threshold {deduplicator.threshold:g}")
+    print(f"{'embedded without dedup':<28}{total:>8}")
+    print(f"{'embedded with dedup':<28}{embedded:>8}")
+    print(f"{'exact duplicates':<28}{exact:>8}")
+    print(f"{'near-duplicates':<28}{duplicates - exact:>8}")
+    print(f"{'duplicate rate':<28}{duplicates / max(1, total):>8.1%}")
+    print(f"{'dedup us/chunk':<28}{seconds / max(1, total) * 1e6:>8.1f}")
+    if duplicates > exact:
+        print(f"{'min near-dup similarity':<28}{min_similarity:>8.2f}")
+    widest = max((len(deduplicator.documents_for(vector_id)), vector_id) for vector_id in texts)
+    print(f"most shared chunk: {widest[0]} documents, {texts[widest[1]][:60]!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark for cross-document embedding batching.
+
+Embeds a mix of short (Reddit/HTML-like) and long (PDF-like) documents from
+several worker threads, once with per-document encode calls and once through
+a shared EmbeddingBatcher, and reports chunks/sec for each.
+
+Usage:
+    python -m src.data_pipeline.benchmarks.embed_batching --documents 200 --workers 5
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List
+
+from src.data_pipeline.benchmarks.corpus import make_paragraph
+from src.data_pipeline.embed_batcher import EmbeddingBatcher
+from src.data_pipeline.embed_models import all_minilm_l6_v2
+
+
+def make_documents(count: int, seed: int = 0) -> List[List[str]]:
+    """Build documents as lists of chunk texts: mostly short single-chunk docs, some long PDFs."""
+    rng = random.Random(seed)
+    documents = []
+    for _ in range(count):
+        if rng.random() < 0.7:
+            documents.append([make_paragraph(rng, 10, 60) for _ in range(rng.randint(1, 3))])
+        else:
+            documents.append([make_paragraph(rng, 5, 180) for _ in range(rng.randint(20, 60))])
+    return documents
+
+
+def run(model: Any, documents: List[List[str]], workers: int) -> float:
+    """Encode every document from a thread pool and return the elapsed seconds."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(model.encode, documents))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=200, help="Number of synthetic documents")
+    parser.add_argument("--workers", type=int, default=5, help="Ingestion worker threads")
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-batch-tokens", type=int, default=8192)
+    args = parser.parse_args()
+
+    documents = make_documents(args.documents)
+    total_chunks = sum(len(document) for document in documents)
+
+    model = all_minilm_l6_v2()
+    model.encode(["warm up the model"])
+
+    per_document = run(model, documents, args.workers)
+    with EmbeddingBatcher(model, max_batch_size=args.max_batch_size,
+                          max_batch_tokens=args.max_batch_tokens) as batcher:
+        batched = run(batcher, documents, args.workers)
+
+    print(f"{args.documents} documents, {total_chunks} chunks, {args.workers} workers")
+    print(f"{'mode':<14}{'seconds':>10}{'chunks/sec':>12}")
+    print(f"{'per-document':<14}{per_document:>10.2f}{total_chunks / per_document:>12.1f}")
+    print(f"{'batched':<14}{batched:>10.2f}{total_chunks / batched:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark for the multi-process embedding pool.
+
+Embeds the document mix of the embed_batching benchmark from several worker
+threads, once with all threads sharing one in-process model and once through
+an EmbeddingPool, checks that both produce the same embeddings, and reports
+chunks/sec for each. The fake backend hashes words in pure Python, so it
+holds the GIL the way tokenization and pooling do and shows the contention
+without model weights.
+
+Usage:
+    python -m src.data_pipeline.benchmarks.embed_pool --documents 200 --workers 5 --pool-workers 4
+    python -m src.data_pipeline.benchmarks.embed_pool --backend onnx --pool-threads 2
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Tuple
+
+import numpy as np
+
+from src.data_pipeline.benchmarks import setup_benchmark
+from src.data_pipeline.benchmarks.embed_batching import make_documents
+from src.data_pipeline.embed_models.factory import get_embedding_model
+from src.data_pipeline.embed_pool import EmbeddingPool, available_cores
+from src.data_pipeline.fakes import FakeEmbeddingModel
+
+
+def run(model: Any, documents: List[List[str]], workers: int) -> Tuple[float, List[np.ndarray]]:
+    """Encode every document from a thread pool and return the elapsed seconds and embeddings."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        embeddings = list(executor.map(model.encode, documents))
+    return time.perf_counter() - start, embeddings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=200, help="Number of synthetic documents")
+    parser.add_argument("--workers", type=int, default=5, help="Ingestion worker threads")
+    parser.add_argument("--backend", choices=["fake", "torch", "onnx"], default="fake")
+    parser.add_argument("--pool-workers", type=int, default=0, help="Worker processes, 0 for EMBED_POOL_WORKERS")
+    parser.add_argument("--pool-threads", type=int, default=0, help="Threads per worker, 0 for EMBED_POOL_THREADS")
+    parser.add_argument("--pool-batch-size", type=int, default=0, help="Texts per worker call, 0 for the default")
+    args = parser.parse_args()
+    setup_benchmark()
+
+    documents = make_documents(args.documents)
+    total_chunks = sum(len(document) for document in documents)
+    model = FakeEmbeddingModel() if args.backend == "fake" else get_embedding_model(args.backend)
+    model.encode(["warm up the model"])
+
+    shared, expected = run(model, documents, args.workers)
+    with EmbeddingPool(model, workers=args.pool_workers or None, threads_per_worker=args.pool_threads or None,
+                       batch_size=args.pool_batch_size or None) as pool:
+        # Load the model in every worker before timing
+        pool.encode(["warm up the model"] * pool.workers * pool.batch_size)
+        pooled, actual = run(pool, documents, args.workers)
+        layout = f"{pool.workers} process(es) x {pool.threads_per_worker} thread(s)"
+    difference = max(float(np.abs(a - b).max()) for a, b in zip(expected, actual))
+
+    print(f"{args.documents} documents, {total_chunks} chunks, {args.workers} threads, "
+          f"{len(available_cores())} cores, pool of {layout}")
+    print(f"{'mode':<14}{'seconds':>10}{'chunks/sec':>12}")
+    print(f"{'shared model':<14}{shared:>10.2f}{total_chunks / shared:>12.1f}")
+    print(f"{'pool':<14}{pooled:>10.2f}{total_chunks / pooled:>12.1f}")
+    print(f"max abs difference: {difference:.2e}")
+
+
+if __name__ == "__main__":
+    main()
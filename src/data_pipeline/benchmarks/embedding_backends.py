@@ -0,0 +1,76 @@
+"""
+Load time and throughput benchmark for the embedding backends.
+
+For each backend (EMBEDDING_BACKEND=torch and onnx) it measures, in a fresh
+interpreter per backend so imports are not shared, the time to import the
+backend, load the model and encode a first text, and then texts/sec when
+encoding synthetic chunk texts in calls of --batch texts.
+
+Usage:
+    python -m src.data_pipeline.benchmarks.embedding_backends --texts 2000 --batch 64
+    python -m src.data_pipeline.benchmarks.embedding_backends --backends onnx --threads 2
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from typing import Any, Dict
+
+from src.data_pipeline.benchmarks.corpus import make_paragraph
+
+
+def measure(backend: str, texts: int, batch: int, seed: int = 0) -> Dict[str, Any]:
+    """Load one backend and encode the synthetic texts; runs in the child interpreter."""
+    start = time.perf_counter()
+    from src.data_pipeline.embed_models.factory import get_embedding_model
+    model = get_embedding_model(backend)
+    model.encode(["warm up the model"])
+    load_seconds = time.perf_counter() - start
+
+    rng = random.Random(seed)
+    corpus = [make_paragraph(rng, 20, 180) for _ in range(texts)]
+    start = time.perf_counter()
+    for offset in range(0, len(corpus), batch):
+        model.encode(corpus[offset:offset + batch])
+    encode_seconds = time.perf_counter() - start
+    return {"backend": backend, "load_seconds": load_seconds, "texts_per_second": texts / encode_seconds}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="*", default=["torch", "onnx"])
+    parser.add_argument("--texts", type=int, default=2000, help="Texts to encode")
+    parser.add_argument("--batch", type=int, default=64, help="Texts per encode call")
+    parser.add_argument("--threads", type=int, default=0,
+                        help="Threads per backend (torch.set_num_threads / ONNX_INTRA_OP_THREADS), 0 for default")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        if args.threads and args.child == "torch":
+            import torch
+            torch.set_num_threads(args.threads)
+        print(json.dumps(measure(args.child, args.texts, args.batch)))
+        return
+
+    env = dict(os.environ)
+    if args.threads:
+        env["ONNX_INTRA_OP_THREADS"] = str(args.threads)
+    print(f"{args.texts} texts in calls of {args.batch}")
+    print(f"{'backend':<10}{'load s':>10}{'texts/sec':>12}")
+    for backend in args.backends:
+        command = [sys.executable, "-m", "src.data_pipeline.benchmarks.embedding_backends", "--child", backend,
+                   "--texts", str(args.texts), "--batch", str(args.batch), "--threads", str(args.threads)]
+        result = subprocess.run(command, env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"{backend:<10}failed: {result.stderr.strip().splitlines()[-1] if result.stderr else ''}")
+            continue
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f"{backend:<10}{report['load_seconds']:>10.2f}{report['texts_per_second']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
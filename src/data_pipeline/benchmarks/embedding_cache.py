@@ -0,0 +1,84 @@
+"""
+Benchmark for the persistent embedding cache.
+
+Parses a synthetic PDF corpus and embeds its chunks through a
+CachedEmbeddingModel three times against the same cache directory: a cold
+run, a repeat run with the same chunking, and a run rechunked with a
+different --rechunk-size (blocks that still form the same chunk hit the
+cache). The hashing fake model simulates the encode cost of a real model
+with --cost-per-token. Reports texts encoded, hit rate and encode time per
+run, and checks that cached embeddings equal freshly encoded ones.
+
+Usage:
+    python -m src.data_pipeline.benchmarks.embedding_cache --documents 20 --pages 10
+    python -m src.data_pipeline.benchmarks.embedding_cache --max-entries 2000
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+from src.data_pipeline.benchmarks import setup_benchmark
+from src.data_pipeline.benchmarks.corpus import make_synthetic_corpus
+from src.data_pipeline.chunks import generate_chunk_records
+from src.data_pipeline.embed_cache import CachedEmbeddingModel, EmbeddingCache
+from src.data_pipeline.fakes import FakeEmbeddingModel
+from src.data_pipeline.models import BlockData
+from src.data_pipeline.process_pdf import parse_pdf_document
+
+
+def chunk_texts(documents: List[List[BlockData]], chunk_size: int, chunk_overlap: int) -> List[List[str]]:
+    """Chunk every document and return the texts the embed stage would encode."""
+    return [[record.raw_text for record in generate_chunk_records(blocks, chunk_size, f"form-{i:04d}.pdf",
+                                                                  chunk_overlap)]
+            for i, blocks in enumerate(documents)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=20, help="Documents in the corpus")
+    parser.add_argument("--pages", type=int, default=10, help="Pages per document")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--chunk-overlap", type=int, default=25)
+    parser.add_argument("--rechunk-size", type=int, default=64, help="CHUNK_SIZE of the third run")
+    parser.add_argument("--cost-per-token", type=float, default=2e-6, help="Simulated encode seconds per token")
+    parser.add_argument("--max-entries", type=int, default=200000, help="EMBED_CACHE_MAX_ENTRIES")
+    args = parser.parse_args()
+    setup_benchmark()
+    os.environ["CHUNK_BUDGET"] = "tokens"
+    os.environ["CHUNK_PACKING"] = "none"
+
+    documents = [parse_pdf_document(pdf_data).blocks
+                 for pdf_data in make_synthetic_corpus(args.documents, args.pages)]
+    runs = [("cold", args.chunk_size), ("repeat", args.chunk_size), ("rechunked", args.rechunk_size)]
+
+    model = FakeEmbeddingModel(cost_per_token=args.cost_per_token)
+    print(f"{args.documents} documents x {args.pages} pages, cache of {args.max_entries} entries")
+    print(f"{'run':<12}{'chunks':>8}{'encoded':>9}{'hit rate':>10}{'seconds':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for label, chunk_size in runs:
+            # A fresh cache handle per run, as each ingestion run opens the cache again
+            cache = EmbeddingCache(directory, model.get_model_name(), model.target_dimension, args.max_entries)
+            cached_model = CachedEmbeddingModel(model, cache)
+            texts = chunk_texts(documents, chunk_size, args.chunk_overlap)
+            encoded_before = model.texts_encoded
+            start = time.perf_counter()
+            embeddings = [cached_model.encode(document) for document in texts]
+            seconds = time.perf_counter() - start
+            chunks = sum(len(document) for document in texts)
+            print(f"{label:<12}{chunks:>8}{model.texts_encoded - encoded_before:>9}{cache.hit_rate:>10.1%}"
+                  f"{seconds:>9.2f}")
+            cached_model.close()
+
+        reference = FakeEmbeddingModel()
+        for document, vectors in zip(texts, embeddings):
+            if not np.allclose(reference.encode(document), vectors, atol=1e-6):
+                raise SystemExit("Cached embeddings differ from freshly encoded ones")
+    print("cached embeddings match freshly encoded ones")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Import-time budget check for the data pipeline.
+
+Imports the pipeline modules in a fresh interpreter with all network access
+blocked and fails (exit code 1) if an import takes longer than the budget,
+touches the network, or pulls in heavy libraries that should only be loaded
+on first use (torch, sentence-transformers, NLTK, Google Cloud, Pinecone).
+
+Usage:
+    python -m src.data_pipeline.benchmarks.import_time --budget 0.75
+"""
+import argparse
+import json
+import subprocess
+import sys
+from typing import Dict, List
+
+MODULES = ["src.data_pipeline", "src.data_pipeline.process_pdf"]
+
+# Libraries that must not be imported just by importing the pipeline
+LAZY_MODULES = ["torch", "sentence_transformers", "nltk", "google.cloud.storage", "pinecone"]
+
+PROBE = """
+import json, socket, sys, time
+
+def _no_network(*args, **kwargs):
+    raise OSError("network access during import")
+
+socket.socket.connect = _no_network
+socket.create_connection = _no_network
+socket.getaddrinfo = _no_network
+
+start = time.perf_counter()
+__import__(sys.argv[1])
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in json.loads(sys.argv[2]) if m in sys.modules]}))
+"""
+
+
+def measure(module: str) -> Dict[str, object]:
+    """Import a module in a fresh interpreter and return its import time and any lazy modules it loaded."""
+    result = subprocess.run([sys.executable, "-c", PROBE, module, json.dumps(LAZY_MODULES)],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        return {"seconds": float("inf"), "loaded": [], "error": result.stderr.strip().splitlines()[-1:]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=0.75, help="Maximum seconds per module import")
+    args = parser.parse_args()
+
+    failures: List[str] = []
+    for module in MODULES:
+        result = measure(module)
+        print(f"{module:<36}{result['seconds']:>8.3f}s")
+        if "error" in result:
+            failures.append(f"{module} failed to import: {result['error']}")
+        elif result["seconds"] > args.budget:
+            failures.append(f"{module} took {result['seconds']:.3f}s (budget {args.budget:.3f}s)")
+        if result["loaded"]:
+            failures.append(f"{module} imported {', '.join(result['loaded'])} at import time")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
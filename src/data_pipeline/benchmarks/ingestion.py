@@ -0,0 +1,179 @@
+"""
+End-to-end offline ingestion benchmark.
+
+Builds a synthetic bucket of USCIS-like PDFs and structured uscis_html /
+reddit_post JSON documents, then runs the ingestion pipeline against
+in-process fakes for GCS, Pinecone and PostgreSQL and a hashing embedding
+model. Reports docs/sec, chunks/sec, peak RSS and the per-stage latency
+breakdown from the ingestion metrics.
+
+--mode main runs process_pdf.main() exactly as the container does (manifest,
+shared writer, batcher, thread/staged/process execution modes from the
+environment flags below). --mode file calls process_pdf_and_upload once per
+blob in the calling thread, which isolates the per-document hot path.
+
+Exits with status 1 if any document fails or a --min-docs-per-sec /
+--max-rss-mb threshold is not met, so it can gate a deploy.
+
+Usage:
+    python -m src.data_pipeline.benchmarks.ingestion --pdfs 8 --pages 20 --html 40 --reddit 40
+    python -m src.data_pipeline.benchmarks.ingestion --pipeline staged --execution process --report run.json
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+from typing import Any, Dict
+
+from src.data_pipeline.benchmarks import setup_benchmark
+from src.data_pipeline.benchmarks.corpus import make_synthetic_bucket_objects
+from src.data_pipeline.fakes import (FakeDocumentStore, FakeEmbeddingModel, FakeStorageClient,
+                                     FakeVectorIndex, install_fakes)
+from src.data_pipeline.metrics import get_metrics
+from src.data_pipeline import process_pdf
+
+BUCKET_NAME = "benchmark-bucket"
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process and its finished children, in MB."""
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / scale
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    """Populate the fake bucket, run the pipeline and return the run report."""
+    objects = make_synthetic_bucket_objects(args.pdfs, args.pages, args.html, args.reddit, seed=args.seed)
+    storage_client = FakeStorageClient(latency=args.storage_latency)
+    bucket = storage_client.bucket(BUCKET_NAME)
+    for name, data in objects.items():
+        bucket.add(name, data)
+
+    model = FakeEmbeddingModel(cost_per_token=args.embed_cost_per_token)
+    # The index only accepts vectors of the model's native dimension, like a real Pinecone index
+    index = FakeVectorIndex(dimension=model.target_dimension, latency=args.index_latency)
+    document_store = FakeDocumentStore(latency=args.db_latency)
+
+    os.environ.update({
+        "BUCKET_NAME": BUCKET_NAME,
+        "CHUNK_SIZE": str(args.chunk_size),
+        "CHUNK_OVERLAP": str(args.chunk_overlap),
+        "INGESTION_FULL_REBUILD": "1",
+        "INGESTION_PIPELINE": args.pipeline,
+        "INGESTION_EXECUTION_MODE": args.execution,
+        "EMBEDDING_BATCHER": "1" if args.batcher else "0",
+    })
+    # Start every run with an empty journal, so nothing is recovered from a previous run
+    os.environ["INGESTION_JOURNAL_PATH"] = os.path.join(tempfile.mkdtemp(), "ingestion_journal.jsonl")
+
+    metrics = get_metrics()
+    metrics.reset()
+    start = time.perf_counter()
+    with install_fakes(storage_client, index, document_store):
+        if args.mode == "main":
+            process_pdf.main(model=model)
+        else:
+            for name in objects:
+                process_pdf.process_pdf_and_upload(BUCKET_NAME, name, args.chunk_size, args.chunk_overlap,
+                                                   model=model)
+    elapsed = time.perf_counter() - start
+
+    report = metrics.to_dict()
+    counters = report["counters"]
+    succeeded = sum(counters.get("documents_succeeded", {}).values())
+    failed = sum(counters.get("documents_failed", {}).values())
+    chunks = sum(counters.get("chunks", {}).values())
+    report.update({
+        "benchmark": {
+            "mode": args.mode,
+            "pipeline": args.pipeline,
+            "execution": args.execution,
+            "batcher": args.batcher,
+            "documents": len(objects),
+            "pdf_pages": args.pdfs * args.pages,
+        },
+        "elapsed_seconds": elapsed,
+        "documents_succeeded": succeeded,
+        "documents_failed": failed,
+        "chunks": chunks,
+        "docs_per_sec": succeeded / elapsed if elapsed > 0 else 0.0,
+        "chunks_per_sec": chunks / elapsed if elapsed > 0 else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "vectors_in_index": len(index.vectors),
+        "documents_in_db": len(document_store.documents),
+    })
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print the headline numbers and the per-stage breakdown."""
+    print(f"documents: {report['documents_succeeded']} ok, {report['documents_failed']} failed "
+          f"in {report['elapsed_seconds']:.2f}s")
+    print(f"docs/sec: {report['docs_per_sec']:.2f}   chunks/sec: {report['chunks_per_sec']:.1f}   "
+          f"peak RSS: {report['peak_rss_mb']:.0f} MB")
+    print(f"{'stage':<10}{'runs':>7}{'total s':>10}{'share':>8}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}")
+    total = sum(stage["total_seconds"] for stage in report["stages"].values()) or 1.0
+    for name, stage in report["stages"].items():
+        print(f"{name:<10}{stage['count']:>7}{stage['total_seconds']:>10.2f}"
+              f"{stage['total_seconds'] / total:>8.0%}{stage['p50_seconds'] * 1000:>9.1f}"
+              f"{stage['p95_seconds'] * 1000:>9.1f}{stage['max_seconds'] * 1000:>9.1f}")
+    if report["bottleneck_stage"]:
+        print(f"bottleneck: {report['bottleneck_stage']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdfs", type=int, default=8, help="Number of synthetic PDFs")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per PDF")
+    parser.add_argument("--html", type=int, default=40, help="Number of uscis_html JSON documents")
+    parser.add_argument("--reddit", type=int, default=40, help="Number of reddit_post JSON documents")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mode", choices=("main", "file"), default="main")
+    parser.add_argument("--pipeline", choices=("file", "staged"), default="file",
+                        help="INGESTION_PIPELINE for --mode main")
+    parser.add_argument("--execution", choices=("thread", "process"), default="thread",
+                        help="INGESTION_EXECUTION_MODE for --mode main")
+    parser.add_argument("--no-batcher", dest="batcher", action="store_false",
+                        help="Disable the cross-document embedding batcher")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--chunk-overlap", type=int, default=25)
+    parser.add_argument("--storage-latency", type=float, default=0.0, help="Simulated seconds per download")
+    parser.add_argument("--index-latency", type=float, default=0.0, help="Simulated seconds per upsert request")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="Simulated seconds per database call")
+    parser.add_argument("--embed-cost-per-token", type=float, default=0.0,
+                        help="Simulated embedding seconds per token")
+    parser.add_argument("--min-docs-per-sec", type=float, default=0.0, help="Fail below this throughput")
+    parser.add_argument("--max-rss-mb", type=float, default=0.0, help="Fail above this peak RSS")
+    parser.add_argument("--report", default="", help="Write the full JSON report to this path")
+    parser.add_argument("--verbose", action="store_true", help="Keep the pipeline's INFO logs")
+    args = parser.parse_args()
+
+    setup_benchmark(None if args.verbose else logging.WARNING)
+
+    report = run_benchmark(args)
+    print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+
+    failures = []
+    if report["documents_failed"]:
+        failures.append(f"{report['documents_failed']} document(s) failed")
+    if args.min_docs_per_sec and report["docs_per_sec"] < args.min_docs_per_sec:
+        failures.append(f"{report['docs_per_sec']:.2f} docs/sec is below {args.min_docs_per_sec:.2f}")
+    if args.max_rss_mb and report["peak_rss_mb"] > args.max_rss_mb:
+        failures.append(f"peak RSS {report['peak_rss_mb']:.0f} MB is above {args.max_rss_mb:.0f} MB")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Parity check of the ONNX int8 embedding backend against PyTorch.
+
+Embeds the chunks of a corpus (synthetic instruction PDFs, or --files) plus
+short query-like texts with all_minilm_l6_v2 (SentenceTransformer) and
+all_minilm_l6_v2_onnx, and reports the cosine similarity between the two
+embeddings of every text, and how often the nearest chunk of each query is
+the same under both backends. Exits with status 1 if any cosine is below
+--min-cosine, so it can gate switching EMBEDDING_BACKEND to onnx or
+re-exporting the graph.
+
+Needs torch and sentence-transformers next to onnxruntime, and the graph
+exported by python -m src.data_pipeline.embed_models.export_onnx.
+
+Usage:
+    python -m src.data_pipeline.benchmarks.onnx_parity --min-cosine 0.98
+    python -m src.data_pipeline.benchmarks.onnx_parity --files data/uscis_pdf/*.pdf
+"""
+import argparse
+import os
+import random
+from typing import List
+
+import numpy as np
+
+from src.data_pipeline.benchmarks import setup_benchmark
+from src.data_pipeline.benchmarks.corpus import make_synthetic_corpus
+from src.data_pipeline.chunks import generate_chunk_records
+from src.data_pipeline.embed_models import all_minilm_l6_v2, all_minilm_l6_v2_onnx
+from src.data_pipeline.process_pdf import parse_pdf_document
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", nargs="*", default=[], help="PDF files to embed instead of the synthetic corpus")
+    parser.add_argument("--documents", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--chunk-overlap", type=int, default=25)
+    parser.add_argument("--queries", type=int, default=200, help="Query-like texts taken from random chunks")
+    parser.add_argument("--min-cosine", type=float, default=0.98,
+                        help="Lowest cosine similarity allowed between the backends' embeddings")
+    parser.add_argument("--model-dir", default=None, help="ONNX_MODEL_DIR")
+    args = parser.parse_args()
+    setup_benchmark()
+    os.environ["CHUNK_BUDGET"] = "tokens"
+
+    if args.files:
+        corpus: List[bytes] = []
+        for path in args.files:
+            with open(path, "rb") as f:
+                corpus.append(f.read())
+    else:
+        corpus = make_synthetic_corpus(args.documents, args.pages)
+    chunks: List[str] = []
+    for index, pdf_data in enumerate(corpus):
+        records = generate_chunk_records(parse_pdf_document(pdf_data).blocks, args.chunk_size, f"doc{index}.pdf",
+                                         args.chunk_overlap)
+        chunks.extend(record.raw_text for record in records)
+    rng = random.Random(0)
+    queries = []
+    for _ in range(args.queries):
+        words = rng.choice(chunks).split()
+        start = rng.randint(0, max(0, len(words) - 10))
+        queries.append(" ".join(words[start:start + 10]))
+
+    reference, candidate = all_minilm_l6_v2(), all_minilm_l6_v2_onnx(args.model_dir)
+    texts = chunks + queries
+    expected = np.asarray(reference.encode(texts), dtype=np.float32)
+    actual = np.asarray(candidate.encode(texts), dtype=np.float32)
+    expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+    cosines = (expected * actual).sum(axis=1)
+
+    # Retrieval agreement: the nearest chunk of every query under each backend
+    top_expected = (expected[len(chunks):] @ expected[:len(chunks)].T).argmax(axis=1)
+    top_actual = (actual[len(chunks):] @ actual[:len(chunks)].T).argmax(axis=1)
+
+    print(f"{len(chunks)} chunks and {len(queries)} queries")
+    print(f"{'min cosine':<24}{cosines.min():>10.5f}")
+    print(f"{'p1 cosine':<24}{np.percentile(cosines, 1):>10.5f}")
+    print(f"{'mean cosine':<24}{cosines.mean():>10.5f}")
+    print(f"{'same top-1 chunk':<24}{(top_expected == top_actual).mean():>10.1%}")
+    worst = int(cosines.argmin())
+    print(f"least similar text: {texts[worst][:80]!r}")
+    if cosines.min() < args.min_cosine:
+        raise SystemExit(f"Cosine similarity {cosines.min():.5f} is below --min-cosine {args.min_cosine}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Throughput benchmark for the OpenAI embedding client, against a local stub server.
+
+Starts a FakeEmbeddingServer that answers like the /v1/embeddings endpoint
+with a fixed per-request and per-input latency, and embeds synthetic chunk
+texts with OpenAIEmbeddingModel twice: one input per request, one request
+at a time (how the query-side code calls the API), and packed by token count
+with --concurrency requests in flight. --failure-rate answers a fraction of
+requests with 429 to exercise the retries. Checks that the embeddings come
+back in input order, and exits with status 1 if they do not.
+
+Usage:
+    python -m src.data_pipeline.benchmarks.openai_embeddings --texts 2000 --concurrency 8
+    python -m src.data_pipeline.benchmarks.openai_embeddings --failure-rate 0.2 --batch-tokens 4000
+"""
+import argparse
+import random
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from src.data_pipeline.benchmarks import setup_benchmark
+from src.data_pipeline.benchmarks.corpus import make_paragraph
+from src.data_pipeline.embed_models.openai import OpenAIEmbeddingModel
+from src.data_pipeline.fakes import FakeEmbeddingServer
+from src.data_pipeline.metrics import get_metrics
+
+
+def run(server: FakeEmbeddingServer, model: OpenAIEmbeddingModel, texts: List[str]) -> Dict[str, Any]:
+    """Embed texts through the server and report throughput and request counts."""
+    get_metrics().reset()
+    requests_before = server.requests
+    server.max_in_flight = 0
+    start = time.perf_counter()
+    embeddings = model.encode(texts)
+    seconds = time.perf_counter() - start
+    expected = server.model.encode(texts)
+    return {"seconds": seconds, "texts_per_second": len(texts) / seconds,
+            "requests": server.requests - requests_before, "max_in_flight": server.max_in_flight,
+            "retries": int(get_metrics().to_dict().get("counters", {}).get("openai_embed_retries", {}).get("all", 0)),
+            "in_order": bool(np.allclose(embeddings, expected, atol=1e-6))}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=2000, help="Texts to embed")
+    parser.add_argument("--sequential-texts", type=int, default=200,
+                        help="Texts to embed one request at a time (the baseline is slow)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Server seconds per request")
+    parser.add_argument("--latency-per-input", type=float, default=0.0005, help="Server seconds per input")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-tokens", type=int, default=8000, help="Tokens packed per request")
+    parser.add_argument("--batch-size", type=int, default=2048, help="Inputs packed per request")
+    args = parser.parse_args()
+    setup_benchmark()
+
+    rng = random.Random(0)
+    texts = [make_paragraph(rng, 10, 180) for _ in range(args.texts)]
+    with FakeEmbeddingServer(latency=args.latency, latency_per_input=args.latency_per_input,
+                             failure_rate=args.failure_rate) as server:
+        common = dict(base_url=server.base_url, api_key="stub", backoff_base=0.05)
+        sequential = run(server, OpenAIEmbeddingModel(concurrency=1, max_batch_size=1, **common),
+                         texts[:args.sequential_texts])
+        packed = run(server, OpenAIEmbeddingModel(concurrency=args.concurrency, max_batch_tokens=args.batch_tokens,
+                                                  max_batch_size=args.batch_size, **common), texts)
+
+    print(f"{args.texts} texts, server latency {args.latency * 1000:.0f} ms + "
+          f"{args.latency_per_input * 1000:.1f} ms/input, failure rate {args.failure_rate:.0%}")
+    print(f"{'mode':<12}{'texts/sec':>12}{'requests':>10}{'in flight':>11}{'retries':>9}{'in order':>10}")
+    for mode, report in (("sequential", sequential), ("packed", packed)):
+        print(f"{mode:<12}{report['texts_per_second']:>12.1f}{report['requests']:>10}"
+              f"{report['max_in_flight']:>11}{report['retries']:>9}{str(report['in_order']):>10}")
+    if not (sequential["in_order"] and packed["in_order"]):
+        raise SystemExit("Embeddings were not returned in input order")
+
+
+if __name__ == "__main__":
+    main()
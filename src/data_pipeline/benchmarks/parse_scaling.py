@@ -0,0 +1,81 @@
+"""
+Benchmark for PDF parse + chunk scaling across cores.
+
+Parses a synthetic USCIS-like corpus in the calling thread, with a thread
+pool (the previous execution mode) and with ParsePool at 1..N worker
+processes, and reports pages/sec and speedup over the single-process run.
+
+Usage:
+    python -m src.data_pipeline.benchmarks.parse_scaling --documents 8 --pages 40
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from src.data_pipeline.benchmarks.corpus import make_synthetic_corpus
+from src.data_pipeline.chunks import generate_chunk_records
+from src.data_pipeline.parallel import ParsePool
+from src.data_pipeline.process_pdf import extract_text_and_layout_from_pdf
+
+
+def parse_inline(pdf_data: bytes, file_name: str, chunk_size: int, chunk_overlap: int) -> int:
+    """Parse and chunk one PDF in the calling thread, returning the chunk count."""
+    layout_data = extract_text_and_layout_from_pdf(pdf_data)
+    return len(generate_chunk_records(layout_data, chunk_size, file_name, chunk_overlap))
+
+
+def run_threads(corpus: List[bytes], threads: int, chunk_size: int, chunk_overlap: int) -> float:
+    """Parse the corpus on a thread pool and return the elapsed seconds."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda item: parse_inline(item[1], f"doc{item[0]}.pdf", chunk_size, chunk_overlap),
+                          enumerate(corpus)))
+    return time.perf_counter() - start
+
+
+def run_process_pool(corpus: List[bytes], workers: int, pages_per_task: int,
+                     chunk_size: int, chunk_overlap: int) -> float:
+    """Parse the corpus with a ParsePool of the given size and return the elapsed seconds."""
+    with ParsePool(max_workers=workers, pages_per_task=pages_per_task) as pool:
+        # Warm the worker processes so interpreter start-up is not measured
+        pool.parse_and_chunk(corpus[0], "warmup.pdf", chunk_size, chunk_overlap)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(5, workers)) as executor:
+            list(executor.map(lambda item: pool.parse_and_chunk(item[1], f"doc{item[0]}.pdf",
+                                                                chunk_size, chunk_overlap),
+                              enumerate(corpus)))
+        return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=8, help="Number of synthetic PDFs")
+    parser.add_argument("--pages", type=int, default=40, help="Pages per PDF")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1, help="Largest pool size to try")
+    parser.add_argument("--pages-per-task", type=int, default=16, help="Page range size per parse task")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--chunk-overlap", type=int, default=25)
+    args = parser.parse_args()
+
+    corpus = make_synthetic_corpus(args.documents, args.pages)
+    total_pages = args.documents * args.pages
+
+    rows = [("threads x5", run_threads(corpus, 5, args.chunk_size, args.chunk_overlap))]
+    workers = 1
+    while True:
+        rows.append((f"processes x{workers}",
+                     run_process_pool(corpus, workers, args.pages_per_task, args.chunk_size, args.chunk_overlap)))
+        if workers >= args.max_workers:
+            break
+        workers = min(workers * 2, args.max_workers)
+
+    baseline = rows[1][1]
+    print(f"{'mode':<16}{'seconds':>10}{'pages/sec':>12}{'speedup':>10}")
+    for name, elapsed in rows:
+        print(f"{name:<16}{elapsed:>10.2f}{total_pages / elapsed:>12.1f}{baseline / elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
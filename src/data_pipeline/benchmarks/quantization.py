@@ -0,0 +1,136 @@
+"""
+Recall, memory and latency benchmark for quantized vector search.
+
+Chunks and embeds a corpus (synthetic instruction PDFs, or --files), builds
+a QuantizedVectorIndex per setting and runs queries made of short word
+windows taken from random chunks. Recall@k is measured against exact
+float32 search over the same vectors. For every setting it reports the
+bytes per vector scanned in the first pass, the megabytes that pass keeps
+in memory (the codes, or the whole originals file without quantization),
+the originals file on disk, recall@k and the median and p95 query latency, so VECTOR_QUANTIZATION and VECTOR_RESCORE_FACTOR can be
+picked from the numbers.
+
+all-MiniLM-L6-v2 is used when sentence-transformers is installed;
+otherwise the hashing FakeEmbeddingModel is used, whose sparse bag-of-words
+vectors quantize differently from dense model embeddings.
+
+Usage:
+    python -m src.data_pipeline.benchmarks.quantization --documents 40 --pages 10 --top-k 10
+    python -m src.data_pipeline.benchmarks.quantization --files data/uscis_pdf/*.pdf --repeat 4
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+from typing import Any, List, Tuple
+
+import numpy as np
+
+from src.data_pipeline.benchmarks import setup_benchmark
+from src.data_pipeline.benchmarks.corpus import make_synthetic_corpus
+from src.data_pipeline.chunks import generate_chunk_records
+from src.data_pipeline.fakes import FakeEmbeddingModel
+from src.data_pipeline.process_pdf import parse_pdf_document
+from src.data_pipeline.quantization import QuantizedVectorIndex
+
+SETTINGS: List[Tuple[str, int]] = [("none", 0), ("int8", 0), ("int8", 2), ("int8", 4),
+                                   ("binary", 0), ("binary", 4), ("binary", 10)]
+
+
+def load_model(name: str) -> Any:
+    """Return the embedding model to measure with, falling back to the fake model."""
+    if name == "minilm":
+        try:
+            import sentence_transformers  # noqa: F401
+            from src.data_pipeline.embed_models.all_minilm_l6_v2 import all_minilm_l6_v2
+            return all_minilm_l6_v2()
+        except ImportError:
+            print("sentence-transformers is not installed; measuring with FakeEmbeddingModel instead")
+    return FakeEmbeddingModel()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", nargs="*", default=[], help="PDF files to index instead of the synthetic corpus")
+    parser.add_argument("--documents", type=int, default=40)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="Index every chunk this many times, with small noise, to measure at a larger size")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--chunk-overlap", type=int, default=25)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--query-words", type=int, default=12, help="Words per query, taken from a random chunk")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--model", choices=("minilm", "fake"), default="minilm")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    setup_benchmark()
+    os.environ["CHUNK_BUDGET"] = "tokens"
+
+    if args.files:
+        corpus: List[bytes] = []
+        for path in args.files:
+            with open(path, "rb") as f:
+                corpus.append(f.read())
+    else:
+        corpus = make_synthetic_corpus(args.documents, args.pages, seed=args.seed)
+    texts: List[str] = []
+    for index, pdf_data in enumerate(corpus):
+        records = generate_chunk_records(parse_pdf_document(pdf_data).blocks, args.chunk_size, f"doc{index}.pdf",
+                                         args.chunk_overlap)
+        texts.extend(record.raw_text for record in records)
+
+    model = load_model(args.model)
+    embeddings = np.asarray(model.encode(texts), dtype=np.float32)
+    rng = np.random.default_rng(args.seed)
+    copies = [embeddings] + [embeddings + rng.normal(0, 0.01, embeddings.shape).astype(np.float32)
+                             for _ in range(args.repeat - 1)]
+    vectors = np.concatenate(copies)
+    ids = [f"chunk-{i}" for i in range(len(vectors))]
+
+    picker = random.Random(args.seed)
+    query_texts = []
+    for _ in range(args.queries):
+        words = picker.choice(texts).split()
+        start = picker.randint(0, max(0, len(words) - args.query_words))
+        query_texts.append(" ".join(words[start:start + args.query_words]))
+    queries = np.asarray(model.encode(query_texts), dtype=np.float32)
+
+    print(f"{len(vectors)} vectors of dimension {vectors.shape[1]} ({model.get_model_name()}), "
+          f"{len(queries)} queries, recall@{args.top_k}")
+    print(f"{'setting':<16}{'bytes/vec':>10}{'memory MB':>11}{'disk MB':>9}{'recall':>8}{'p50 ms':>9}{'p95 ms':>9}")
+    # Exact scores decide recall, so a result tied with the k-th exact match counts as found
+    normalized = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query_norms = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    exact_scores = query_norms @ normalized.T
+    kth = -np.partition(-exact_scores, args.top_k - 1, axis=1)[:, args.top_k - 1]
+    positions = {vector_id: position for position, vector_id in enumerate(ids)}
+    for quantization, rescore_factor in SETTINGS:
+        # A temporary directory per setting, removed by close()
+        index = QuantizedVectorIndex(vectors.shape[1], quantization, rescore_factor)
+        index.add(ids, vectors)
+        memory = index.memory_bytes()
+        # Only the codes are scanned and held in memory; originals are read from disk for the rescored candidates
+        scanned = memory["codes"] or memory["originals"]
+        index.search(queries[0], args.top_k)
+
+        latencies, recalls = [], []
+        for position, query in enumerate(queries):
+            start = time.perf_counter()
+            results = index.search(query, args.top_k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits = sum(exact_scores[position, positions[vector_id]] >= kth[position] - 1e-6
+                       for vector_id, _ in results)
+            recalls.append(hits / args.top_k)
+        index.close()
+
+        label = quantization if quantization == "none" else f"{quantization} x{rescore_factor}"
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+        print(f"{label:<16}{scanned / len(vectors):>10.0f}{scanned / 1e6:>11.1f}"
+              f"{memory['originals'] / 1e6:>9.1f}"
+              f"{statistics.mean(recalls):>8.3f}{statistics.median(latencies):>9.2f}{p95:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Latency benchmark of the long-lived query service against spawn-per-request.
+
+Answers the same queries two ways and reports p50/p95/mean latency:
+- spawn: a new Python process per query, as frontend/server.js used to run
+  src/rag.py, paying interpreter start, imports and client construction on
+  every message
+- service: POST /api/query to one src/query_service.py process over a
+  keep-alive connection, started and warmed up before timing
+
+--answerer stub (the default) answers with stub_answer below, which imports
+and constructs the same client libraries as src/rag.py and sleeps
+--stub-seconds in place of the embedding, retrieval and chat calls, so it
+runs without credentials. --answerer rag uses src/rag.py and needs the
+Azure OpenAI and Pinecone settings. --url times an already running endpoint
+instead of starting the service, e.g. the Node proxy's /api/chat.
+
+Usage:
+    python -m src.data_pipeline.benchmarks.query_latency --queries 20
+    python -m src.data_pipeline.benchmarks.query_latency --answerer rag --queries 10
+    python -m src.data_pipeline.benchmarks.query_latency --url http://localhost:5000/api/chat
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from pinecone import Pinecone
+
+STUB_ANSWERER = "src.data_pipeline.benchmarks.query_latency:stub_answer"
+QUERIES = [
+    "Can I work on an F1 visa in the U.S.?",
+    "How long does it take to process Form I-485?",
+    "What documents do I need for a green card interview?",
+    "Can I travel while my adjustment of status is pending?",
+    "What is the filing fee for Form I-765?",
+]
+
+# Client construction as in src/rag.py, without network calls
+_stub_index = Pinecone(api_key="stub").Index(host="https://stub.invalid")
+
+
+def stub_answer(query: str) -> str:
+    """Answer after a fixed delay standing in for the embedding, retrieval and chat calls."""
+    time.sleep(float(os.getenv("QUERY_STUB_SECONDS", "0.25")))
+    return f"Stub answer to: {query}"
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """p50, p95 and mean of latencies in milliseconds."""
+    values = np.asarray(latencies) * 1000
+    return {"p50": float(np.percentile(values, 50)), "p95": float(np.percentile(values, 95)),
+            "mean": float(values.mean())}
+
+
+def run_spawn(queries: List[str], answerer: str, env: Dict[str, str]) -> List[float]:
+    """Answer every query in a fresh Python process and return the latencies in seconds."""
+    latencies = []
+    for query in queries:
+        if answerer == "rag":
+            command = [sys.executable, "src/rag.py"]
+            query_env = dict(env, TEST_QUERY=query)
+        else:
+            command = [sys.executable, "-m", "src.query_service", "--query", query]
+            query_env = env
+        start = time.perf_counter()
+        result = subprocess.run(command, env=query_env, capture_output=True, text=True)
+        latencies.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise SystemExit(f"Spawned query failed: {result.stderr.strip()[-500:]}")
+    return latencies
+
+
+def run_service(queries: List[str], url: str) -> List[float]:
+    """POST every query to a running endpoint over one keep-alive connection; return the latencies in seconds."""
+    import httpx
+    latencies = []
+    with httpx.Client(timeout=120) as client:
+        for query in queries:
+            start = time.perf_counter()
+            response = client.post(url, json={"query": query})
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise SystemExit(f"Query failed with HTTP {response.status_code}: {response.text[:500]}")
+    return latencies
+
+
+def start_service(port: int, env: Dict[str, str], timeout: float = 120.0) -> subprocess.Popen:
+    """Start src/query_service.py and wait until /healthz reports it warm."""
+    import httpx
+    process = subprocess.Popen([sys.executable, "-m", "src.query_service", "--port", str(port)], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Query service exited: {process.stderr.read().decode()[-500:]}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/healthz", timeout=1).status_code == 200:
+                return process
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit(f"Query service did not become ready within {timeout:.0f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=20, help="Queries per mode")
+    parser.add_argument("--answerer", choices=["stub", "rag"], default="stub")
+    parser.add_argument("--stub-seconds", type=float, default=0.25, help="Simulated answer time of the stub")
+    parser.add_argument("--port", type=int, default=8765, help="Port of the query service started here")
+    parser.add_argument("--url", default=None, help="Time this running endpoint instead of starting the service")
+    parser.add_argument("--skip-spawn", action="store_true", help="Only time the service")
+    args = parser.parse_args()
+
+    queries = [QUERIES[i % len(QUERIES)] for i in range(args.queries)]
+    env = dict(os.environ, QUERY_STUB_SECONDS=str(args.stub_seconds))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+    if args.answerer == "stub":
+        env["QUERY_ANSWERER"] = STUB_ANSWERER
+
+    results: Dict[str, Dict[str, float]] = {}
+    if not args.skip_spawn:
+        results["spawn"] = summarize(run_spawn(queries, args.answerer, env))
+    service: Optional[subprocess.Popen] = None
+    try:
+        url = args.url
+        if url is None:
+            service = start_service(args.port, env)
+            url = f"http://127.0.0.1:{args.port}/api/query"
+        results["service"] = summarize(run_service(queries, url))
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait(timeout=10)
+
+    print(f"{args.queries} queries per mode, answerer {args.answerer}"
+          + (f" ({args.stub_seconds * 1000:.0f} ms)" if args.answerer == "stub" else ""))
+    print(f"{'mode':<10}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}")
+    for mode, summary in results.items():
+        print(f"{mode:<10}{summary['p50']:>10.1f}{summary['p95']:>10.1f}{summary['mean']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
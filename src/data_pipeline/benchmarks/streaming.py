@@ -0,0 +1,105 @@
+"""
+Memory benchmark for streaming parse -> chunk -> embed.
+
+Runs a large synthetic PDF (or the PDF given with --file) through parsing,
+chunking and embedding two ways:
+
+- batch: parse_pdf_document, then generate_chunk_records, then
+  generate_embedding_vector over the whole document, as parse_document and
+  embed_document do
+- stream: iter_text_and_layout_from_pdf feeding iter_chunk_records, with
+  chunks embedded in batches of --batch as soon as they are final, as
+  stream_pdf_document does (INGESTION_STREAMING=1)
+
+and reports the total time, the time until the first embedding is ready and
+the peak memory allocated, measured with tracemalloc. Vectors are dropped
+once embedded, as if upserted. The hashing FakeEmbeddingModel is used so
+only the pipeline's own memory is measured; the PDF bytes and the page texts
+kept for PostgreSQL are common to both.
+
+Usage:
+    python -m src.data_pipeline.benchmarks.streaming --pages 500
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from typing import Callable, List, Tuple
+
+from src.data_pipeline.benchmarks import setup_benchmark
+from src.data_pipeline.benchmarks.corpus import make_synthetic_pdf
+from src.data_pipeline.chunks import generate_chunk_records, iter_chunk_records
+from src.data_pipeline.embed import generate_embedding_batch
+from src.data_pipeline.fakes import FakeEmbeddingModel
+from src.data_pipeline.process_pdf import iter_text_and_layout_from_pdf, parse_pdf_document
+
+
+def run_batch(pdf_data: bytes, model: FakeEmbeddingModel, args: argparse.Namespace) -> Tuple[int, float]:
+    """Parse, chunk and embed the whole document at once; return the vector count and first-vector time."""
+    start = time.perf_counter()
+    parsed = parse_pdf_document(pdf_data)
+    records = generate_chunk_records(parsed.blocks, args.chunk_size, "benchmark.pdf", args.chunk_overlap)
+    vectors = generate_embedding_batch(records, model)
+    return len(vectors), time.perf_counter() - start
+
+
+def run_stream(pdf_data: bytes, model: FakeEmbeddingModel, args: argparse.Namespace) -> Tuple[int, float]:
+    """Parse, chunk and embed page by page; return the vector count and first-vector time."""
+    start = time.perf_counter()
+    first = 0.0
+    count = 0
+    page_texts: List[str] = []
+    records = iter_chunk_records(iter_text_and_layout_from_pdf(pdf_data, page_texts=page_texts),
+                                 args.chunk_size, "benchmark.pdf", args.chunk_overlap)
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= args.batch:
+            count += len(generate_embedding_batch(batch, model))
+            first = first or time.perf_counter() - start
+            batch = []
+    if batch:
+        count += len(generate_embedding_batch(batch, model))
+        first = first or time.perf_counter() - start
+    return count, first
+
+
+def measure(fn: Callable[[], Tuple[int, float]]) -> Tuple[int, float, float, float]:
+    """Return the vector count, total seconds, first-vector seconds and peak MB of one run."""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    count, first = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, elapsed, first, (peak - baseline) / 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", default="", help="PDF file to process instead of the synthetic PDF")
+    parser.add_argument("--pages", type=int, default=500, help="Pages of the synthetic PDF")
+    parser.add_argument("--batch", type=int, default=256, help="Chunks per embedding batch when streaming")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--chunk-overlap", type=int, default=25)
+    args = parser.parse_args()
+    setup_benchmark()
+
+    if args.file:
+        with open(args.file, "rb") as f:
+            pdf_data = f.read()
+    else:
+        pdf_data = make_synthetic_pdf(args.pages)
+    model = FakeEmbeddingModel()
+    print(f"{len(pdf_data) / 1e6:.1f} MB PDF")
+
+    print(f"{'mode':<8}{'vectors':>9}{'seconds':>9}{'first vector s':>16}{'peak MB':>9}")
+    for name, fn in (("batch", run_batch), ("stream", run_stream)):
+        count, elapsed, first, peak = measure(lambda: fn(pdf_data, model, args))
+        print(f"{name:<8}{count:>9}{elapsed:>9.2f}{first:>16.2f}{peak:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark for the chunking tokenizer.
+
+Compares the offset-preserving regex tokenizer with NLTK word_tokenize (and
+plain whitespace splitting) on the text blocks of a corpus:
+
+- throughput in MB/s and tokens/sec
+- fidelity of token counts relative to word_tokenize, since chunk_size is
+  measured in tokens
+- the share of generated chunks that are exact slices of their source block
+
+Pass the real corpus (structured_data PDFs and JSON files downloaded from the
+bucket) with --files; without it a synthetic USCIS-like corpus is used. When
+the NLTK punkt data is not installed, word_tokenize runs with
+preserve_line=True (no sentence splitting), which tokenizes the same way
+within a line.
+
+Usage:
+    python -m src.data_pipeline.benchmarks.tokenizer
+    python -m src.data_pipeline.benchmarks.tokenizer --files data/uscis_pdf/*.pdf data/uscis_html/*.json
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from typing import Callable, Dict, List
+
+from src.data_pipeline.benchmarks import setup_benchmark
+from src.data_pipeline.benchmarks.corpus import make_synthetic_corpus
+from src.data_pipeline import chunks
+from src.data_pipeline.chunks import ensure_punkt, generate_chunks
+from src.data_pipeline.process_pdf import parse_pdf_document
+from src.data_pipeline.tokenizer import span_tokenize, tokenize
+
+
+def load_blocks(files: List[str], documents: int, pages: int) -> List[str]:
+    """Return the text blocks of the given files, or of a synthetic corpus if none are given."""
+    blocks: List[str] = []
+    if not files:
+        for pdf_data in make_synthetic_corpus(documents, pages):
+            blocks.extend(block.text for block in parse_pdf_document(pdf_data).blocks)
+        return blocks
+
+    for path in files:
+        with open(path, "rb") as f:
+            data = f.read()
+        if path.endswith(".pdf"):
+            blocks.extend(block.text for block in parse_pdf_document(data).blocks)
+        elif path.endswith(".json"):
+            content = json.loads(data).get("content", "")
+            blocks.append(content if isinstance(content, str) else json.dumps(content))
+        else:
+            blocks.append(data.decode("utf-8", errors="ignore"))
+    return [block for block in blocks if block.strip()]
+
+
+def nltk_tokenizer() -> Callable[[str], List[str]]:
+    """word_tokenize, without sentence splitting when punkt is not installed."""
+    from nltk import word_tokenize
+
+    if ensure_punkt():
+        return word_tokenize
+    return lambda text: word_tokenize(text, preserve_line=True)
+
+
+def time_tokenizer(fn: Callable[[str], List], blocks: List[str], repeat: int) -> float:
+    """Return the best-of-repeat seconds to tokenize every block."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for block in blocks:
+            fn(block)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def chunk_fidelity(blocks: List[str], chunk_size: int, chunk_overlap: int, tokenizer_name: str) -> float:
+    """Share of chunks that are an exact substring of their source block."""
+    os.environ["CHUNK_TOKENIZER"] = tokenizer_name
+    if tokenizer_name == "nltk":
+        # Chunk with the same word_tokenize as the timing run, even without punkt
+        chunks._tokenizer = nltk_tokenizer()
+    items = [{"id": f"b{i}", "page": 1, "text": text} for i, text in enumerate(blocks)]
+    _, metadata = generate_chunks(items, chunk_size, "benchmark", chunk_overlap)
+    texts = {item["id"]: item["text"] for item in items}
+    # Later chunks of a split block have the ID "<block ID>-<index>" (see chunks.piece_id)
+    exact = sum(1 for meta in metadata
+                if meta["raw_text"] in (texts.get(meta["id"]) or texts[meta["id"].rsplit("-", 1)[0]]))
+    return exact / len(metadata) if metadata else 1.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", nargs="*", default=[], help="Corpus files (.pdf, .json or text)")
+    parser.add_argument("--documents", type=int, default=6, help="Synthetic PDFs when no files are given")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per synthetic PDF")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions (best is reported)")
+    parser.add_argument("--chunk-size", type=int, default=32, help="Chunk size for the fidelity check")
+    parser.add_argument("--chunk-overlap", type=int, default=4)
+    args = parser.parse_args()
+    setup_benchmark()
+
+    blocks = load_blocks(args.files, args.documents, args.pages)
+    megabytes = sum(len(block.encode("utf-8")) for block in blocks) / 1e6
+    print(f"{len(blocks)} blocks, {megabytes:.2f} MB of text")
+
+    word_tokenize = nltk_tokenizer()
+    tokenizers: Dict[str, Callable[[str], List]] = {
+        "nltk word_tokenize": word_tokenize,
+        "regex tokenize": tokenize,
+        "regex span_tokenize": span_tokenize,
+        "whitespace split": str.split,
+    }
+    reference_counts = [len(word_tokenize(block)) for block in blocks]
+    baseline = None
+
+    print(f"{'tokenizer':<22}{'seconds':>9}{'MB/s':>8}{'Mtok/s':>8}{'speedup':>9}"
+          f"{'count diff':>12}{'within 10%':>12}")
+    for name, fn in tokenizers.items():
+        elapsed = time_tokenizer(fn, blocks, args.repeat)
+        counts = [len(fn(block)) for block in blocks]
+        baseline = baseline or elapsed
+        diffs = [abs(count - reference) / max(1, reference) for count, reference in zip(counts, reference_counts)]
+        within = sum(1 for diff in diffs if diff <= 0.10) / len(diffs)
+        print(f"{name:<22}{elapsed:>9.3f}{megabytes / elapsed:>8.2f}{sum(counts) / elapsed / 1e6:>8.2f}"
+              f"{baseline / elapsed:>9.1f}x{statistics.mean(diffs):>11.1%}{within:>12.0%}")
+
+    print("\nchunks that are exact slices of their block:")
+    for tokenizer_name in ("nltk", "regex"):
+        fidelity = chunk_fidelity(blocks, args.chunk_size, args.chunk_overlap, tokenizer_name)
+        print(f"  CHUNK_TOKENIZER={tokenizer_name:<6} {fidelity:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Report on chunks the embedding model silently truncates.
+
+Chunks a corpus twice, with CHUNK_BUDGET=tokens (chunk_size counts chunking
+tokens, the previous behaviour) and CHUNK_BUDGET=model (chunk_size counts
+the embedding model's tokens and is capped at its input limit), then counts
+each chunk's model tokens and reports how many chunks exceed what the model
+encodes and how many tokens are cut off, plus the chunk count and chunking
+time of both schemes.
+
+all-MiniLM-L6-v2's tokenizer is used when transformers is installed;
+otherwise the hashing FakeEmbeddingModel is used, which counts words and so
+only exercises the code path.
+
+Usage:
+    python -m src.data_pipeline.benchmarks.truncation_report --chunk-size 256
+    python -m src.data_pipeline.benchmarks.truncation_report --files data/uscis_pdf/*.pdf
+"""
+import argparse
+import statistics
+import time
+from typing import Any, List
+
+from src.data_pipeline.benchmarks import setup_benchmark
+from src.data_pipeline.benchmarks.corpus import make_synthetic_corpus
+from src.data_pipeline.chunks import ModelTokenCounter, generate_chunks
+from src.data_pipeline.fakes import FakeEmbeddingModel
+from src.data_pipeline.process_pdf import parse_pdf_document
+
+
+def load_model(name: str) -> Any:
+    """Return the embedding model to measure with, falling back to the fake model."""
+    if name == "minilm":
+        try:
+            import transformers  # noqa: F401
+            from src.data_pipeline.embed_models.all_minilm_l6_v2 import all_minilm_l6_v2
+            return all_minilm_l6_v2()
+        except ImportError:
+            print("transformers is not installed; measuring with FakeEmbeddingModel instead")
+    return FakeEmbeddingModel()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", nargs="*", default=[], help="PDF files to chunk instead of the synthetic corpus")
+    parser.add_argument("--documents", type=int, default=6)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--chunk-overlap", type=int, default=25)
+    parser.add_argument("--model", choices=("minilm", "fake"), default="minilm")
+    args = parser.parse_args()
+    setup_benchmark()
+
+    if args.files:
+        corpus: List[bytes] = []
+        for path in args.files:
+            with open(path, "rb") as f:
+                corpus.append(f.read())
+    else:
+        corpus = make_synthetic_corpus(args.documents, args.pages)
+    documents = [[block.dict() for block in parse_pdf_document(pdf_data).blocks] for pdf_data in corpus]
+
+    model = load_model(args.model)
+    counter = ModelTokenCounter(model)
+    limit = counter.budget(10 ** 9)
+    print(f"{len(documents)} documents, model {model.get_model_name()} encodes up to {limit} tokens per chunk")
+
+    print(f"{'budget':<8}{'chunks':>8}{'truncated':>11}{'tokens lost':>13}{'max tokens':>12}"
+          f"{'mean tokens':>13}{'chunk s':>9}")
+    for budget in ("tokens", "model"):
+        texts: List[str] = []
+        start = time.perf_counter()
+        for index, blocks in enumerate(documents):
+            # generate_chunks fills in children and may re-link parents, so give it fresh copies
+            _, metadata = generate_chunks([dict(block) for block in blocks], args.chunk_size, f"doc{index}.pdf",
+                                          args.chunk_overlap, token_counter=counter if budget == "model" else None)
+            texts.extend(meta["raw_text"] for meta in metadata)
+        elapsed = time.perf_counter() - start
+
+        sizes = model.count_tokens(texts) if texts else []
+        truncated = [size for size in sizes if size > limit]
+        lost = sum(size - limit for size in truncated)
+        print(f"{budget:<8}{len(texts):>8}{len(truncated):>11}{lost:>13}{max(sizes, default=0):>12}"
+              f"{statistics.mean(sizes) if sizes else 0.0:>13.1f}{elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
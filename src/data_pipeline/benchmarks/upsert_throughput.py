@@ -0,0 +1,88 @@
+"""
+Benchmark for vector upsert throughput.
+
+Compares the per-vector upsert path (one request per chunk) with the shared
+BatchedVectorWriter against a FakeVectorIndex that simulates network latency.
+
+Usage:
+    python -m src.data_pipeline.benchmarks.upsert_throughput --docs 200 --latency 0.02
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from src.data_pipeline.embedding_batch import EmbeddingBatch
+from src.data_pipeline.fakes import FakeVectorIndex
+from src.data_pipeline.models import EmbeddingVector
+from src.data_pipeline.utils import upload_pinecone
+from src.data_pipeline.vector_writer import BatchedVectorWriter
+
+
+def make_document_vectors(doc_index: int, chunks_per_doc: int, dimension: int) -> List[EmbeddingVector]:
+    """Build the embedding vectors of one synthetic document."""
+    return [
+        EmbeddingVector(
+            id=f"doc{doc_index}-chunk{i}",
+            values=[0.01 * (i % 100)] * dimension,
+            metadata={"document_name": f"doc{doc_index}.pdf", "page": 1, "chunk_index": i,
+                      "raw_text": "Lorem ipsum dolor sit amet " * 20}
+        )
+        for i in range(chunks_per_doc)
+    ]
+
+
+def run_per_vector(documents: List[List[EmbeddingVector]], index: FakeVectorIndex, workers: int) -> float:
+    """Upsert every vector in its own request, as process_pdf_and_upload used to."""
+    def upload_document(vectors: List[EmbeddingVector]) -> None:
+        for vector in vectors:
+            upload_pinecone(index, vector)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(upload_document, documents))
+    return time.perf_counter() - start
+
+
+def run_batched(documents: List[List[EmbeddingVector]], index: FakeVectorIndex, workers: int,
+                batch_size: int, max_in_flight: int) -> float:
+    """Upsert through one shared BatchedVectorWriter, with each document as one EmbeddingBatch."""
+    documents = [EmbeddingBatch.from_vectors(vectors) for vectors in documents]
+    start = time.perf_counter()
+    with BatchedVectorWriter(index, batch_size=batch_size, max_in_flight=max_in_flight) as writer:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = list(executor.map(writer.write, documents))
+        for future in futures:
+            future.result()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=100, help="Number of synthetic documents")
+    parser.add_argument("--chunks-per-doc", type=int, default=40, help="Chunks per document")
+    parser.add_argument("--dimension", type=int, default=384, help="Vector dimension")
+    parser.add_argument("--latency", type=float, default=0.02, help="Simulated seconds per upsert request")
+    parser.add_argument("--workers", type=int, default=5, help="Ingestion worker threads")
+    parser.add_argument("--batch-size", type=int, default=100, help="Vectors per batched upsert")
+    parser.add_argument("--max-in-flight", type=int, default=4, help="Concurrent batched upserts")
+    args = parser.parse_args()
+
+    documents = [make_document_vectors(i, args.chunks_per_doc, args.dimension) for i in range(args.docs)]
+    total_vectors = args.docs * args.chunks_per_doc
+
+    per_vector_index = FakeVectorIndex(latency=args.latency)
+    per_vector_time = run_per_vector(documents, per_vector_index, args.workers)
+
+    batched_index = FakeVectorIndex(latency=args.latency)
+    batched_time = run_batched(documents, batched_index, args.workers, args.batch_size, args.max_in_flight)
+
+    print(f"{'mode':<12}{'requests':>10}{'seconds':>10}{'docs/sec':>12}{'vectors/sec':>14}")
+    for name, index, elapsed in [("per-vector", per_vector_index, per_vector_time),
+                                 ("batched", batched_index, batched_time)]:
+        print(f"{name:<12}{index.upsert_requests:>10}{elapsed:>10.2f}"
+              f"{args.docs / elapsed:>12.1f}{total_vectors / elapsed:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,207 +1,882 @@
 import json
-from nltk import word_tokenize
 import os
+import threading
 from src.data_pipeline.logger import setup_logger
-from typing import List, Dict, Any, Optional, Tuple, Union
+from typing import Callable, Iterable, Iterator, List, Dict, Any, Optional, Tuple, Union
 from src.data_pipeline.models import LayoutItem, ChunkMetadata, BlockData
+from src.data_pipeline import tokenizer
+from src.data_pipeline.metrics import get_metrics, source_from_file_name
 
 logger = setup_logger(__name__)
 
+# Chunking tokenizer: 'regex' (default, offset-preserving, see tokenizer.py) or
+# 'nltk' (word_tokenize, chunks re-joined with spaces as before)
+DEFAULT_CHUNK_TOKENIZER = 'regex'
 
-def generate_chunks(json_data: List[Union[Dict[str, Any], BlockData]], chunk_size: int, document_name: str, chunk_overlap: int = 0) -> Tuple[List[str], List[Dict[str, Any]]]:
+# Block packing: 'none' (default, one chunk per block) or 'hierarchy' (merge
+# consecutive blocks of the same section up to chunk_size, see pack_blocks)
+DEFAULT_CHUNK_PACKING = 'none'
+HEADING_TYPES = ('heading', 'subheading')
+
+# Chunk budget: 'model' (default, chunk_size and the embedding model's input
+# limit are measured in model tokens, see ModelTokenCounter) or 'tokens'
+# (chunk_size counts chunking tokens, as before)
+DEFAULT_CHUNK_BUDGET = 'model'
+DEFAULT_TOKEN_CACHE_SIZE = 200000
+# Version of the chunk vector IDs; 2 gives every chunk of a split block its own ID (see piece_id)
+CHUNK_ID_VERSION = 2
+
+# Punkt resource names: NLTK >= 3.9 loads 'punkt_tab', older releases load 'punkt'
+PUNKT_RESOURCES = ('tokenizers/punkt_tab', 'tokenizers/punkt')
+
+_tokenizer: Optional[Callable[[str], List[str]]] = None
+_tokenizer_lock = threading.Lock()
+
+
+def ensure_punkt() -> bool:
+    """
+    Makes sure the NLTK punkt tokenizer data is available, without a network call if possible.
+    
+    The data is looked up in the NLTK data path, which includes any directory
+    listed in NLTK_DATA (e.g. punkt vendored into the container image). It is
+    only downloaded when missing and NLTK_ALLOW_DOWNLOAD is not set to 0.
+    
+    Returns:
+        True if punkt is available, False otherwise
+    """
+    import nltk
+
+    for resource in PUNKT_RESOURCES:
+        try:
+            nltk.data.find(resource)
+            return True
+        except LookupError:
+            continue
+
+    if os.getenv('NLTK_ALLOW_DOWNLOAD', '1') != '1':
+        logger.warning("NLTK punkt data not found and downloads are disabled.")
+        return False
+
+    logger.info("NLTK punkt data not found locally, downloading.")
+    for resource in PUNKT_RESOURCES:
+        if nltk.download(resource.split('/')[-1], quiet=True):
+            return True
+    logger.warning("Failed to download NLTK punkt data.")
+    return False
+
+
+def get_tokenizer_name() -> str:
+    """
+    Returns the name of the tokenizer used for chunking, from CHUNK_TOKENIZER.
+    
+    The name is part of the ingestion manifest fingerprint, since changing the
+    tokenizer changes chunk boundaries.
+    
+    Returns:
+        'regex-v1' for the offset-preserving regex tokenizer, or 'nltk'
+    """
+    if os.getenv('CHUNK_TOKENIZER', DEFAULT_CHUNK_TOKENIZER) == 'nltk':
+        return 'nltk'
+    return tokenizer.TOKENIZER_NAME
+
+
+def get_chunking_signature() -> str:
+    """
+    Identifies how documents are chunked, for the ingestion manifest fingerprint.
+    
+    Returns:
+        A string that changes whenever chunk boundaries or vector IDs would
+        change for the same text, chunk_size and chunk_overlap
+    """
+    signature = f"{get_tokenizer_name()}+ids{CHUNK_ID_VERSION}"
+    if get_packing_mode() == 'hierarchy':
+        signature += '+hierarchy'
+    if get_budget_mode() == 'model':
+        signature += '+model-budget'
+    return signature
+
+
+def get_budget_mode() -> str:
+    """
+    Returns the unit chunk_size is measured in, from CHUNK_BUDGET.
+    
+    Returns:
+        'model' to measure chunks in embedding model tokens, or 'tokens'
+    """
+    return 'tokens' if os.getenv('CHUNK_BUDGET', DEFAULT_CHUNK_BUDGET) == 'tokens' else 'model'
+
+
+class ModelTokenCounter:
+    """
+    Measures chunking tokens in the embedding model's own tokens.
+    
+    Chunking tokens (words, numbers, punctuation) map to one or more model
+    tokens (wordpieces). The counter caches the number of model tokens per
+    distinct chunking token and asks the model only for unseen ones, in one
+    batched count_tokens() call per text, so a corpus with a small vocabulary
+    is measured almost entirely from the cache.
+    
+    The counter is picklable, so it can be shipped to parse worker processes;
+    the model reloads its tokenizer there on first use.
+    """
+    def __init__(self, model: Any, cache_size: Optional[int] = None):
+        """
+        Args:
+            model: Embedding model (or a wrapper such as EmbeddingBatcher) providing count_tokens,
+                max_seq_length and num_special_tokens
+            cache_size: Maximum number of cached chunking tokens
+        """
+        # Count with the model itself, not through the batcher's background thread or the cache
+        while hasattr(model, 'wrapped_model'):
+            model = model.wrapped_model
+        self._model = model
+        self._cache_size = cache_size or int(os.getenv('CHUNK_TOKEN_CACHE_SIZE', DEFAULT_TOKEN_CACHE_SIZE))
+        self._cache: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.model_name: str = self._model.get_model_name()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The cache is rebuilt in the receiving process rather than copied with every task
+        state = self.__dict__.copy()
+        state.update(_cache={}, _lock=None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def budget(self, chunk_size: int) -> int:
+        """
+        Returns the maximum number of model tokens per chunk.
+        
+        Args:
+            chunk_size: Requested maximum number of model tokens per chunk
+            
+        Returns:
+            chunk_size, lowered to what the model encodes without truncation
+        """
+        max_seq_length = getattr(self._model, 'max_seq_length', None)
+        if not max_seq_length:
+            return chunk_size
+        return max(1, min(chunk_size, max_seq_length - getattr(self._model, 'num_special_tokens', 0)))
+
+    def count_pieces(self, tokens: List[str]) -> List[int]:
+        """
+        Returns the number of model tokens of each chunking token.
+        
+        Args:
+            tokens: Chunking tokens of a text, in order
+            
+        Returns:
+            Number of model tokens of each chunking token (at least 1)
+        """
+        with self._lock:
+            cache = self._cache
+            missing = list({token for token in tokens if token not in cache})
+            if missing:
+                if len(cache) + len(missing) > self._cache_size:
+                    cache.clear()
+                for token, count in zip(missing, self._model.count_tokens(missing)):
+                    cache[token] = max(1, count)
+            return [cache[token] for token in tokens]
+
+    def count_text(self, text: str) -> int:
+        """
+        Returns the number of model tokens of a text, excluding special tokens.
+        
+        Args:
+            text: The text to measure
+            
+        Returns:
+            Number of model tokens
+        """
+        return self._model.count_tokens([text])[0]
+
+
+def get_token_counter(model: Any) -> Optional[ModelTokenCounter]:
+    """
+    Returns the token counter to chunk with for an embedding model, from CHUNK_BUDGET.
+    
+    Args:
+        model: The embedding model chunks will be encoded with
+        
+    Returns:
+        A ModelTokenCounter for the model, or None with CHUNK_BUDGET=tokens
+    """
+    if model is None or get_budget_mode() != 'model':
+        return None
+    return ModelTokenCounter(model)
+
+
+def token_windows(lengths: Optional[List[int]], token_count: int, chunk_size: int,
+                  chunk_overlap: int) -> List[Tuple[int, int]]:
+    """
+    Splits a run of tokens into windows of at most chunk_size, overlapping by chunk_overlap.
+    
+    Without lengths every token counts as one and windows start every
+    chunk_size - chunk_overlap tokens. With lengths (model tokens per
+    chunking token) windows are filled greedily up to chunk_size model tokens,
+    and each window starts with the last tokens of the previous one that fit
+    in chunk_overlap model tokens. A single token longer than chunk_size gets
+    a window of its own.
+    
+    Args:
+        lengths: Model tokens of each token, or None to count tokens
+        token_count: Number of tokens
+        chunk_size: Maximum size of a window
+        chunk_overlap: Size of the overlap between consecutive windows
+        
+    Returns:
+        List of (start, end) token index windows, end exclusive
+    """
+    if lengths is None:
+        return [(i, min(i + chunk_size, token_count))
+                for i in range(0, token_count, max(1, chunk_size - chunk_overlap))]
+
+    windows: List[Tuple[int, int]] = []
+    start = 0
+    while start < token_count:
+        end, size = start, 0
+        while end < token_count and size + lengths[end] <= chunk_size:
+            size += lengths[end]
+            end += 1
+        end = max(end, start + 1)
+        windows.append((start, end))
+        if end >= token_count:
+            break
+        next_start, overlap = end, 0
+        while next_start - 1 > start and overlap + lengths[next_start - 1] <= chunk_overlap:
+            next_start -= 1
+            overlap += lengths[next_start]
+        # Give up overlap until the next window has room for at least one new token
+        while next_start < end and overlap + lengths[end] > chunk_size:
+            overlap -= lengths[next_start]
+            next_start += 1
+        start = next_start
+    return windows
+
+
+def get_packing_mode() -> str:
+    """
+    Returns the block packing mode used for chunking, from CHUNK_PACKING.
+    
+    Returns:
+        'hierarchy' to pack consecutive blocks of a section into one chunk, or 'none'
+    """
+    return 'hierarchy' if os.getenv('CHUNK_PACKING', DEFAULT_CHUNK_PACKING) == 'hierarchy' else 'none'
+
+
+def _field(item: Any, name: str, default: Any = None) -> Any:
+    """Reads a field of a BlockData object or a block dictionary."""
+    if isinstance(item, dict):
+        return item.get(name, default)
+    # Read pydantic fields from the instance dict, so missing ones do not go through __getattr__
+    return item.__dict__.get(name, default)
+
+
+def pack_blocks(items: List[Union[Dict[str, Any], BlockData]], chunk_size: int,
+                count_tokens: Callable[[str], int]) -> List[Dict[str, Any]]:
+    """
+    Merges consecutive blocks of the same section into items of up to chunk_size tokens.
+    
+    A section is a heading or subheading together with the paragraphs whose
+    parent it is, as linked by extract_text_and_layout_from_pdf. Consecutive
+    blocks of a section are joined with newlines while the total stays within
+    chunk_size. A group made only of headings also takes in the block that
+    follows it when that block is a child of the last heading, so headings
+    are embedded together with the content they introduce. Blocks longer than
+    chunk_size stay on their own and are split by generate_chunks as before.
+    
+    Args:
+        items: BlockData objects or block dictionaries in document order, with
+            'id', 'text', 'page', 'type' and 'parent' keys
+        chunk_size: Maximum number of tokens per packed item
+        count_tokens: Function returning the number of tokens in a text
+        
+    Returns:
+        Packed items with the same keys, where 'id' is the ID of the first
+        merged block, 'parent' is the packed item containing the first block's
+        parent, 'block_ids' lists the merged blocks and 'end_page' is the page
+        of the last merged block
+    """
+    return list(iter_packed_blocks(items, chunk_size, count_tokens))
+
+
+def iter_packed_blocks(items: Iterable[Union[Dict[str, Any], BlockData]], chunk_size: int,
+                       count_tokens: Callable[[str], int]) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming form of pack_blocks: yields each packed item as soon as its group is closed.
+    
+    A group's parent always precedes its first block, so it is resolved to
+    the packed item containing it when the group is closed.
+    
+    Args:
+        items: BlockData objects or block dictionaries in document order
+        chunk_size: Maximum number of tokens per packed item
+        count_tokens: Function returning the number of tokens in a text
+        
+    Yields:
+        Packed items, as returned by pack_blocks
+    """
+    group: Optional[Dict[str, Any]] = None
+    # ID of the packed item that contains each block
+    packed_id_of: Dict[str, str] = {}
+
+    def close_group() -> Optional[Dict[str, Any]]:
+        if group is None:
+            return None
+        block_ids = group['block_ids']
+        for block_id in block_ids:
+            packed_id_of[block_id] = block_ids[0]
+        parent = group['parent']
+        return {
+            'id': block_ids[0],
+            'text': "\n".join(group['texts']),
+            'page': group['page'],
+            'end_page': group['end_page'],
+            'type': group['type'],
+            'parent': packed_id_of.get(parent) if parent is not None else None,
+            'block_ids': block_ids,
+        }
+
+    for item in items:
+        item_id = _field(item, 'id')
+        text = _field(item, 'text')
+        if text is None or not item_id:
+            # Leave malformed items to the validation in generate_chunks
+            packed = close_group()
+            if packed is not None:
+                yield packed
+            group = None
+            yield item
+            continue
+
+        text = str(text)
+        is_heading = _field(item, 'type') in HEADING_TYPES
+        parent = _field(item, 'parent')
+        page = _field(item, 'page', 1)
+        # Headings open a section; other blocks belong to their parent's section
+        section = item_id if is_heading else parent
+        tokens = count_tokens(text)
+
+        if group is not None and group['tokens'] + tokens <= chunk_size and (
+                section == group['section']
+                or (group['headings_only'] and parent == group['block_ids'][-1])):
+            group['block_ids'].append(item_id)
+            group['texts'].append(text)
+            group['tokens'] += tokens
+            group['end_page'] = page
+            group['section'] = section
+            group['headings_only'] = group['headings_only'] and is_heading
+            continue
+
+        packed = close_group()
+        if packed is not None:
+            yield packed
+        group = {
+            'block_ids': [item_id],
+            'texts': [text],
+            'tokens': tokens,
+            'page': page,
+            'end_page': page,
+            'type': _field(item, 'type'),
+            'parent': parent,
+            'section': section,
+            'headings_only': is_heading,
+        }
+    packed = close_group()
+    if packed is not None:
+        yield packed
+
+
+def get_word_tokenizer() -> Callable[[str], List[str]]:
+    """
+    Returns the word tokenizer used for chunking.
+    
+    With CHUNK_TOKENIZER=nltk, NLTK is loaded on first use and whitespace
+    tokenization is used when punkt is not available, so chunking keeps
+    working offline.
+    
+    Returns:
+        A function that splits text into tokens
+    """
+    if get_tokenizer_name() != 'nltk':
+        return tokenizer.tokenize
+
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                if ensure_punkt():
+                    from nltk import word_tokenize
+                    _tokenizer = word_tokenize
+                else:
+                    logger.warning("Using whitespace tokenization for chunking.")
+                    _tokenizer = str.split
+    return _tokenizer
+
+
+class ChunkRecord:
+    """
+    Compact chunk metadata, one per generated chunk.
+    
+    A slotted record holds the same fields as the chunk metadata dictionary
+    without a per-chunk dict, and chunks split from one block share a single
+    children list. Records are converted to dictionaries only where the
+    metadata is serialized, with to_dict().
+    
+    The id is the chunk's vector ID (see piece_id), unique within the
+    document even when a block is split into several chunks.
+    """
+    __slots__ = ('document_name', 'page', 'chunk_index', 'start_token_index', 'end_token_index',
+                 'parent', 'id', 'raw_text', 'children', 'block_ids', 'end_page')
+
+    def __init__(self, document_name: str, page: int, chunk_index: int, start_token_index: int,
+                 end_token_index: int, parent: Optional[str], id: str, raw_text: str,
+                 children: Optional[List[str]] = None, block_ids: Optional[List[str]] = None,
+                 end_page: Optional[int] = None):
+        self.document_name = document_name
+        self.page = page
+        self.chunk_index = chunk_index
+        self.start_token_index = start_token_index
+        self.end_token_index = end_token_index
+        self.parent = parent
+        self.id = id
+        self.raw_text = raw_text
+        self.children = children if children is not None else []
+        self.block_ids = block_ids
+        self.end_page = end_page
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Converts the record to the chunk metadata dictionary.
+        
+        Returns:
+            Dictionary with the ChunkMetadata fields, plus 'block_ids' and
+            'end_page' for packed chunks
+        """
+        metadata: Dict[str, Any] = {
+            'document_name': self.document_name,
+            'page': self.page,
+            'chunk_index': self.chunk_index,
+            'start_token_index': self.start_token_index,
+            'end_token_index': self.end_token_index,
+            'parent': self.parent,
+            'id': self.id,
+            'raw_text': self.raw_text,
+            'children': list(self.children),
+        }
+        if self.block_ids is not None:
+            metadata['block_ids'] = list(self.block_ids)
+            metadata['end_page'] = self.end_page
+        return metadata
+
+
+def generate_chunks(json_data: List[Union[Dict[str, Any], BlockData]], chunk_size: int, document_name: str, chunk_overlap: int = 0,
+                    packing: Optional[str] = None,
+                    token_counter: Optional[ModelTokenCounter] = None) -> Tuple[List[str], List[Dict[str, Any]]]:
     """
     Extracts text from each item in the JSON data and ensures no chunk exceeds the chunk size.
     
+    Dictionary-returning form of generate_chunk_records, which the pipeline
+    uses directly; see there for the chunking rules.
+    
     Args:
         json_data: List of dictionaries or BlockData objects containing text data
         chunk_size: Maximum number of tokens per chunk
         document_name: Name of the document being processed
         chunk_overlap: Number of tokens to overlap between chunks (default: 0)
+        packing: 'hierarchy' or 'none' (default: CHUNK_PACKING)
+        token_counter: Counter to measure chunks in model tokens (default: count chunking tokens)
         
     Returns:
         Tuple containing list of chunks and their metadata
+    """
+    records = generate_chunk_records(json_data, chunk_size, document_name, chunk_overlap, packing, token_counter)
+    return [record.raw_text for record in records], [record.to_dict() for record in records]
+
+
+def _check_chunk_parameters(chunk_size: int, chunk_overlap: int, document_name: str,
+                            token_counter: Optional[ModelTokenCounter]) -> Tuple[int, int, str]:
+    """Validates the chunking parameters and returns the effective chunk_size, chunk_overlap and document_name."""
+    if not isinstance(chunk_size, int) or chunk_size <= 0:
+        raise ValueError(f"chunk_size must be a positive integer, got {chunk_size}")
+        
+    if not isinstance(chunk_overlap, int) or chunk_overlap < 0:
+        raise ValueError(f"chunk_overlap must be a non-negative integer, got {chunk_overlap}")
+        
+    if token_counter is not None:
+        budget = token_counter.budget(chunk_size)
+        if budget < chunk_size:
+            logger.info(f"Capping chunk_size {chunk_size} at {budget} tokens, the input limit of {token_counter.model_name}.")
+        chunk_size = budget
+
+    if chunk_overlap >= chunk_size:
+        logger.warning(f"chunk_overlap ({chunk_overlap}) is greater than or equal to chunk_size ({chunk_size}). Setting overlap to chunk_size/2.")
+        chunk_overlap = chunk_size // 2
+        
+    if not document_name or not isinstance(document_name, str):
+        logger.warning(f"Invalid document_name: {document_name}. Using 'unknown_document'.")
+        document_name = "unknown_document"
+    return chunk_size, chunk_overlap, document_name
+
+
+def _pack_if_enabled(items: Iterable[Any], chunk_size: int, packing: Optional[str], use_spans: bool,
+                     token_counter: Optional[ModelTokenCounter]) -> Iterable[Any]:
+    """Wraps items in iter_packed_blocks when hierarchy packing is enabled."""
+    if (packing or get_packing_mode()) != 'hierarchy':
+        return items
+
+    def count_tokens(text: str) -> int:
+        if token_counter is not None:
+            return token_counter.count_text(text)
+        return len(tokenizer.span_tokenize(text) if use_spans else get_word_tokenizer()(text))
+    return iter_packed_blocks(items, chunk_size, count_tokens)
+
+
+def _read_block(item: Any, item_index: int) -> Optional[Tuple[str, int]]:
+    """Returns the text and page of a block, or None if it has no text."""
+    text = _field(item, 'text')
+    if text is None:
+        logger.warning(f"Item at index {item_index} missing 'text' field. Skipping.")
+        return None
+    if not isinstance(text, str):
+        logger.warning(f"Text for item at index {item_index} is not a string. Converting to string.")
+        text = str(text)
+    
+    page = _field(item, 'page')
+    if page is None:
+        logger.warning(f"Item at index {item_index} missing 'page' field. Using default page 1.")
+        page = 1
+    elif not isinstance(page, int):
+        try:
+            page = int(page)
+        except (ValueError, TypeError):
+            logger.warning(f"Invalid page number for item at index {item_index}. Using default page 1.")
+            page = 1
+    return text, page
+
+
+def piece_id(item_id: str, piece_index: int) -> str:
+    """
+    Vector ID of one chunk split from a block.
+    
+    The first chunk keeps the block ID, which parent and children links
+    refer to; later chunks get "<block ID>-<index>", so no two chunks of a
+    document overwrite each other's vector.
+    
+    Args:
+        item_id: ID of the block
+        piece_index: Position of the chunk among the block's chunks
+        
+    Returns:
+        The chunk's vector ID
+    """
+    return item_id if piece_index == 0 else f"{item_id}-{piece_index}"
+
+
+def _split_block(text: str, item_id: str, chunk_size: int, chunk_overlap: int, use_spans: bool,
+                 token_counter: Optional[ModelTokenCounter]) -> Tuple[List[Tuple[int, int, str]], int]:
+    """
+    Splits the text of one block into chunks.
+    
+    Returns:
+        (start_token_index, end_token_index, chunk text) of each chunk, and
+        the number of chunks that are still over the model's budget
+    """
+    # Character offsets of each token; chunks are sliced from the original text
+    spans: Optional[List[Tuple[int, int]]] = None
+    try:
+        if use_spans:
+            spans = tokenizer.span_tokenize(text)
+            tokens: List[Any] = spans
+        else:
+            tokens = get_word_tokenizer()(text)
+    except Exception as tokenize_error:
+        logger.error(f"Error tokenizing text for item {item_id}: {tokenize_error}")
+        # Fallback to simple space-based tokenization
+        spans = None
+        tokens = text.split()
+        logger.info(f"Falling back to simple tokenization for item {item_id}")
+    
+    logger.debug(f"Processing item with ID: {item_id}, token count: {len(tokens)}")
+
+    # Model tokens per chunking token, when chunks are measured in model tokens
+    lengths: Optional[List[int]] = None
+    if token_counter is not None:
+        token_texts = [text[a:b] for a, b in spans] if spans is not None else [str(t) for t in tokens]
+        lengths = token_counter.count_pieces(token_texts)
+    size = sum(lengths) if lengths is not None else len(tokens)
+
+    if size > chunk_size:
+        logger.info(f"Text exceeds chunk size, splitting into chunks for item ID: {item_id}")
+        windows = token_windows(lengths, len(tokens), chunk_size, chunk_overlap)
+    else:
+        # The entire text fits within chunk_size
+        windows = [(0, len(tokens))]
+
+    pieces: List[Tuple[int, int, str]] = []
+    over_budget = 0
+    for start, end in windows:
+        try:
+            if len(windows) == 1:
+                chunk: str = text
+            elif spans is not None:
+                # Exact slice of the block text, punctuation and spacing included
+                chunk = text[spans[start][0]:spans[end - 1][1]]
+            else:
+                # Reconstruct text from tokens for this chunk
+                chunk = " ".join(tokens[start:end])
+
+            if lengths is not None and sum(lengths[start:end]) > chunk_size:
+                # Only a single token longer than the budget gets here
+                over_budget += 1
+                logger.warning(f"A chunk of item {item_id} has {sum(lengths[start:end])} model tokens "
+                               f"and will be truncated to {chunk_size} when embedded.")
+            pieces.append((start, end - 1, chunk))
+        except Exception as chunk_error:
+            logger.error(f"Error creating chunk at index {start} for item {item_id}: {chunk_error}")
+    return pieces, over_budget
+
+
+def generate_chunk_records(json_data: List[Union[Dict[str, Any], BlockData]], chunk_size: int, document_name: str,
+                           chunk_overlap: int = 0, packing: Optional[str] = None,
+                           token_counter: Optional[ModelTokenCounter] = None) -> List[ChunkRecord]:
+    """
+    Splits each block into chunks of at most chunk_size tokens.
+    
+    BlockData objects are read as they are, without converting them to
+    dictionaries, and the input items are not modified. Children are linked
+    to their parent in one linear pass.
+    
+    With hierarchy packing, consecutive blocks of the same section are first
+    merged into chunks of up to chunk_size tokens (see pack_blocks), and the
+    chunk records additionally carry the merged block_ids and the end_page
+    of the page span.
+    
+    With a token_counter, chunk_size and chunk_overlap are measured in the
+    embedding model's tokens and chunk_size is capped at the model's input
+    limit, so no chunk is silently truncated when it is embedded. Chunks are
+    still cut at chunking-token boundaries and start_token_index and
+    end_token_index still index chunking tokens.
+    
+    Args:
+        json_data: List of dictionaries or BlockData objects containing text data
+        chunk_size: Maximum number of tokens per chunk
+        document_name: Name of the document being processed
+        chunk_overlap: Number of tokens to overlap between chunks (default: 0)
+        packing: 'hierarchy' or 'none' (default: CHUNK_PACKING)
+        token_counter: Counter to measure chunks in model tokens (default: count chunking tokens)
+        
+    Returns:
+        Chunk records in document order
         
     Raises:
         ValueError: If input parameters are invalid
-        KeyError: If required fields are missing in json_data
-        Exception: For other unexpected errors
     """
     try:
         # Validate input parameters
         if not json_data:
             logger.warning("Empty JSON data provided. Returning empty results.")
-            return [], []
+            return []
             
         if not isinstance(json_data, list):
             raise ValueError(f"json_data must be a list, got {type(json_data).__name__}")
             
-        if not isinstance(chunk_size, int) or chunk_size <= 0:
-            raise ValueError(f"chunk_size must be a positive integer, got {chunk_size}")
-            
-        if not isinstance(chunk_overlap, int) or chunk_overlap < 0:
-            raise ValueError(f"chunk_overlap must be a non-negative integer, got {chunk_overlap}")
-            
-        if chunk_overlap >= chunk_size:
-            logger.warning(f"chunk_overlap ({chunk_overlap}) is greater than or equal to chunk_size ({chunk_size}). Setting overlap to chunk_size/2.")
-            chunk_overlap = chunk_size // 2
-            
-        if not document_name or not isinstance(document_name, str):
-            logger.warning(f"Invalid document_name: {document_name}. Using 'unknown_document'.")
-            document_name = "unknown_document"
+        chunk_size, chunk_overlap, document_name = _check_chunk_parameters(chunk_size, chunk_overlap,
+                                                                           document_name, token_counter)
         
         logger.info("Starting to generate chunks.")
-        chunks: List[str] = []
-        metadata: List[Dict[str, Any]] = []
-        parent_map: Dict[str, Dict[str, Any]] = {}  
-        
-        # Track processed IDs to detect duplicates
-        processed_ids = set()
-
-        # Convert BlockData objects to dictionaries
-        processed_data = []
-        for item in json_data:
-            if isinstance(item, BlockData):
-                processed_data.append(item.dict())
-            else:
-                processed_data.append(item)
+        records: List[ChunkRecord] = []
+        # Item ID of every record, whose children the record carries
+        record_items: List[str] = []
+        # Children of each item, as an insertion-ordered set so linking stays linear
+        children: Dict[str, Dict[str, None]] = {}
+        # Chunks that will still be truncated by the embedding model
+        over_budget = 0
+        use_spans = get_tokenizer_name() != 'nltk'
 
-        # Initialize parent_map with all items
-        for item in processed_data:
-            try:
-                if not isinstance(item, dict):
-                    logger.error(f"Item is not a dictionary: {type(item)}")
-                    continue
-                    
-                item_id = item.get('id')
-                if not item_id:
-                    logger.warning(f"Item without ID found. Generating a unique ID.")
-                    item_id = f"generated_id_{len(processed_ids)}"
-                    item['id'] = item_id
-                
-                if item_id in processed_ids:
-                    logger.warning(f"Duplicate ID found: {item_id}. This may cause issues with parent-child relationships.")
-                
-                processed_ids.add(item_id)
-                parent_map[item_id] = {'children': []}
-            except Exception as e:
-                logger.error(f"Error during parent_map initialization for item: {e}")
-                
+        items = list(_pack_if_enabled(json_data, chunk_size, packing, use_spans, token_counter))
+        if len(items) != len(json_data):
+            logger.info(f"Packed {len(json_data)} blocks into {len(items)} items.")
 
-        for item_index, item in enumerate(processed_data):
+        # Assign IDs up front, so parents can be validated against every item
+        item_ids: List[Optional[str]] = []
+        for item in items:
+            if not isinstance(item, (dict, BlockData)):
+                logger.error(f"Item is not a dictionary: {type(item)}")
+                item_ids.append(None)
+                continue
+            item_id = _field(item, 'id')
+            if not item_id:
+                logger.warning(f"Item without ID found. Generating a unique ID.")
+                item_id = f"generated_id_{len(children)}"
+            if item_id in children:
+                logger.warning(f"Duplicate ID found: {item_id}. This may cause issues with parent-child relationships.")
+            children.setdefault(item_id, {})
+            item_ids.append(item_id)
+
+        for item_index, (item, item_id) in enumerate(zip(items, item_ids)):
+            if item_id is None:
+                continue
             try:
-                # Validate required fields
-                if 'text' not in item:
-                    logger.warning(f"Item at index {item_index} missing 'text' field. Skipping.")
+                block = _read_block(item, item_index)
+                if block is None:
                     continue
-                    
-                if 'page' not in item:
-                    logger.warning(f"Item at index {item_index} missing 'page' field. Using default page 1.")
-                    item['page'] = 1
-                
-                text: str = item['text']
-                if not isinstance(text, str):
-                    logger.warning(f"Text for item at index {item_index} is not a string. Converting to string.")
-                    text = str(text)
-                
-                page: int = item['page']
-                if not isinstance(page, int):
-                    try:
-                        page = int(page)
-                    except (ValueError, TypeError):
-                        logger.warning(f"Invalid page number for item at index {item_index}. Using default page 1.")
-                        page = 1
-                
-                parent: Optional[str] = item.get('parent', None)  
-                item_id: str = item.get('id')
+                text, page = block
                 
                 # Validate parent reference
-                if parent is not None and parent not in parent_map:
+                parent: Optional[str] = _field(item, 'parent')
+                if parent is not None and parent not in children:
                     logger.warning(f"Item {item_id} references non-existent parent {parent}. Setting parent to None.")
                     parent = None
                 
-                try:
-                    tokens: List[str] = word_tokenize(text)
-                except Exception as tokenize_error:
-                    logger.error(f"Error tokenizing text for item {item_id}: {tokenize_error}")
-                    # Fallback to simple space-based tokenization
-                    tokens = text.split()
-                    logger.info(f"Falling back to simple tokenization for item {item_id}")
-                
-                logger.debug(f"Processing item with ID: {item_id}, page: {page}, token count: {len(tokens)}")
-
-                if len(tokens) > chunk_size:
-                    logger.info(f"Text exceeds chunk size, splitting into chunks for item ID: {item_id}")
-                   
-                    # Calculate chunk positions with overlap
-                    for i in range(0, len(tokens), max(1, chunk_size - chunk_overlap)):
-                        try:
-                            chunk_tokens: List[str] = tokens[i : min(i + chunk_size, len(tokens))]
-                            # Reconstruct text from tokens for this chunk
-                            chunk: str = " ".join(chunk_tokens)
-                            
-                            chunk_metadata: Dict[str, Any] = {
-                                'document_name': document_name,
-                                'page': page,
-                                'chunk_index': len(chunks),
-                                'start_token_index': i,
-                                'end_token_index': min(i + chunk_size, len(tokens)) - 1,
-                                'parent': parent,
-                                'id': item_id,
-                                'raw_text': chunk,
-                                'children': [] 
-                            }
-                            chunks.append(chunk)
-                            metadata.append(chunk_metadata)
-                            
-                            # Add child to parent's children list
-                            if parent is not None and parent in parent_map:
-                                if item_id not in parent_map[parent]['children']:
-                                    parent_map[parent]['children'].append(item_id)
-                        except Exception as chunk_error:
-                            logger.error(f"Error creating chunk at index {i} for item {item_id}: {chunk_error}")
+                pieces, item_over_budget = _split_block(text, item_id, chunk_size, chunk_overlap, use_spans,
+                                                        token_counter)
+                over_budget += item_over_budget
+                block_ids = _field(item, 'block_ids')
+                end_page = _field(item, 'end_page')
+                for piece_index, (start, end, chunk) in enumerate(pieces):
+                    records.append(ChunkRecord(document_name, page, len(records), start, end, parent,
+                                               piece_id(item_id, piece_index), chunk, block_ids=block_ids,
+                                               end_page=end_page))
+                    record_items.append(item_id)
 
-                else:
-                    # The entire text fits within chunk_size
-                    try:
-                        chunk = text
-                        chunk_metadata: Dict[str, Any] = {
-                            'document_name': document_name,
-                            'page': page,
-                            'chunk_index': len(chunks),
-                            'start_token_index': 0,
-                            'end_token_index': len(tokens) - 1,
-                            'parent': parent,
-                            'id': item_id,
-                            'raw_text': chunk,
-                            'children': []
-                        }
-                        chunks.append(chunk)
-                        metadata.append(chunk_metadata)
-
-                        # Add child to parent's children list
-                        if parent is not None and parent in parent_map:
-                            if item_id not in parent_map[parent]['children']:
-                                parent_map[parent]['children'].append(item_id)
-                    except Exception as chunk_error:
-                        logger.error(f"Error creating chunk for item {item_id}: {chunk_error}")
+                # Add child to parent's children set
+                if parent is not None:
+                    children[parent][item_id] = None
             
             except Exception as item_error:
                 logger.error(f"Error processing item at index {item_index}: {item_error}")
                 continue
 
-        # Update metadata with children information from parent_map
-        try:
-            for meta in metadata:
-                item_id = meta.get('id')
-                if item_id and item_id in parent_map:
-                    meta['children'] = parent_map[item_id]['children']
-        except Exception as meta_error:
-            logger.error(f"Error updating metadata with children information: {meta_error}")
+        # Fill in children; chunks of the same item share one list
+        child_lists: Dict[str, List[str]] = {}
+        for record, item_id in zip(records, record_items):
+            child_list = child_lists.get(item_id)
+            if child_list is None:
+                child_list = child_lists[item_id] = list(children.get(item_id, ()))
+            record.children = child_list
 
-        logger.info(f"Generated {len(chunks)} chunks from the document.")
-        return chunks, metadata
+        if over_budget:
+            get_metrics().increment('chunks_over_budget', source_from_file_name(document_name), over_budget)
+        logger.info(f"Generated {len(records)} chunks from the document.")
+        return records
         
     except Exception as e:
         logger.error(f"Unexpected error in generate_chunks: {e}")
         # Return empty results on error
-        return [], []
+        return []
+
+
+def iter_chunk_records(blocks: Iterable[Union[Dict[str, Any], BlockData]], chunk_size: int, document_name: str,
+                       chunk_overlap: int = 0, packing: Optional[str] = None,
+                       token_counter: Optional[ModelTokenCounter] = None) -> Iterator[ChunkRecord]:
+    """
+    Streaming form of generate_chunk_records: yields chunks as soon as they are final.
+    
+    Blocks are consumed one at a time, so blocks can be produced page by page
+    (see iter_pdf_pages) and chunks embedded while the rest of the document is
+    still being parsed. A chunk is final once its children are known. Chunks
+    of headings and subheadings are therefore held back until their section
+    ends: a heading closes every open section, a subheading closes the open
+    subheadings. All other chunks are yielded right away, so memory is bounded
+    by the open sections rather than by the document.
+    
+    Chunks are yielded in the order they become final, which is not document
+    order; chunk_index still numbers them in document order. Parents must
+    precede their children, as they do in parsed documents; a reference to a
+    block that was not seen yet is dropped. Children are only tracked for
+    headings and subheadings.
+    
+    Args:
+        blocks: Dictionaries or BlockData objects in document order
+        chunk_size: Maximum number of tokens per chunk
+        document_name: Name of the document being processed
+        chunk_overlap: Number of tokens to overlap between chunks (default: 0)
+        packing: 'hierarchy' or 'none' (default: CHUNK_PACKING)
+        token_counter: Counter to measure chunks in model tokens (default: count chunking tokens)
+        
+    Yields:
+        Chunk records, each with its final children list
+        
+    Raises:
+        ValueError: If input parameters are invalid
+    """
+    chunk_size, chunk_overlap, document_name = _check_chunk_parameters(chunk_size, chunk_overlap,
+                                                                       document_name, token_counter)
+    use_spans = get_tokenizer_name() != 'nltk'
+    # IDs of the blocks seen so far, to validate parent references
+    seen_ids: set = set()
+    # Open sections: heading or subheading ID -> (type, held chunks, children as an ordered set)
+    open_sections: Dict[str, Tuple[str, List[ChunkRecord], Dict[str, None]]] = {}
+    chunk_count = 0
+    over_budget = 0
+
+    def close_sections(types: Tuple[str, ...]) -> List[ChunkRecord]:
+        closed: List[ChunkRecord] = []
+        for section_id in [key for key, section in open_sections.items() if section[0] in types]:
+            _, held, section_children = open_sections.pop(section_id)
+            child_list = list(section_children)
+            for record in held:
+                record.children = child_list
+            closed.extend(held)
+        return closed
+
+    items = _pack_if_enabled(blocks, chunk_size, packing, use_spans, token_counter)
+    for item_index, item in enumerate(items):
+        if not isinstance(item, (dict, BlockData)):
+            logger.error(f"Item is not a dictionary: {type(item)}")
+            continue
+        item_id = _field(item, 'id')
+        if not item_id:
+            logger.warning(f"Item without ID found. Generating a unique ID.")
+            item_id = f"generated_id_{item_index}"
+        if item_id in seen_ids:
+            logger.warning(f"Duplicate ID found: {item_id}. This may cause issues with parent-child relationships.")
+        seen_ids.add(item_id)
+
+        # A new heading ends every open section, a new subheading ends the open subheadings
+        item_type = _field(item, 'type')
+        if item_type == 'heading':
+            yield from close_sections(HEADING_TYPES)
+        elif item_type == 'subheading':
+            yield from close_sections(('subheading',))
+
+        try:
+            block = _read_block(item, item_index)
+            if block is None:
+                continue
+            text, page = block
+
+            parent: Optional[str] = _field(item, 'parent')
+            if parent is not None and parent not in seen_ids:
+                logger.warning(f"Item {item_id} references non-existent parent {parent}. Setting parent to None.")
+                parent = None
+
+            pieces, item_over_budget = _split_block(text, item_id, chunk_size, chunk_overlap, use_spans,
+                                                    token_counter)
+            over_budget += item_over_budget
+            block_ids = _field(item, 'block_ids')
+            end_page = _field(item, 'end_page')
+            records = []
+            for piece_index, (start, end, chunk) in enumerate(pieces):
+                records.append(ChunkRecord(document_name, page, chunk_count, start, end, parent,
+                                           piece_id(item_id, piece_index), chunk, block_ids=block_ids,
+                                           end_page=end_page))
+                chunk_count += 1
+
+            if parent is not None and parent in open_sections:
+                open_sections[parent][2][item_id] = None
+            if item_type in HEADING_TYPES:
+                open_sections[item_id] = (item_type, records, {})
+            else:
+                yield from records
+        except Exception as item_error:
+            logger.error(f"Error processing item at index {item_index}: {item_error}")
+            continue
+
+    yield from close_sections(HEADING_TYPES)
+    if over_budget:
+        get_metrics().increment('chunks_over_budget', source_from_file_name(document_name), over_budget)
+    logger.info(f"Streamed {chunk_count} chunks from the document.")
@@ -159,4 +159,31 @@ def document_exists(filename: str) -> bool:
         return result is not None
     except Exception as e:
         logger.error(f"Error checking if document exists: {str(e)}")
-        return False
\ No newline at end of file
+        return False
+
+def delete_documents(filename: str) -> bool:
+    """
+    Delete all documents stored under the given filename.
+    
+    Used when a source document has changed and its stored text must be replaced.
+    
+    Args:
+        filename: The filename whose documents should be deleted
+        
+    Returns:
+        True if the deletion was successful, False otherwise
+    """
+    try:
+        engine = get_db_engine()
+        Session = sessionmaker(bind=engine)
+        session = Session()
+        
+        deleted = session.query(Document).filter(Document.filename == filename).delete()
+        session.commit()
+        session.close()
+        
+        logger.info(f"Deleted {deleted} stored document(s) for '{filename}'")
+        return True
+    except Exception as e:
+        logger.error(f"Error deleting documents from PostgreSQL: {str(e)}")
+        return False
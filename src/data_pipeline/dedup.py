@@ -0,0 +1,534 @@
+"""
+Corpus-wide near-duplicate chunk detection for the TeacherBot data pipeline.
+
+Many USCIS instruction PDFs repeat the same boilerplate (fee, biometrics,
+signature and penalty sections). The ChunkDeduplicator sits between chunking
+and embedding: every chunk is looked up in a corpus-wide index, first by the
+hash of its normalized text (exact duplicates) and then by MinHash
+signatures bucketed with locality-sensitive hashing (near-duplicates). Only
+the first copy of a chunk, the canonical chunk, is embedded and upserted;
+later copies reference its vector, and the index keeps the set of source
+documents that contain each canonical chunk. A copy found while the
+canonical vector is not upserted yet is written again under the same ID,
+so it is not lost if the document that owns it fails.
+
+A canonical vector is deleted only once no document references it any
+more, so deleting or changing one document never removes text another
+document shares. The index is a JSON document stored in the GCS bucket next
+to the ingestion manifest (or on local disk when no bucket is given).
+"""
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from src.data_pipeline.chunks import ChunkRecord
+from src.data_pipeline.logger import setup_logger
+from src.data_pipeline.metrics import get_metrics, source_from_file_name
+
+logger = setup_logger(__name__)
+
+DEFAULT_DEDUP_BLOB = "manifests/dedup_index.json"
+DEDUP_VERSION = 1
+
+_WHITESPACE = re.compile(r"\s+")
+_NUMBER = re.compile(r"\d[\d,./-]*")
+
+
+def dedup_enabled() -> bool:
+    """Whether chunks are deduplicated across the corpus, from CHUNK_DEDUP."""
+    return os.getenv("CHUNK_DEDUP", "1") == "1"
+
+
+def get_dedup_signature() -> str:
+    """
+    Describe the deduplication settings for the manifest fingerprint.
+
+    Turning deduplication on or off, or changing its threshold, changes
+    which vectors a document owns, so documents are re-indexed.
+
+    Returns:
+        "" when deduplication is disabled, otherwise e.g. "+dedup0.85"
+    """
+    if not dedup_enabled():
+        return ""
+    return f"+dedup{float(os.getenv('CHUNK_DEDUP_THRESHOLD', '0.85')):g}"
+
+
+def normalize_text(text: str) -> str:
+    """Case-fold a chunk and collapse its whitespace, so layout differences do not matter."""
+    return _WHITESPACE.sub(" ", text.casefold()).strip()
+
+
+def content_key(normalized: str) -> str:
+    """Return the exact-duplicate key of a normalized chunk."""
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class MinHasher:
+    """
+    MinHash signatures over word shingles.
+
+    Each of the num_perm hash functions is a random odd multiplier and offset
+    applied to the CRC32 of a shingle modulo 2**32, computed for all
+    shingles at once with numpy. The fraction of equal signature positions
+    estimates the Jaccard similarity of two chunks' shingle sets.
+    """
+    def __init__(self, num_perm: int = 64, shingle_size: int = 3, seed: int = 1):
+        """
+        Args:
+            num_perm: Number of hash functions (signature length)
+            shingle_size: Number of consecutive words per shingle
+            seed: Seed of the hash functions; signatures are only comparable with the same seed
+        """
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a = rng.randint(1, 2 ** 32, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.randint(0, 2 ** 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, normalized: str) -> np.ndarray:
+        """
+        Compute the signature of a normalized chunk.
+
+        Args:
+            normalized: Text from normalize_text()
+
+        Returns:
+            A uint32 array of length num_perm
+        """
+        words = normalized.split(" ")
+        size = self.shingle_size
+        shingles = {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        # uint64 products wrap around; the low 32 bits are the hash modulo 2**32
+        values = (hashes[:, None] * self._a + self._b) & np.uint64(0xFFFFFFFF)
+        return values.min(axis=0).astype(np.uint32)
+
+
+class _Entry:
+    """A canonical chunk: its vector and the documents that contain it."""
+    __slots__ = ("vector_id", "documents", "embedded", "owner", "numbers")
+
+    def __init__(self, vector_id: str, documents: Set[str], embedded: bool, owner: Optional[str],
+                 numbers: str):
+        self.vector_id = vector_id
+        self.documents = documents
+        # The vector was upserted; until then only the owner's ingestion writes it
+        self.embedded = embedded
+        self.owner = owner
+        self.numbers = numbers
+
+
+class DedupSession:
+    """
+    Deduplication state of one document while it is being ingested.
+
+    Created by ChunkDeduplicator.start(). filter() may be called once with
+    all chunks of the document or once per batch when streaming; commit()
+    is called once the kept chunks are upserted and abort() if ingestion
+    fails.
+    """
+    def __init__(self, deduplicator: "ChunkDeduplicator", document_name: str, previous_ids: Iterable[str]):
+        self.deduplicator = deduplicator
+        self.document_name = document_name
+        self.previous_ids: Set[str] = set(previous_ids)
+        # Chunk ID -> vector IDs that now hold its text, as an ordered set
+        self.aliases: Dict[str, Dict[str, None]] = {}
+        # Canonical vector IDs this document references but does not write, as an ordered set
+        self.shared: Dict[str, None] = {}
+        # Entries referenced in this session
+        self.keys: Set[str] = set()
+        # Entries whose canonical vector this document writes
+        self.written: Set[str] = set()
+        self.deduplicated = 0
+
+    @property
+    def shared_vector_ids(self) -> List[str]:
+        """IDs of the canonical vectors of this document's duplicate chunks."""
+        return list(self.shared)
+
+    def filter(self, records: List[Any]) -> List[Any]:
+        """
+        Drop the chunks that duplicate a canonical chunk.
+
+        Args:
+            records: ChunkRecords or chunk metadata dictionaries of the document
+
+        Returns:
+            The chunks to embed, with children that were deduplicated pointing
+            at their canonical vectors
+        """
+        return self.deduplicator._filter(self, records)
+
+    def commit(self) -> None:
+        """Mark the canonical chunks this document wrote as embedded."""
+        self.deduplicator._commit(self)
+
+    def abort(self) -> None:
+        """Drop the references this failed attempt added."""
+        self.deduplicator._abort(self)
+
+    def release(self, vector_ids: Iterable[str]) -> List[str]:
+        """Release vectors the document no longer uses; see ChunkDeduplicator.release()."""
+        return self.deduplicator.release(self.document_name, vector_ids)
+
+
+def _read(record: Any, name: str) -> Any:
+    return getattr(record, name) if isinstance(record, ChunkRecord) else record.get(name)
+
+
+class ChunkDeduplicator:
+    """
+    Thread-safe corpus-wide index of canonical chunks.
+
+    Chunks are matched exactly on their normalized text, then approximately:
+    MinHash signatures are split into CHUNK_DEDUP_BANDS bands, chunks sharing
+    any band are candidates, and a candidate is a duplicate if the estimated
+    Jaccard similarity of their word shingles reaches CHUNK_DEDUP_THRESHOLD
+    and they contain the same numbers, so a form whose fee or deadline
+    differs keeps its own chunk. Chunks with children (headings whose
+    sections are linked through them) and chunks shorter than
+    CHUNK_DEDUP_MIN_WORDS words are never deduplicated.
+    """
+    def __init__(self, bucket: Optional[Any] = None, blob_name: Optional[str] = None,
+                 path: Optional[str] = None, threshold: Optional[float] = None,
+                 num_perm: Optional[int] = None, bands: Optional[int] = None,
+                 shingle_size: Optional[int] = None, min_words: Optional[int] = None):
+        """
+        Args:
+            bucket: GCS bucket to store the index in
+            blob_name: Name of the index blob in the bucket
+            path: Local file path to store the index in when no bucket is given
+            threshold: Minimum estimated Jaccard similarity of near-duplicates
+            num_perm: MinHash signature length
+            bands: Number of LSH bands; must divide num_perm
+            shingle_size: Words per shingle
+            min_words: Minimum words of a chunk to be deduplicated
+        """
+        self._bucket = bucket
+        self._blob_name = blob_name or os.getenv("CHUNK_DEDUP_BLOB", DEFAULT_DEDUP_BLOB)
+        self._path = path or os.getenv("CHUNK_DEDUP_PATH", "")
+        self.threshold = threshold if threshold is not None else float(os.getenv("CHUNK_DEDUP_THRESHOLD", "0.85"))
+        num_perm = num_perm or int(os.getenv("CHUNK_DEDUP_NUM_PERM", "64"))
+        self.bands = bands or int(os.getenv("CHUNK_DEDUP_BANDS", "16"))
+        if num_perm % self.bands:
+            raise ValueError(f"CHUNK_DEDUP_BANDS ({self.bands}) must divide CHUNK_DEDUP_NUM_PERM ({num_perm})")
+        self._rows = num_perm // self.bands
+        self.min_words = min_words if min_words is not None else int(os.getenv("CHUNK_DEDUP_MIN_WORDS", "8"))
+        self._hasher = MinHasher(num_perm, shingle_size or int(os.getenv("CHUNK_DEDUP_SHINGLE_SIZE", "3")))
+
+        self._entries: Dict[str, _Entry] = {}
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._buckets: Dict[Tuple[int, bytes], List[str]] = {}
+        self._by_vector_id: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    def _config(self) -> Dict[str, int]:
+        return {"num_perm": self._hasher.num_perm, "bands": self.bands,
+                "shingle_size": self._hasher.shingle_size}
+
+    def load(self) -> "ChunkDeduplicator":
+        """
+        Load the index from storage. A missing or unreadable index starts empty.
+
+        Signatures computed with different MinHash settings are dropped, so
+        their chunks are only matched exactly; their references are kept.
+
+        Returns:
+            The index itself, for chaining
+        """
+        try:
+            raw: Optional[str] = None
+            if self._bucket is not None:
+                blob = self._bucket.blob(self._blob_name)
+                if blob.exists():
+                    raw = blob.download_as_text()
+            elif self._path and os.path.exists(self._path):
+                with open(self._path, "r", encoding="utf-8") as f:
+                    raw = f.read()
+
+            if raw:
+                data = json.loads(raw)
+                if data.get("version") == DEDUP_VERSION:
+                    same_config = data.get("config") == self._config()
+                    if not same_config:
+                        logger.warning("MinHash settings changed; near-duplicate matching restarts "
+                                       "for indexed chunks")
+                    with self._lock:
+                        for key, item in data.get("chunks", {}).items():
+                            # An unfinished owner did not survive the restart; the next copy takes over
+                            entry = _Entry(item["vector_id"], set(item["documents"]), item["embedded"], None,
+                                           item.get("numbers", ""))
+                            signature = None
+                            if same_config and item.get("signature"):
+                                signature = np.frombuffer(base64.b64decode(item["signature"]), dtype=np.uint32)
+                            self._add_entry(key, entry, signature)
+                else:
+                    logger.warning(f"Ignoring dedup index with unsupported version {data.get('version')}")
+            logger.info(f"Loaded dedup index with {len(self._entries)} canonical chunk(s)")
+        except Exception as e:
+            logger.error(f"Failed to load dedup index, starting empty: {str(e)}")
+            self._entries, self._signatures, self._buckets, self._by_vector_id = {}, {}, {}, {}
+        return self
+
+    def save(self) -> bool:
+        """
+        Write the index back to storage if it changed.
+
+        Returns:
+            True if the index is persisted, False otherwise
+        """
+        with self._lock:
+            if not self._dirty:
+                return True
+            chunks = {}
+            for key, entry in self._entries.items():
+                signature = self._signatures.get(key)
+                chunks[key] = {
+                    "vector_id": entry.vector_id,
+                    "documents": sorted(entry.documents),
+                    "embedded": entry.embedded,
+                    "numbers": entry.numbers,
+                    "signature": base64.b64encode(signature.tobytes()).decode("ascii") if signature is not None else "",
+                }
+            payload = json.dumps({"version": DEDUP_VERSION, "config": self._config(), "chunks": chunks})
+            self._dirty = False
+        try:
+            if self._bucket is not None:
+                self._bucket.blob(self._blob_name).upload_from_string(payload, content_type="application/json")
+            elif self._path:
+                tmp_path = f"{self._path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(payload)
+                os.replace(tmp_path, self._path)
+            else:
+                logger.warning("No dedup index location configured; dedup index not saved")
+                return False
+            logger.info(f"Saved dedup index with {len(chunks)} canonical chunk(s)")
+            return True
+        except Exception as e:
+            with self._lock:
+                self._dirty = True
+            logger.error(f"Failed to save dedup index: {str(e)}")
+            return False
+
+    def start(self, document_name: str, previous_ids: Iterable[str] = ()) -> DedupSession:
+        """
+        Start deduplicating a document.
+
+        Args:
+            document_name: Blob name of the document
+            previous_ids: Vector IDs recorded for the document's previous version, kept if the attempt fails
+
+        Returns:
+            The document's session
+        """
+        return DedupSession(self, document_name, previous_ids)
+
+    def _add_entry(self, key: str, entry: _Entry, signature: Optional[np.ndarray]) -> None:
+        self._entries[key] = entry
+        self._by_vector_id.setdefault(entry.vector_id, set()).add(key)
+        if signature is not None:
+            self._signatures[key] = signature
+            for band, rows in self._bands(signature):
+                self._buckets.setdefault((band, rows), []).append(key)
+
+    def _remove_entry(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        keys = self._by_vector_id.get(entry.vector_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_vector_id[entry.vector_id]
+        signature = self._signatures.pop(key, None)
+        if signature is not None:
+            for band_key in self._bands(signature):
+                members = self._buckets.get(band_key)
+                if members is not None and key in members:
+                    members.remove(key)
+                    if not members:
+                        del self._buckets[band_key]
+
+    def _bands(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        rows = self._rows
+        return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(self.bands)]
+
+    def _find_similar(self, signature: np.ndarray, numbers: str) -> Optional[str]:
+        """Return the key of the most similar canonical chunk at or above the threshold, if any."""
+        candidates: Dict[str, None] = {}
+        for band_key in self._bands(signature):
+            for key in self._buckets.get(band_key, ()):
+                candidates[key] = None
+        best_key, best = None, self.threshold
+        for key in candidates:
+            if self._entries[key].numbers != numbers:
+                continue
+            similarity = float(np.count_nonzero(self._signatures[key] == signature)) / len(signature)
+            if similarity >= best:
+                best_key, best = key, similarity
+        return best_key
+
+    def _filter(self, session: DedupSession, records: List[Any]) -> List[Any]:
+        document_name = session.document_name
+        kept: List[Any] = []
+        deduplicated = 0
+        with self._lock:
+            for record in records:
+                record_id = _read(record, "id")
+                text = _read(record, "raw_text") or ""
+                normalized = normalize_text(text)
+                if _read(record, "children") or normalized.count(" ") + 1 < self.min_words:
+                    kept.append(record)
+                    session.aliases.setdefault(record_id, {})[record_id] = None
+                    continue
+
+                key = content_key(normalized)
+                numbers = " ".join(_NUMBER.findall(normalized))
+                entry = self._entries.get(key)
+                signature = None
+                if entry is None:
+                    signature = self._hasher.signature(normalized)
+                    similar_key = self._find_similar(signature, numbers)
+                    if similar_key is not None:
+                        key, entry = similar_key, self._entries[similar_key]
+
+                if entry is None:
+                    # First copy in the corpus: this document writes the canonical vector
+                    entry = _Entry(record_id, {document_name}, False, document_name, numbers)
+                    self._add_entry(key, entry, signature)
+                    session.written.add(key)
+                    kept.append(record)
+                elif not entry.embedded and entry.owner != document_name and key not in session.written:
+                    # The canonical vector is not upserted yet and its owner failed, or may still fail
+                    # after this document is done; write it too, under the same vector ID
+                    if entry.owner is None:
+                        entry.owner = document_name
+                    entry.documents.add(document_name)
+                    session.written.add(key)
+                    record = self._with_id(record, entry.vector_id)
+                    kept.append(record)
+                else:
+                    entry.documents.add(document_name)
+                    if entry.owner != document_name:
+                        session.shared[entry.vector_id] = None
+                    deduplicated += 1
+                session.keys.add(key)
+                session.aliases.setdefault(record_id, {})[entry.vector_id] = None
+            self._dirty = True
+
+        # Children that were deduplicated point at the vectors that hold their text
+        for record in kept:
+            children = _read(record, "children")
+            if not children:
+                continue
+            remapped = list(dict.fromkeys(vector_id for child in children
+                                          for vector_id in session.aliases.get(child, (child,))))
+            if remapped != children:
+                if isinstance(record, ChunkRecord):
+                    record.children = remapped
+                else:
+                    record["children"] = remapped
+
+        if deduplicated:
+            session.deduplicated += deduplicated
+            get_metrics().increment("chunks_deduplicated", source_from_file_name(document_name), deduplicated)
+        return kept
+
+    @staticmethod
+    def _with_id(record: Any, vector_id: str) -> Any:
+        if isinstance(record, ChunkRecord):
+            return ChunkRecord(record.document_name, record.page, record.chunk_index, record.start_token_index,
+                               record.end_token_index, record.parent, vector_id, record.raw_text,
+                               record.children, record.block_ids, record.end_page)
+        return {**record, "id": vector_id}
+
+    def _commit(self, session: DedupSession) -> None:
+        with self._lock:
+            for key in session.written:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                entry.embedded = True
+                if entry.owner == session.document_name:
+                    entry.owner = None
+            self._dirty = True
+        if session.deduplicated:
+            logger.info(f"Skipped {session.deduplicated} duplicate chunk(s) of {session.document_name} "
+                        f"sharing {len(session.shared)} canonical vector(s)")
+
+    def _abort(self, session: DedupSession) -> None:
+        document_name = session.document_name
+        with self._lock:
+            for key in session.keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry.owner == document_name:
+                    entry.owner = None
+                if entry.vector_id in session.previous_ids:
+                    continue
+                entry.documents.discard(document_name)
+                if not entry.documents and not entry.embedded:
+                    self._remove_entry(key)
+            self._dirty = True
+
+    def release(self, document_name: str, vector_ids: Iterable[str]) -> List[str]:
+        """
+        Drop a document's references to vectors it no longer uses.
+
+        Args:
+            document_name: Blob name of the document
+            vector_ids: Vector IDs the document (or its previous version) referenced
+
+        Returns:
+            The vector IDs that no document references any more and can be
+            deleted from the index, including IDs the dedup index does not know
+        """
+        deletable: List[str] = []
+        with self._lock:
+            for vector_id in dict.fromkeys(vector_ids):
+                keys = self._by_vector_id.get(vector_id)
+                if not keys:
+                    deletable.append(vector_id)
+                    continue
+                in_use = False
+                for key in list(keys):
+                    entry = self._entries[key]
+                    entry.documents.discard(document_name)
+                    if entry.documents or entry.owner is not None:
+                        in_use = True
+                    else:
+                        self._remove_entry(key)
+                if not in_use:
+                    deletable.append(vector_id)
+            self._dirty = True
+        return deletable
+
+    def documents_for(self, vector_id: str) -> List[str]:
+        """
+        Return the source documents that contain the text of a vector.
+
+        Args:
+            vector_id: ID of a canonical vector
+
+        Returns:
+            Sorted blob names, or an empty list if the vector is not indexed
+        """
+        with self._lock:
+            documents: Set[str] = set()
+            for key in self._by_vector_id.get(vector_id, ()):
+                documents.update(self._entries[key].documents)
+            return sorted(documents)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -6,27 +6,34 @@ using various embedding models. It fetches chunks from Google Cloud Storage,
 generates embeddings, and prepares them for storage in vector databases.
 """
 import logging
-from google.cloud import storage
 import json
 from src.data_pipeline.logger import setup_logger
 from src.data_pipeline.models import EmbeddingVector, ChunkMetadata
-import numpy as np
 from typing import List, Dict, Any, Optional, Union, Type
-from src.data_pipeline.embed_models import EmbeddingModel, all_minilm_l6_v2
+from src.data_pipeline.chunks import ChunkRecord
+from src.data_pipeline.embedding_batch import EmbeddingBatch
+from src.data_pipeline.embed_models import EmbeddingModel, get_model_registry
 
 logger = setup_logger(__name__)
 
-def generate_embedding_vector(metadata: List[Dict[str, Any]], 
-                             model: Optional[EmbeddingModel] = None) -> List[EmbeddingVector]:
+def generate_embedding_batch(metadata: List[Union[Dict[str, Any], ChunkRecord]],
+                             model: Optional[EmbeddingModel] = None) -> EmbeddingBatch:
     """
-    Generates embeddings for text chunks stored in metadata and returns them.
+    Generates embeddings for text chunks stored in metadata, as one columnar batch.
+    
+    The embeddings stay a float32 matrix and the metadata stays in its
+    records; nothing is converted per row until the batch is upserted.
     
     Args:
-        metadata: Metadata for the chunks, containing 'raw_text' field with the text to embed.
-        model: Optional embedding model. If not provided, default SentenceTransformerModel is used.
+        metadata: Metadata for the chunks, as ChunkRecords or dictionaries containing
+            'raw_text' field with the text to embed.
+        model: Optional embedding model. If not provided, the registry's EMBEDDING_BACKEND model is used.
     
     Returns:
-        List of embedding vectors.
+        Batch of embedding vectors, at the model's native dimension.
+        
+    Raises:
+        ValueError: If metadata is empty or the embeddings do not have the model's target dimension
     """
     logger.info("Generating embedding vector for chunks.")
     
@@ -34,33 +41,40 @@ def generate_embedding_vector(metadata: List[Dict[str, Any]],
         raise ValueError("Metadata list cannot be empty")
     
     # Extract text chunks from metadata
-    chunks = [item.get('raw_text', '') for item in metadata]
+    chunks = [item.raw_text if isinstance(item, ChunkRecord) else item.get('raw_text', '') for item in metadata]
     
-    # Use provided model or create default one
+    # Use provided model or the process's shared default one
     if model is None:
-        model = all_minilm_l6_v2()
+        model = get_model_registry().get()
     
     logger.info(f"Using embedding model: {model.get_model_name()}")
     embeddings = model.encode(chunks)
     
-    # Get the target dimension from the model
+    # Vectors are stored at the model's native dimension, never padded
     target_dimension: int = model.target_dimension
-    embedding_vectors: List[EmbeddingVector] = []
+    if len(embeddings) and len(embeddings[0]) != target_dimension:
+        raise ValueError(f"Model {model.get_model_name()} produced {len(embeddings[0])}-dimensional embeddings, "
+                         f"expected {target_dimension}")
+    return EmbeddingBatch.from_records(metadata, embeddings)
+
+def generate_embedding_vector(metadata: List[Union[Dict[str, Any], ChunkRecord]], 
+                             model: Optional[EmbeddingModel] = None) -> List[EmbeddingVector]:
+    """
+    Generates embeddings for text chunks stored in metadata and returns them.
     
-    for i, embedding in enumerate(embeddings):
-        if len(embedding) < target_dimension:
-            embedding = np.pad(embedding, (0, target_dimension - len(embedding)), 'constant')
-        
-        parent = metadata[i].get('parent', None)
-        if parent is None:
-            parent = ""
-        
-        embedding_vector = EmbeddingVector(
-            id=metadata[i].get('id', ''),
-            values=embedding.tolist(),
-            metadata={**metadata[i], 'parent': parent}
-        )
-        embedding_vectors.append(embedding_vector)
-        logger.debug(f"Generated embedding vector: {embedding_vector}")
+    List-of-EmbeddingVector form of generate_embedding_batch, which the
+    pipeline uses directly.
+    
+    Args:
+        metadata: Metadata for the chunks, as ChunkRecords or dictionaries containing
+            'raw_text' field with the text to embed. Records are converted to
+            dictionaries here, for the vector metadata.
+        model: Optional embedding model. If not provided, the registry's EMBEDDING_BACKEND model is used.
     
-    return embedding_vectors
+    Returns:
+        List of embedding vectors, at the model's native dimension.
+        
+    Raises:
+        ValueError: If metadata is empty or the embeddings do not have the model's target dimension
+    """
+    return generate_embedding_batch(metadata, model).to_vectors()
@@ -0,0 +1,190 @@
+"""
+Cross-document embedding batcher for the TeacherBot data pipeline.
+
+Ingestion workers embed one document at a time, so short documents (Reddit
+posts, small HTML pages) produce tiny batches, and batches that mix short and
+long chunks waste transformer compute on padding. The EmbeddingBatcher is
+shared by all workers: it collects chunks from concurrent encode() calls,
+orders them by length, encodes them in full batches bounded by a padded-token
+budget, and routes every embedding back to the document that asked for it.
+"""
+import os
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+from src.data_pipeline.embed_models import ModelWrapper
+from src.data_pipeline.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_BATCH_TOKENS = 8192
+DEFAULT_MAX_WAIT_SECONDS = 0.02
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token-count estimate used to order and bucket texts.
+
+    Args:
+        text: The text to measure
+
+    Returns:
+        Approximate number of model tokens (wordpieces) in the text
+    """
+    # Wordpiece tokenizers emit roughly 1.3 tokens per whitespace-separated word
+    return int(len(text.split()) * 1.3) + 2
+
+
+class _EncodeRequest:
+    """One encode() call waiting for its rows to be filled in."""
+    def __init__(self, count: int):
+        self.remaining = count
+        self.rows: List[Optional[np.ndarray]] = [None] * count
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+        if count == 0:
+            self.done.set()
+
+
+class EmbeddingBatcher(ModelWrapper):
+    """
+    Thread-safe wrapper that batches encode() calls across callers.
+
+    A background thread waits until max_batch_size texts are queued or the
+    oldest text has waited max_wait seconds, then sorts everything queued by
+    estimated token length and encodes it in batches of at most
+    max_batch_size texts whose padded size (longest text x batch size) stays
+    under max_batch_tokens.
+    """
+    def __init__(self, model: Any, max_batch_size: Optional[int] = None,
+                 max_batch_tokens: Optional[int] = None, max_wait: Optional[float] = None):
+        """
+        Args:
+            model: The embedding model to encode with
+            max_batch_size: Maximum number of texts per encode call on the model
+            max_batch_tokens: Maximum padded tokens (longest text x batch size) per encode call
+            max_wait: Seconds a queued text may wait for a fuller batch
+        """
+        super().__init__(model)
+        self._max_batch_size = max_batch_size or int(os.getenv("EMBED_MAX_BATCH_SIZE", DEFAULT_MAX_BATCH_SIZE))
+        self._max_batch_tokens = max_batch_tokens or int(os.getenv("EMBED_MAX_BATCH_TOKENS", DEFAULT_MAX_BATCH_TOKENS))
+        self._max_wait = max_wait if max_wait is not None else float(os.getenv("EMBED_MAX_WAIT", DEFAULT_MAX_WAIT_SECONDS))
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        # (text, token estimate, request, row index)
+        self._pending: List[Tuple[str, int, _EncodeRequest, int]] = []
+        self._oldest: float = 0.0
+        self._closed = False
+
+        self.texts_encoded = 0
+        self.batches_encoded = 0
+        self.padded_tokens = 0
+        self.real_tokens = 0
+
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts, batched together with texts from concurrent callers.
+
+        Args:
+            texts: List of text strings to encode
+
+        Returns:
+            numpy.ndarray: Array of embeddings, in the order of texts
+        """
+        request = _EncodeRequest(len(texts))
+        if texts:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("Cannot encode with a closed EmbeddingBatcher")
+                if not self._pending:
+                    self._oldest = time.monotonic()
+                for i, text in enumerate(texts):
+                    self._pending.append((text, estimate_tokens(text), request, i))
+                self._wakeup.notify()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        if not texts:
+            return np.zeros((0, self.target_dimension), dtype=np.float32)
+        return np.stack(request.rows)
+
+    def close(self) -> None:
+        """Encode anything still queued and stop the background thread."""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        self._thread.join()
+        if self.batches_encoded:
+            logger.info(f"Embedding batcher closed: {self.texts_encoded} texts in {self.batches_encoded} batches, "
+                        f"padding efficiency {self.real_tokens / max(1, self.padded_tokens):.0%}")
+
+    def __enter__(self) -> "EmbeddingBatcher":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not self._pending and not self._closed:
+                    self._wakeup.wait()
+                # Give concurrent callers a moment to fill the batch
+                while (not self._closed and len(self._pending) < self._max_batch_size
+                       and time.monotonic() - self._oldest < self._max_wait):
+                    self._wakeup.wait(timeout=self._max_wait - (time.monotonic() - self._oldest))
+                if not self._pending and self._closed:
+                    return
+                pending, self._pending = self._pending, []
+
+            for batch in self._make_batches(pending):
+                self._encode_batch(batch)
+
+    def _make_batches(self, pending: List[Tuple[str, int, _EncodeRequest, int]]
+                      ) -> List[List[Tuple[str, int, _EncodeRequest, int]]]:
+        """Sort queued texts by length and cut them into size- and padded-token-bounded batches."""
+        pending.sort(key=lambda item: item[1])
+        batches: List[List[Tuple[str, int, _EncodeRequest, int]]] = []
+        batch: List[Tuple[str, int, _EncodeRequest, int]] = []
+        for item in pending:
+            # Sorted ascending, so the new item is the longest in the batch
+            if batch and (len(batch) >= self._max_batch_size
+                          or item[1] * (len(batch) + 1) > self._max_batch_tokens):
+                batches.append(batch)
+                batch = []
+            batch.append(item)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _encode_batch(self, batch: List[Tuple[str, int, _EncodeRequest, int]]) -> None:
+        """Encode one batch and scatter the rows back to their requests."""
+        try:
+            embeddings = self._model.encode([text for text, _, _, _ in batch])
+        except Exception as e:
+            logger.error(f"Embedding batch of {len(batch)} texts failed: {str(e)}")
+            for _, _, request, _ in batch:
+                if request.error is None:
+                    request.error = e
+                    request.done.set()
+            return
+
+        self.texts_encoded += len(batch)
+        self.batches_encoded += 1
+        self.padded_tokens += batch[-1][1] * len(batch)
+        self.real_tokens += sum(tokens for _, tokens, _, _ in batch)
+        for (_, _, request, row), embedding in zip(batch, embeddings):
+            if request.error is not None:
+                continue
+            request.rows[row] = embedding
+            request.remaining -= 1
+            if request.remaining == 0:
+                request.done.set()
@@ -0,0 +1,269 @@
+"""
+Persistent embedding cache for the TeacherBot data pipeline.
+
+Re-running ingestion re-encodes every chunk, even when neither its text nor
+the embedding model changed, and retuning CHUNK_SIZE or CHUNK_OVERLAP
+re-embeds every block that still forms the same chunk. The EmbeddingCache
+stores embeddings on local disk, keyed by (model, hash of the normalized
+text): a SQLite table maps each key to a slot of a fixed-size numpy memmap
+that holds the float32 vectors. The table is bounded by
+EMBED_CACHE_MAX_ENTRIES per model, evicting the least recently used entries
+when it is full.
+
+CachedEmbeddingModel wraps an embedding model (or EmbeddingBatcher) with the
+same interface, looks every encode() call up in one batched query, and only
+sends the texts that miss to the model.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.data_pipeline.embed_models import ModelWrapper
+from src.data_pipeline.logger import setup_logger
+from src.data_pipeline.metrics import get_metrics
+
+logger = setup_logger(__name__)
+
+DEFAULT_MAX_ENTRIES = 200000
+# Source label of the cache counters, which are not tied to one document
+CACHE_SOURCE = "all"
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_CHUNK = 500
+_WHITESPACE = re.compile(r"\s+")
+
+
+def text_key(text: str) -> bytes:
+    """
+    Hash a text for the cache, ignoring differences that do not change its embedding.
+
+    The text is NFC-normalized and runs of whitespace are collapsed, which
+    the embedding models' tokenizers do not distinguish.
+
+    Args:
+        text: Text to embed
+
+    Returns:
+        16-byte BLAKE2b digest of the normalized text
+    """
+    normalized = _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+
+
+class EmbeddingCache:
+    """
+    Thread-safe on-disk store of embeddings for one model.
+
+    Vectors are written to the memmap and flushed before their keys are
+    committed to SQLite, so an interrupted run never leaves a key pointing
+    at an unwritten vector. The cache is meant for one ingestion process at
+    a time.
+    """
+    def __init__(self, directory: str, model_name: str, dimension: int, max_entries: Optional[int] = None):
+        """
+        Args:
+            directory: Directory holding the SQLite index and the vector files
+            model_name: Name of the model the embeddings come from
+            dimension: Embedding dimension of the model
+            max_entries: Maximum number of cached embeddings for the model
+        """
+        self.model_key = f"{model_name}@{dimension}"
+        self.dimension = dimension
+        self.capacity = max_entries or int(os.getenv("EMBED_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(directory, "embeddings.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (model TEXT NOT NULL, text_hash BLOB NOT NULL, "
+                           "slot INTEGER NOT NULL, last_used INTEGER NOT NULL, PRIMARY KEY (model, text_hash)) "
+                           "WITHOUT ROWID")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings (model, last_used)")
+        # Entries beyond a reduced capacity no longer have a slot
+        self._conn.execute("DELETE FROM embeddings WHERE model = ? AND slot >= ?", (self.model_key, self.capacity))
+        self._conn.commit()
+
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", model_name).strip("_")
+        path = os.path.join(directory, f"{slug}-{dimension}.f32")
+        size = self.capacity * dimension * 4
+        if os.path.exists(path) and os.path.getsize(path) != size:
+            os.truncate(path, size)
+        self._values = np.memmap(path, dtype=np.float32, mode="r+" if os.path.exists(path) else "w+",
+                                 shape=(self.capacity, dimension))
+
+        used = {slot for (slot,) in self._conn.execute("SELECT slot FROM embeddings WHERE model = ?",
+                                                       (self.model_key,))}
+        # Free slots, popped from the end so low slots are used first
+        self._free = [slot for slot in range(self.capacity - 1, -1, -1) if slot not in used]
+        (clock,) = self._conn.execute("SELECT COALESCE(MAX(last_used), 0) FROM embeddings WHERE model = ?",
+                                      (self.model_key,)).fetchone()
+        self._clock = clock
+        logger.info(f"Opened embedding cache for {self.model_key} with {len(used)} of {self.capacity} entries")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.capacity - len(self._free)
+
+    def lookup(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """
+        Look up embeddings in one batched query and mark them as recently used.
+
+        Args:
+            keys: Keys from text_key()
+
+        Returns:
+            Embeddings of the keys that are cached
+        """
+        with self._lock:
+            found = self._slots(list(dict.fromkeys(keys)))
+            if not found:
+                return {}
+            self._touch([key for key, _ in found])
+            self._conn.commit()
+            rows = self._values[np.array([slot for _, slot in found])]
+        return {key: row for (key, _), row in zip(found, rows)}
+
+    def _slots(self, keys: List[bytes]) -> List[Tuple[bytes, int]]:
+        """Slots of the keys that are cached, in batched queries."""
+        found: List[Tuple[bytes, int]] = []
+        for start in range(0, len(keys), _LOOKUP_CHUNK):
+            chunk = keys[start:start + _LOOKUP_CHUNK]
+            found.extend(self._conn.execute(
+                f"SELECT text_hash, slot FROM embeddings WHERE model = ? AND text_hash IN "
+                f"({','.join('?' * len(chunk))})", (self.model_key, *chunk)))
+        return found
+
+    def _touch(self, keys: List[bytes]) -> None:
+        """Mark cached keys as the most recently used."""
+        self._clock += 1
+        self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                               [(self._clock, self.model_key, key) for key in keys])
+
+    def store(self, keys: List[bytes], embeddings: np.ndarray) -> None:
+        """
+        Add embeddings, evicting the least recently used entries if the cache is full.
+
+        Keys another thread stored since they were looked up keep their slot
+        and are only marked as used, so concurrent misses on the same text
+        never take two slots.
+
+        Args:
+            keys: Keys from text_key()
+            embeddings: One embedding per key
+        """
+        if not keys:
+            return
+        # Row of the last embedding of every distinct key
+        rows = {key: row for row, key in enumerate(keys)}
+        with self._lock:
+            existing = {key for key, _ in self._slots(list(rows))}
+            if existing:
+                # Touched before evicting, so they are not evicted to make room for the new keys
+                self._touch(list(existing))
+            new_keys = [key for key in rows if key not in existing][-self.capacity:]
+            if len(self._free) < len(new_keys):
+                # Evict a tenth of the cache at a time, so eviction is not paid on every store
+                self._evict(len(new_keys) - len(self._free) + self.capacity // 10)
+            # Eviction frees fewer slots than asked when most entries were just touched
+            new_keys = new_keys[len(new_keys) - min(len(new_keys), len(self._free)):]
+            if new_keys:
+                slots = [self._free.pop() for _ in new_keys]
+                self._values[slots] = np.asarray(embeddings, dtype=np.float32)[[rows[key] for key in new_keys]]
+                self._values.flush()
+                self._clock += 1
+                self._conn.executemany("INSERT INTO embeddings (model, text_hash, slot, last_used) "
+                                       "VALUES (?, ?, ?, ?)",
+                                       [(self.model_key, key, slot, self._clock)
+                                        for key, slot in zip(new_keys, slots)])
+            self._conn.commit()
+
+    def _evict(self, count: int) -> None:
+        evicted = self._conn.execute("SELECT text_hash, slot FROM embeddings WHERE model = ? "
+                                     "ORDER BY last_used LIMIT ?", (self.model_key, count)).fetchall()
+        self._conn.executemany("DELETE FROM embeddings WHERE model = ? AND text_hash = ?",
+                               [(self.model_key, key) for key, _ in evicted])
+        self._free.extend(slot for _, slot in evicted)
+        self.evictions += len(evicted)
+        get_metrics().increment("embedding_cache_evictions", CACHE_SOURCE, len(evicted))
+
+    def record(self, hits: int, misses: int) -> None:
+        """Count cache hits and misses in the cache and the ingestion metrics."""
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+        metrics = get_metrics()
+        if hits:
+            metrics.increment("embedding_cache_hits", CACHE_SOURCE, hits)
+        if misses:
+            metrics.increment("embedding_cache_misses", CACHE_SOURCE, misses)
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of looked-up texts that were cached."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def close(self) -> None:
+        """Flush the vectors and close the SQLite connection."""
+        with self._lock:
+            self._values.flush()
+            self._conn.close()
+        logger.info(f"Embedding cache closed: {self.hits} hits, {self.misses} misses "
+                    f"({self.hit_rate:.0%} hit rate), {self.evictions} evictions, "
+                    f"{self.capacity - len(self._free)} of {self.capacity} entries used")
+
+
+class CachedEmbeddingModel(ModelWrapper):
+    """
+    Embedding model wrapper that serves repeated texts from an EmbeddingCache.
+
+    Identical texts within one call are encoded once.
+    """
+    def __init__(self, model: Any, cache: EmbeddingCache):
+        """
+        Args:
+            model: The embedding model (or EmbeddingBatcher) to encode misses with
+            cache: Cache for the model's embeddings
+        """
+        super().__init__(model)
+        self.cache = cache
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts, looking them up in the cache first.
+
+        Args:
+            texts: List of text strings to encode
+
+        Returns:
+            numpy.ndarray: float32 array of embeddings, in the order of texts
+        """
+        if not texts:
+            return np.zeros((0, self.target_dimension), dtype=np.float32)
+        keys = [text_key(text) for text in texts]
+        cached = self.cache.lookup(keys)
+        # First position of every distinct text that is not cached
+        missing: Dict[bytes, int] = {}
+        for i, key in enumerate(keys):
+            if key not in cached and key not in missing:
+                missing[key] = i
+        if missing:
+            encoded = np.asarray(self._model.encode([texts[i] for i in missing.values()]), dtype=np.float32)
+            new_keys = list(missing)
+            self.cache.store(new_keys, encoded)
+            cached.update(zip(new_keys, encoded))
+        self.cache.record(len(texts) - len(missing), len(missing))
+        return np.stack([cached[key] for key in keys])
+
+    def close(self) -> None:
+        """Close the cache."""
+        self.cache.close()
@@ -5,8 +5,12 @@ This package contains different implementations of text embedding models that
 can be used for converting text chunks to vector representations. The module
 provides a common interface through the EmbeddingModel abstract base class.
 """
-from src.data_pipeline.embed_models.base import EmbeddingModel
+from src.data_pipeline.embed_models.base import EmbeddingModel, ModelWrapper
 from src.data_pipeline.embed_models.all_minilm_l6_v2 import all_minilm_l6_v2
+from src.data_pipeline.embed_models.all_minilm_l6_v2_onnx import all_minilm_l6_v2_onnx
 from src.data_pipeline.embed_models.openai import OpenAIEmbeddingModel
+from src.data_pipeline.embed_models.factory import get_embedding_model
+from src.data_pipeline.embed_models.registry import ModelRegistry, get_model_registry
 
-__all__ = ['EmbeddingModel', 'all_minilm_l6_v2', 'OpenAIEmbeddingModel'] 
\ No newline at end of file
+__all__ = ['EmbeddingModel', 'ModelWrapper', 'all_minilm_l6_v2', 'all_minilm_l6_v2_onnx', 'OpenAIEmbeddingModel',
+           'get_embedding_model', 'ModelRegistry', 'get_model_registry']
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sentence_transformers import SentenceTransformer
+import threading
 import numpy as np
 from typing import List, Optional, Any, Dict
 
@@ -9,13 +9,41 @@ class all_minilm_l6_v2:
     """
     def __init__(self):
         self._model_name = "sentence-transformers/all-minilm-l6-v2"
-        self._target_dimension = 3072
+        # Native output dimension; vectors are stored unpadded in an index of this dimension
+        self._target_dimension = 384
+        # The model truncates inputs longer than 256 wordpieces, [CLS] and [SEP] included
+        self._max_seq_length = 256
         self._model = None
+        self._tokenizer = None
+        # Fast tokenizers are not safe to call from several threads at once
+        self._tokenizer_lock = threading.Lock()
     
     def _load_model(self):
         """Load the model if it's not already loaded."""
         if self._model is None:
+            # Imported on first use: sentence-transformers pulls in torch, which is slow to import
+            from sentence_transformers import SentenceTransformer
             self._model = SentenceTransformer(self._model_name)
+            self._max_seq_length = self._model.max_seq_length
+    
+    def _load_tokenizer(self):
+        """Load only the model's tokenizer, which is much lighter than the model itself."""
+        if self._tokenizer is None:
+            if self._model is not None:
+                self._tokenizer = self._model.tokenizer
+            else:
+                from transformers import AutoTokenizer
+                self._tokenizer = AutoTokenizer.from_pretrained(self._model_name)
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        # Ship only the configuration to worker processes; they load the tokenizer themselves
+        state = self.__dict__.copy()
+        state.update(_model=None, _tokenizer=None, _tokenizer_lock=None)
+        return state
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._tokenizer_lock = threading.Lock()
     
     def encode(self, texts: List[str]) -> np.ndarray:
         """
@@ -30,6 +58,44 @@ class all_minilm_l6_v2:
         self._load_model()
         return self._model.encode(texts, convert_to_numpy=True)
     
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """
+        Count the wordpieces of each text, excluding special tokens, in one batched call.
+        
+        Args:
+            texts: List of text strings to measure
+            
+        Returns:
+            List[int]: Number of wordpieces of each text
+        """
+        if not texts:
+            return []
+        with self._tokenizer_lock:
+            self._load_tokenizer()
+            encoded = self._tokenizer(texts, add_special_tokens=False, truncation=False,
+                                      return_attention_mask=False, return_token_type_ids=False)
+        return [len(input_ids) for input_ids in encoded["input_ids"]]
+    
+    @property
+    def max_seq_length(self) -> Optional[int]:
+        """
+        Get the maximum number of wordpieces the model encodes; longer inputs are truncated.
+        
+        Returns:
+            Optional[int]: Maximum input length including special tokens
+        """
+        return self._max_seq_length
+    
+    @property
+    def num_special_tokens(self) -> int:
+        """
+        Get the number of special tokens ([CLS] and [SEP]) added to every input.
+        
+        Returns:
+            int: Number of special tokens
+        """
+        return 2
+    
     @property
     def model_name(self) -> str:
         """
@@ -0,0 +1,183 @@
+import os
+import threading
+import numpy as np
+from typing import List, Optional, Any, Dict
+
+DEFAULT_ONNX_MODEL_DIR = "models/all-minilm-l6-v2-onnx"
+DEFAULT_ONNX_BATCH_SIZE = 32
+
+# A simple non-Pydantic class implementation
+class all_minilm_l6_v2_onnx:
+    """
+    Implementation of all-MiniLM-L6-v2 on ONNX Runtime with a dynamically int8-quantized graph.
+
+    Runs the graph written by export_onnx.py with the same mean pooling and
+    L2 normalization as the SentenceTransformer model, without importing
+    torch. Inputs are sorted by length and encoded in batches of
+    ONNX_BATCH_SIZE, so each batch is only padded to its longest input.
+    """
+    def __init__(self, model_dir: Optional[str] = None):
+        """
+        Args:
+            model_dir: Directory holding model_int8.onnx and tokenizer.json (default: ONNX_MODEL_DIR)
+        """
+        # Same model and vectors as all_minilm_l6_v2, so both backends share an index
+        self._model_name = "sentence-transformers/all-minilm-l6-v2"
+        self._target_dimension = 384
+        # The model truncates inputs longer than 256 wordpieces, [CLS] and [SEP] included
+        self._max_seq_length = 256
+        self._model_dir = model_dir or os.getenv("ONNX_MODEL_DIR", DEFAULT_ONNX_MODEL_DIR)
+        self._batch_size = int(os.getenv("ONNX_BATCH_SIZE", DEFAULT_ONNX_BATCH_SIZE))
+        self._session = None
+        self._input_names: List[str] = []
+        self._tokenizer = None
+        self._counting_tokenizer = None
+        # Tokenizers are not safe to call from several threads at once
+        self._tokenizer_lock = threading.Lock()
+        self._session_lock = threading.Lock()
+
+    def _load_tokenizers(self):
+        """Load the tokenizer, once truncating to the model input and once not truncating, for counting."""
+        if self._tokenizer is None:
+            from tokenizers import Tokenizer
+            path = os.path.join(self._model_dir, "tokenizer.json")
+            counting_tokenizer = Tokenizer.from_file(path)
+            counting_tokenizer.no_truncation()
+            counting_tokenizer.no_padding()
+            tokenizer = Tokenizer.from_file(path)
+            tokenizer.enable_truncation(max_length=self._max_seq_length)
+            tokenizer.no_padding()
+            self._counting_tokenizer = counting_tokenizer
+            self._tokenizer = tokenizer
+
+    def _load_model(self):
+        """Create the inference session if it's not already created."""
+        with self._session_lock:
+            if self._session is None:
+                import onnxruntime as ort
+                options = ort.SessionOptions()
+                options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                # 0 lets ONNX Runtime use one thread per physical core
+                options.intra_op_num_threads = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))
+                session = ort.InferenceSession(os.path.join(self._model_dir, "model_int8.onnx"), options,
+                                               providers=["CPUExecutionProvider"])
+                self._input_names = [model_input.name for model_input in session.get_inputs()]
+                self._session = session
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Ship only the configuration to worker processes; they create their own session
+        state = self.__dict__.copy()
+        state.update(_session=None, _tokenizer=None, _counting_tokenizer=None,
+                     _tokenizer_lock=None, _session_lock=None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._tokenizer_lock = threading.Lock()
+        self._session_lock = threading.Lock()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode a list of texts into embeddings.
+
+        Args:
+            texts: List of text strings to encode
+
+        Returns:
+            numpy.ndarray: float32 array of L2-normalized embeddings
+        """
+        embeddings = np.zeros((len(texts), self._target_dimension), dtype=np.float32)
+        if not texts:
+            return embeddings
+        self._load_model()
+        with self._tokenizer_lock:
+            self._load_tokenizers()
+            encodings = self._tokenizer.encode_batch(texts)
+
+        # Encode similar lengths together so batches carry little padding
+        order = sorted(range(len(texts)), key=lambda i: len(encodings[i].ids))
+        for start in range(0, len(order), self._batch_size):
+            rows = order[start:start + self._batch_size]
+            length = max(len(encodings[i].ids) for i in rows)
+            input_ids = np.zeros((len(rows), length), dtype=np.int64)
+            attention_mask = np.zeros((len(rows), length), dtype=np.int64)
+            for row, i in enumerate(rows):
+                ids = encodings[i].ids
+                input_ids[row, :len(ids)] = ids
+                attention_mask[row, :len(ids)] = 1
+            inputs = {"input_ids": input_ids, "attention_mask": attention_mask,
+                      "token_type_ids": np.zeros_like(input_ids)}
+            token_embeddings = self._session.run(None, {name: inputs[name] for name in self._input_names})[0]
+
+            # Mean pooling over the attended tokens, then L2 normalization, as SentenceTransformer does
+            mask = attention_mask[:, :, np.newaxis].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            embeddings[rows] = pooled
+        return embeddings
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """
+        Count the wordpieces of each text, excluding special tokens, in one batched call.
+
+        Args:
+            texts: List of text strings to measure
+
+        Returns:
+            List[int]: Number of wordpieces of each text
+        """
+        if not texts:
+            return []
+        with self._tokenizer_lock:
+            self._load_tokenizers()
+            encodings = self._counting_tokenizer.encode_batch(texts, add_special_tokens=False)
+        return [len(encoding.ids) for encoding in encodings]
+
+    @property
+    def max_seq_length(self) -> Optional[int]:
+        """
+        Get the maximum number of wordpieces the model encodes; longer inputs are truncated.
+
+        Returns:
+            Optional[int]: Maximum input length including special tokens
+        """
+        return self._max_seq_length
+
+    @property
+    def num_special_tokens(self) -> int:
+        """
+        Get the number of special tokens ([CLS] and [SEP]) added to every input.
+
+        Returns:
+            int: Number of special tokens
+        """
+        return 2
+
+    @property
+    def model_name(self) -> str:
+        """
+        Get the name of the model.
+
+        Returns:
+            str: Name of the model
+        """
+        return self._model_name
+
+    @property
+    def target_dimension(self) -> int:
+        """
+        Get the target dimension of the embeddings.
+
+        Returns:
+            int: The dimension of the embedding vectors
+        """
+        return self._target_dimension
+
+    def get_model_name(self) -> str:
+        """
+        Get the name of the model.
+
+        Returns:
+            str: Name of the model
+        """
+        return self._model_name
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Any, Dict
+from typing import List, Any, Dict, Optional
 import numpy as np
 from pydantic import BaseModel, Field
 
@@ -44,7 +44,108 @@ class EmbeddingModel(BaseModel):
         """
         Get the target dimension of the embeddings.
         
+        This is the model's native output dimension; vectors are stored
+        without padding, in an index created with this dimension.
+        
         Returns:
             int: The dimension of the embedding vectors
         """
-        pass 
\ No newline at end of file
+        pass
+    
+    @property
+    def max_seq_length(self) -> Optional[int]:
+        """
+        Get the maximum number of tokens the model encodes; longer inputs are truncated.
+        
+        Returns:
+            Optional[int]: Maximum input length including special tokens, or None if unlimited
+        """
+        return None
+    
+    @property
+    def num_special_tokens(self) -> int:
+        """
+        Get the number of special tokens (e.g. [CLS] and [SEP]) added to every input.
+        
+        Returns:
+            int: Number of special tokens that count against max_seq_length
+        """
+        return 0
+    
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """
+        Count the model tokens of each text, excluding special tokens.
+        
+        Implementations should tokenize the whole list in one batched call.
+        The default is an estimate of 1.3 tokens per whitespace-separated word.
+        
+        Args:
+            texts: List of text strings to measure
+            
+        Returns:
+            List[int]: Number of tokens of each text
+        """
+        return [int(len(text.split()) * 1.3) for text in texts]
+
+
+class ModelWrapper(ABC):
+    """
+    Base class for wrappers that change how an embedding model encodes
+    (EmbeddingBatcher, EmbeddingPool, CachedEmbeddingModel) but not the model itself.
+
+    The model's name, dimension, input length and tokenizer are delegated to
+    the wrapped model, so a wrapper can be passed anywhere an embedding model
+    is expected. wrapped_model lets callers such as chunks.ModelTokenCounter
+    reach the model under a stack of wrappers.
+    """
+    def __init__(self, model: Any):
+        """
+        Args:
+            model: The embedding model (or another wrapper) to wrap
+        """
+        self._model = model
+
+    @abstractmethod
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode a list of texts into embeddings.
+
+        Args:
+            texts: List of text strings to encode
+
+        Returns:
+            numpy.ndarray: float32 array of embeddings, in the order of texts
+        """
+
+    @property
+    def model_name(self) -> str:
+        """Name of the wrapped model."""
+        return self._model.model_name
+
+    @property
+    def target_dimension(self) -> int:
+        """Embedding dimension of the wrapped model."""
+        return self._model.target_dimension
+
+    def get_model_name(self) -> str:
+        """Name of the wrapped model."""
+        return self._model.get_model_name()
+
+    @property
+    def wrapped_model(self) -> Any:
+        """The model this wrapper encodes with."""
+        return self._model
+
+    @property
+    def max_seq_length(self) -> Optional[int]:
+        """Maximum input length of the wrapped model, special tokens included."""
+        return getattr(self._model, "max_seq_length", None)
+
+    @property
+    def num_special_tokens(self) -> int:
+        """Special tokens the wrapped model adds to every input."""
+        return getattr(self._model, "num_special_tokens", 0)
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Count tokens with the wrapped model's tokenizer."""
+        return self._model.count_tokens(texts)
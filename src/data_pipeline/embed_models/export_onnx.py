@@ -0,0 +1,75 @@
+"""
+Export of all-MiniLM-L6-v2 to a dynamically int8-quantized ONNX graph for the TeacherBot data pipeline.
+
+Exports the transformer of the SentenceTransformer model (token embeddings
+before pooling) with dynamic batch and sequence axes, quantizes its weights
+to int8 with ONNX Runtime's dynamic quantization and saves the fast
+tokenizer next to it. all_minilm_l6_v2_onnx loads the result from
+ONNX_MODEL_DIR. Needs torch, transformers and onnx (a dev dependency in
+the Pipfile, installed with pipenv install --dev), so it runs once at build
+time rather than in the ingestion workers.
+
+Usage:
+    python -m src.data_pipeline.embed_models.export_onnx --output models/all-minilm-l6-v2-onnx
+"""
+import argparse
+import os
+
+from src.data_pipeline.embed_models.all_minilm_l6_v2_onnx import DEFAULT_ONNX_MODEL_DIR
+from src.data_pipeline.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+INPUT_NAMES = ["input_ids", "attention_mask", "token_type_ids"]
+
+
+def export_onnx(model_name: str, output_dir: str, opset: int = 14) -> str:
+    """
+    Export a BERT-style sentence-transformers model to an int8 ONNX graph.
+
+    Args:
+        model_name: Hugging Face model name
+        output_dir: Directory to write model.onnx, model_int8.onnx and tokenizer.json to
+        opset: ONNX opset version
+
+    Returns:
+        Path of the quantized graph
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    sample = tokenizer(["Form I-485 instructions"], return_tensors="pt")
+
+    fp32_path = os.path.join(output_dir, "model.onnx")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in INPUT_NAMES + ["last_hidden_state"]}
+    with torch.no_grad():
+        # The TorchScript exporter: torch >= 2.9 defaults to the dynamo exporter, which needs onnxscript
+        torch.onnx.export(model, tuple(sample[name] for name in INPUT_NAMES), fp32_path,
+                          input_names=INPUT_NAMES, output_names=["last_hidden_state"],
+                          dynamic_axes=dynamic_axes, opset_version=opset, do_constant_folding=True,
+                          dynamo=False)
+    logger.info(f"Exported {model_name} to {fp32_path}")
+
+    int8_path = os.path.join(output_dir, "model_int8.onnx")
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    tokenizer.save_pretrained(output_dir)
+    logger.info(f"Quantized {fp32_path} to {int8_path} ({os.path.getsize(fp32_path) / 1e6:.1f} MB -> "
+                f"{os.path.getsize(int8_path) / 1e6:.1f} MB)")
+    return int8_path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--output", default=os.getenv("ONNX_MODEL_DIR", DEFAULT_ONNX_MODEL_DIR))
+    parser.add_argument("--opset", type=int, default=14)
+    args = parser.parse_args()
+    export_onnx(args.model, args.output, args.opset)
+
+
+if __name__ == "__main__":
+    main()
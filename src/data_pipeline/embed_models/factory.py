@@ -0,0 +1,40 @@
+"""
+Embedding backend selection for the TeacherBot data pipeline.
+
+all-MiniLM-L6-v2 runs either on PyTorch through SentenceTransformer
+(EMBEDDING_BACKEND=torch, the default) or on ONNX Runtime with an int8 graph
+exported by export_onnx.py (EMBEDDING_BACKEND=onnx). Both produce vectors of
+the same model and dimension, so they share an index. EMBEDDING_BACKEND=openai
+embeds through the OpenAI API instead, into an index of its own dimension.
+"""
+import os
+from typing import Any, Optional
+
+from src.data_pipeline.embed_models.all_minilm_l6_v2 import all_minilm_l6_v2
+from src.data_pipeline.embed_models.all_minilm_l6_v2_onnx import all_minilm_l6_v2_onnx
+from src.data_pipeline.embed_models.openai import OpenAIEmbeddingModel
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "openai")
+
+
+def get_embedding_model(backend: Optional[str] = None) -> Any:
+    """
+    Create the embedding model for a backend.
+
+    Args:
+        backend: 'torch', 'onnx' or 'openai' (default: EMBEDDING_BACKEND)
+
+    Returns:
+        An embedding model; neither backend loads its weights until first used
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    backend = backend or os.getenv("EMBEDDING_BACKEND", "torch")
+    if backend == "torch":
+        return all_minilm_l6_v2()
+    if backend == "onnx":
+        return all_minilm_l6_v2_onnx()
+    if backend == "openai":
+        return OpenAIEmbeddingModel()
+    raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {', '.join(EMBEDDING_BACKENDS)}")
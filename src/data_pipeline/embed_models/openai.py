@@ -1,77 +1,313 @@
-import numpy as np
-from typing import List, Optional, Dict, Any
+"""
+OpenAI embedding model for the TeacherBot data pipeline.
+
+Calls the /embeddings endpoint of the OpenAI API (or an Azure OpenAI
+deployment) with httpx. Inputs are packed into requests by token count and
+input count, the requests run concurrently under a limit, and 429 and 5xx
+responses or dropped connections are retried with jittered exponential
+backoff. Embeddings are returned in input order however the requests
+complete.
+"""
+import asyncio
+import base64
 import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
 from src.data_pipeline.embed_models.base import EmbeddingModel
+from src.data_pipeline.logger import setup_logger
+from src.data_pipeline.metrics import get_metrics
+
+logger = setup_logger(__name__)
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+# Native dimensions of the OpenAI embedding models
+MODEL_DIMENSIONS = {"text-embedding-3-small": 1536, "text-embedding-3-large": 3072, "text-embedding-ada-002": 1536}
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# tiktoken encoding of the embedding models, for model names tiktoken does not map
+FALLBACK_ENCODING = "cl100k_base"
+
 
-# Note: This is a placeholder implementation. In a real-world scenario,
-# you would need to install and import the OpenAI API client.
-# import openai
+class OpenAIEmbeddingError(RuntimeError):
+    """An embeddings request failed with a status that is not retried, or ran out of retries."""
 
 
 class OpenAIEmbeddingModel(EmbeddingModel):
     """
-    Implementation of EmbeddingModel using OpenAI embeddings.
-    This is a placeholder implementation and requires the OpenAI API client.
+    Implementation of EmbeddingModel using the OpenAI embeddings API.
+
+    Settings default to the environment: OPENAI_API_KEY and OPENAI_BASE_URL,
+    or AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_VERSION
+    and AZURE_EMBEDDING_DEPLOYMENT for Azure, and OPENAI_EMBED_* for request
+    packing, concurrency and retries.
     """
     _model_name: str = "text-embedding-3-small"
     _api_key: Optional[str] = None
     # OpenAI models typically produce 1536-dimensional vectors
     _target_dimension: int = 1536
-    
-    def __init__(self, **data):
+    _base_url: str = DEFAULT_BASE_URL
+    _azure_deployment: Optional[str] = None
+    _azure_api_version: Optional[str] = None
+    _max_batch_tokens: int = 100000
+    _max_batch_size: int = 2048
+    _concurrency: int = 8
+    _max_retries: int = 6
+    _backoff_base: float = 0.5
+    _backoff_max: float = 30.0
+    _timeout: float = 60.0
+    _encoding_format: str = "base64"
+
+    def __init__(self, model_name: Optional[str] = None, base_url: Optional[str] = None,
+                 api_key: Optional[str] = None, max_batch_tokens: Optional[int] = None,
+                 max_batch_size: Optional[int] = None, concurrency: Optional[int] = None,
+                 max_retries: Optional[int] = None, backoff_base: Optional[float] = None,
+                 timeout: Optional[float] = None, **data):
+        """
+        Args:
+            model_name: Embedding model (default: OPENAI_EMBEDDING_MODEL, or text-embedding-3-small)
+            base_url: API base URL (default: OPENAI_BASE_URL, or AZURE_OPENAI_ENDPOINT for Azure)
+            api_key: API key (default: OPENAI_API_KEY, or AZURE_OPENAI_API_KEY for Azure)
+            max_batch_tokens: Most tokens packed into one request (default: OPENAI_EMBED_BATCH_TOKENS)
+            max_batch_size: Most inputs packed into one request (default: OPENAI_EMBED_BATCH_SIZE)
+            concurrency: Requests in flight at once (default: OPENAI_EMBED_CONCURRENCY)
+            max_retries: Retries of a request after 429/5xx or a connection error (default: OPENAI_EMBED_MAX_RETRIES)
+            backoff_base: Seconds of the first retry's backoff cap, doubled per retry (default: OPENAI_EMBED_BACKOFF)
+            timeout: Seconds per request (default: OPENAI_EMBED_TIMEOUT)
+        """
         # Initialize with the parent class but don't pass any data
         super().__init__()
-        # Use provided API key or try to get from environment
-        self._api_key = os.getenv("OPENAI_API_KEY")
-        
-        # No overriding of parameters allowed
-        
-        # In a real implementation, you would set up the client here
-        # openai.api_key = self._api_key
-    
+        self._model_name = model_name or os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+        self._target_dimension = MODEL_DIMENSIONS.get(self._model_name, 1536)
+        azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT", "")
+        if base_url is None and not os.getenv("OPENAI_BASE_URL") and azure_endpoint:
+            self._base_url = azure_endpoint.rstrip("/")
+            self._azure_deployment = os.getenv("AZURE_EMBEDDING_DEPLOYMENT", self._model_name)
+            self._azure_api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01")
+            self._api_key = api_key or os.getenv("AZURE_OPENAI_API_KEY")
+        else:
+            self._base_url = (base_url or os.getenv("OPENAI_BASE_URL", DEFAULT_BASE_URL)).rstrip("/")
+            self._api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self._max_batch_tokens = max_batch_tokens or int(os.getenv("OPENAI_EMBED_BATCH_TOKENS", "100000"))
+        self._max_batch_size = max_batch_size or int(os.getenv("OPENAI_EMBED_BATCH_SIZE", "2048"))
+        self._concurrency = concurrency or int(os.getenv("OPENAI_EMBED_CONCURRENCY", "8"))
+        self._max_retries = max_retries if max_retries is not None else int(os.getenv("OPENAI_EMBED_MAX_RETRIES", "6"))
+        self._backoff_base = backoff_base if backoff_base is not None else float(os.getenv("OPENAI_EMBED_BACKOFF", "0.5"))
+        self._timeout = timeout or float(os.getenv("OPENAI_EMBED_TIMEOUT", "60"))
+
     def encode(self, texts: List[str]) -> np.ndarray:
         """
         Encode a list of texts into embeddings using OpenAI API.
-        
+
+        Runs aencode on an event loop of its own, in a helper thread if the
+        calling thread already runs one.
+
         Args:
             texts: List of text strings to encode
-            
+
+        Returns:
+            numpy.ndarray: float32 array of embeddings, in the order of texts
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.aencode(texts))
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self.aencode(texts)).result()
+
+    async def aencode(self, texts: List[str], client: Any = None) -> np.ndarray:
+        """
+        Encode a list of texts with concurrent, token-packed requests.
+
+        Args:
+            texts: List of text strings to encode
+            client: httpx.AsyncClient to send the requests with, such as one from
+                create_client() kept by a server (default: one for this call)
+
+        Returns:
+            numpy.ndarray: float32 array of embeddings, in the order of texts
+
+        Raises:
+            OpenAIEmbeddingError: If a request fails with a status that is not retried, or after max_retries
+        """
+        embeddings = np.zeros((len(texts), self._target_dimension), dtype=np.float32)
+        if not texts:
+            return embeddings
+        batches = self._pack(texts)
+        if client is None:
+            async with self.create_client() as own_client:
+                await self._embed_batches(own_client, texts, batches, embeddings)
+        else:
+            await self._embed_batches(client, texts, batches, embeddings)
+        get_metrics().increment("openai_embed_requests", "all", len(batches))
+        return embeddings
+
+    async def _embed_batches(self, client: Any, texts: List[str], batches: List[List[int]],
+                             embeddings: np.ndarray) -> None:
+        """Send the packed requests concurrently; the first failure cancels the requests still running."""
+        semaphore = asyncio.Semaphore(self._concurrency)
+        tasks = [asyncio.create_task(self._embed_batch(client, semaphore, texts, rows, embeddings))
+                 for rows in batches]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            # Also reached when the caller is cancelled, so no request outlives the call
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        for task in tasks:
+            if task in done and task.exception() is not None:
+                raise task.exception()
+
+    def create_client(self) -> Any:
+        """
+        Create an httpx.AsyncClient for the API, with a connection pool sized to the concurrency limit.
+
+        Returns:
+            httpx.AsyncClient
+        """
+        import httpx
+        headers = {"api-key": self._api_key} if self._azure_deployment else {"Authorization": f"Bearer {self._api_key}"}
+        limits = httpx.Limits(max_connections=self._concurrency, max_keepalive_connections=self._concurrency)
+        return httpx.AsyncClient(headers=headers, timeout=self._timeout, limits=limits)
+
+    def _pack(self, texts: List[str]) -> List[List[int]]:
+        """Pack consecutive texts into requests of at most max_batch_tokens tokens and max_batch_size inputs."""
+        batches: List[List[int]] = []
+        batch: List[int] = []
+        tokens = 0
+        for i, count in enumerate(self.count_tokens(texts)):
+            count = max(count, 1)
+            if batch and (len(batch) >= self._max_batch_size or tokens + count > self._max_batch_tokens):
+                batches.append(batch)
+                batch, tokens = [], 0
+            batch.append(i)
+            tokens += count
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _request(self, inputs: List[str]) -> Dict[str, Any]:
+        """URL, query parameters and JSON body of an embeddings request."""
+        body: Dict[str, Any] = {"input": inputs, "model": self._model_name, "encoding_format": self._encoding_format}
+        if self._azure_deployment:
+            return {"url": f"{self._base_url}/openai/deployments/{self._azure_deployment}/embeddings",
+                    "params": {"api-version": self._azure_api_version}, "json": body}
+        return {"url": f"{self._base_url}/embeddings", "json": body}
+
+    async def _embed_batch(self, client: Any, semaphore: asyncio.Semaphore, texts: List[str], rows: List[int],
+                           embeddings: np.ndarray) -> None:
+        """Send one packed request, retrying it, and write its embeddings into their rows."""
+        import httpx
+        request = self._request([texts[i] for i in rows])
+        for attempt in range(self._max_retries + 1):
+            retry_after: Optional[float] = None
+            async with semaphore:
+                try:
+                    response = await client.post(**request)
+                except httpx.TransportError as e:
+                    reason = f"{type(e).__name__}: {e}"
+                else:
+                    if response.status_code == 200:
+                        self._store(response.json(), rows, embeddings)
+                        return
+                    reason = f"HTTP {response.status_code}: {response.text[:200]}"
+                    if response.status_code not in RETRY_STATUS_CODES:
+                        raise OpenAIEmbeddingError(f"Embeddings request of {len(rows)} input(s) failed: {reason}")
+                    retry_after = _retry_after_seconds(response.headers.get("retry-after"))
+            if attempt == self._max_retries:
+                raise OpenAIEmbeddingError(f"Embeddings request of {len(rows)} input(s) failed after "
+                                           f"{attempt + 1} attempts: {reason}")
+            # Full jitter, so requests throttled together do not retry together
+            delay = random.uniform(0, min(self._backoff_max, self._backoff_base * 2 ** attempt))
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            get_metrics().increment("openai_embed_retries", "all")
+            logger.warning(f"Retrying embeddings request in {delay:.2f}s ({reason})")
+            await asyncio.sleep(delay)
+
+    def _store(self, payload: Dict[str, Any], rows: List[int], embeddings: np.ndarray) -> None:
+        """Write the embeddings of a response into the rows of its inputs, by their index in the request."""
+        data = payload.get("data", [])
+        if len(data) != len(rows):
+            raise OpenAIEmbeddingError(f"Embeddings response has {len(data)} item(s) for {len(rows)} input(s)")
+        for item in data:
+            embedding = item["embedding"]
+            if isinstance(embedding, str):
+                vector = np.frombuffer(base64.b64decode(embedding), dtype="<f4")
+            else:
+                vector = np.asarray(embedding, dtype=np.float32)
+            embeddings[rows[item["index"]]] = vector
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """
+        Count the tokens of each text with the model's tiktoken encoding.
+
+        Models tiktoken does not know, such as newer models, are counted with
+        cl100k_base. Falls back to the base class estimate when tiktoken is
+        not installed.
+
+        Args:
+            texts: List of text strings to measure
+
+        Returns:
+            List[int]: Number of tokens of each text
+        """
+        try:
+            import tiktoken
+        except ImportError:
+            return super().count_tokens(texts)
+        try:
+            encoding = tiktoken.encoding_for_model(self._model_name)
+        except KeyError:
+            encoding = tiktoken.get_encoding(FALLBACK_ENCODING)
+        return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+
+    @property
+    def max_seq_length(self) -> Optional[int]:
+        """
+        Get the maximum number of tokens the API accepts per input.
+
         Returns:
-            numpy.ndarray: Array of embeddings
-        """
-        # Placeholder: In a real implementation, you would call the OpenAI API
-        # response = openai.Embedding.create(input=texts, model=self._model_name)
-        # embeddings = [item['embedding'] for item in response['data']]
-        # return np.array(embeddings)
-        
-        # For now, return dummy embeddings for demonstration
-        return np.random.rand(len(texts), self._target_dimension)
-    
+            Optional[int]: Maximum input length
+        """
+        return 8191
+
     @property
     def model_name(self) -> str:
         """
         Get the name of the model.
-        
+
         Returns:
             str: Name of the model
         """
         return self._model_name
-        
+
     @property
     def target_dimension(self) -> int:
         """
         Get the target dimension of the embeddings.
-        
+
         Returns:
             int: The dimension of the embedding vectors
         """
         return self._target_dimension
-    
+
     def get_model_name(self) -> str:
         """
         Get the name of the model.
-        
+
         Returns:
             str: Name of the model
         """
-        return self._model_name 
\ No newline at end of file
+        return self._model_name
+
+
+def _retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds; HTTP dates are ignored."""
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
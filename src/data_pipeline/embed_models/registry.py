@@ -0,0 +1,131 @@
+"""
+Process-wide embedding model registry for the TeacherBot data pipeline.
+
+Every entry point (the ingestion Flask service, process_pdf.main, the RAG
+query script and generate_embedding_batch without a model) gets its model
+from the registry, so each backend is created and loaded once per process
+and shared by all threads. warmup() loads the weights and tokenizer up front,
+at server start, and records how long each load took and how much resident
+memory it added, so request-time code never pays for a model load.
+"""
+import os
+import resource
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src.data_pipeline.embed_models.factory import get_embedding_model
+from src.data_pipeline.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+WARMUP_TEXT = "Form I-485 instructions"
+
+
+def resident_memory_bytes() -> int:
+    """Current resident set size of this process, or its peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+class ModelRegistry:
+    """
+    Thread-safe, per-process cache of embedding models keyed by backend.
+
+    get() returns the one instance of a backend, creating it on first use;
+    concurrent first calls create it once. Models load their weights lazily,
+    so get() is cheap until warmup() or the first encode.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        self._models: Dict[str, Any] = {}
+        self._backend_locks: Dict[str, threading.Lock] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def _backend_lock(self, backend: str) -> threading.Lock:
+        with self._lock:
+            # A forked child inherits the parent's models but not its loaded native state
+            if self._pid != os.getpid():
+                self._reset()
+            return self._backend_locks.setdefault(backend, threading.Lock())
+
+    def get(self, backend: Optional[str] = None, warm: bool = False) -> Any:
+        """
+        Get the process's model for a backend.
+
+        Args:
+            backend: 'torch', 'onnx' or 'openai' (default: EMBEDDING_BACKEND)
+            warm: Load the model before returning it, if it is not loaded yet
+
+        Returns:
+            The shared embedding model
+        """
+        backend = backend or os.getenv("EMBEDDING_BACKEND", "torch")
+        with self._backend_lock(backend):
+            model = self._models.get(backend)
+            if model is None:
+                model = get_embedding_model(backend)
+                self._models[backend] = model
+                self._stats[backend] = {"model": model.get_model_name(), "loaded": False}
+            if warm and not self._stats[backend]["loaded"]:
+                self._load(backend, model)
+        return model
+
+    def _load(self, backend: str, model: Any) -> None:
+        """Load the model's weights and tokenizer with a first encode, and record what it cost."""
+        rss_before = resident_memory_bytes()
+        start = time.perf_counter()
+        model.encode([WARMUP_TEXT])
+        if hasattr(model, "count_tokens"):
+            model.count_tokens([WARMUP_TEXT])
+        stats = self._stats[backend]
+        stats.update(loaded=True, load_seconds=time.perf_counter() - start,
+                     rss_delta_bytes=max(0, resident_memory_bytes() - rss_before))
+        logger.info(f"Loaded embedding model {stats['model']} ({backend}) in {stats['load_seconds']:.2f}s, "
+                    f"+{stats['rss_delta_bytes'] / 1e6:.0f} MB resident")
+
+    def warmup(self, backends: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Load models ahead of the first request.
+
+        Args:
+            backends: Backends to load (default: the comma-separated EMBEDDING_WARMUP, or EMBEDDING_BACKEND)
+
+        Returns:
+            Load statistics of every registered model, as from stats()
+        """
+        if backends is None:
+            configured = os.getenv("EMBEDDING_WARMUP", "")
+            backends = [name.strip() for name in configured.split(",") if name.strip()] or [None]
+        for backend in backends:
+            self.get(backend, warm=True)
+        logger.info(f"Embedding models warm; process resident memory {resident_memory_bytes() / 1e6:.0f} MB")
+        return self.stats()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get load statistics of the registered models.
+
+        Returns:
+            Dict of backend to model name, whether it is loaded, and for loaded models
+            load_seconds and rss_delta_bytes
+        """
+        with self._lock:
+            return {backend: dict(stats) for backend, stats in self._stats.items()}
+
+
+_registry = ModelRegistry()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Get the process-wide model registry."""
+    return _registry
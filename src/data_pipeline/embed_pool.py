@@ -0,0 +1,294 @@
+"""
+Multi-process embedding pool for the TeacherBot data pipeline.
+
+Ingestion threads that share one in-process model serialize on the GIL for
+tokenization and pooling, and their intra-op thread pools oversubscribe the
+cores. The EmbeddingPool runs a copy of the model in each of N worker
+processes instead, each pinned to its own slice of the cores with a matching
+intra-op thread count, and spreads encode() calls across them.
+
+Texts and embeddings do not travel through pickled queues: every worker has
+an input and an output SharedMemory block. The parent writes a batch of
+texts into the input block as UTF-8 bytes with an offset table, sends the
+worker a (count, bytes) message over a pipe, and copies the embeddings back
+out of the output block once the worker replies. A text too large for the
+input block is sent inline over the pipe instead.
+"""
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+from multiprocessing import shared_memory
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+from src.data_pipeline.embed_batcher import estimate_tokens
+from src.data_pipeline.embed_models import ModelWrapper
+from src.data_pipeline.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_INPUT_BYTES = 1024 * 1024
+
+
+def available_cores() -> List[int]:
+    """CPU cores this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _worker_main(model: Any, conn: Any, input_name: str, output_name: str, batch_size: int,
+                 cores: List[int], threads: int) -> None:
+    """Encode batches from the parent until it sends None. Runs in a worker process."""
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    # Read by torch, MKL and OpenMP when they are first imported, and by the ONNX backend
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "ONNX_INTRA_OP_THREADS"):
+        os.environ[variable] = str(threads)
+    # Spawned workers share the parent's resource tracker, so the parent's unlink also unregisters these
+    input_block = shared_memory.SharedMemory(name=input_name)
+    output_block = shared_memory.SharedMemory(name=output_name)
+    offsets = np.ndarray((batch_size + 1,), dtype=np.int64, buffer=input_block.buf)
+    data_start = offsets.nbytes
+    output = np.ndarray((batch_size, model.target_dimension), dtype=np.float32, buffer=output_block.buf)
+    threads_set = False
+    try:
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            count, inline = message
+            try:
+                if inline is not None:
+                    texts = inline
+                else:
+                    raw = bytes(input_block.buf[data_start:data_start + int(offsets[count])])
+                    texts = [raw[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(count)]
+                output[:count] = model.encode(texts)
+                if not threads_set and "torch" in sys.modules:
+                    # torch may have been imported before OMP_NUM_THREADS was set
+                    sys.modules["torch"].set_num_threads(threads)
+                    threads_set = True
+                conn.send(None)
+            except Exception as e:
+                conn.send(f"{type(e).__name__}: {e}")
+    finally:
+        del offsets, output
+        input_block.close()
+        output_block.close()
+
+
+class _PoolRequest:
+    """One encode() call waiting for its sub-batches."""
+    def __init__(self, count: int, dimension: int):
+        self.embeddings = np.zeros((count, dimension), dtype=np.float32)
+        self.remaining = 0
+        self.error: Optional[BaseException] = None
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        with self.lock:
+            if error is not None and self.error is None:
+                self.error = error
+            self.remaining -= 1
+            if self.remaining <= 0:
+                self.done.set()
+
+
+class _Worker:
+    """A worker process with its pipe and shared memory blocks."""
+    def __init__(self, index: int, cores: List[int], threads: int):
+        self.index = index
+        self.cores = cores
+        self.threads = threads
+        self.process: Any = None
+        self.conn: Any = None
+        self.input_block: Optional[shared_memory.SharedMemory] = None
+        self.output_block: Optional[shared_memory.SharedMemory] = None
+
+
+class EmbeddingPool(ModelWrapper):
+    """
+    Embedding model wrapper that encodes in a pool of pinned worker processes.
+
+    encode() is thread-safe: the texts of each call are sorted by length,
+    cut into batches of at most batch_size texts that fit the input block,
+    and queued for whichever worker is free, so concurrent callers and large
+    documents keep every worker busy. Tokens are counted with the model in
+    the calling process.
+    """
+    def __init__(self, model: Any, workers: Optional[int] = None, threads_per_worker: Optional[int] = None,
+                 batch_size: Optional[int] = None, input_bytes: Optional[int] = None):
+        """
+        Args:
+            model: The embedding model; a copy is loaded in every worker
+            workers: Number of worker processes (default: EMBED_POOL_WORKERS, or half the cores)
+            threads_per_worker: Intra-op threads and pinned cores per worker (default: EMBED_POOL_THREADS,
+                or the cores divided among the workers)
+            batch_size: Maximum texts per worker encode call (default: EMBED_POOL_BATCH_SIZE)
+            input_bytes: Size of each worker's input block for UTF-8 text (default: EMBED_POOL_INPUT_BYTES)
+        """
+        super().__init__(model)
+        cores = available_cores()
+        self.workers = workers or int(os.getenv("EMBED_POOL_WORKERS", "0")) or max(1, len(cores) // 2)
+        self.threads_per_worker = (threads_per_worker or int(os.getenv("EMBED_POOL_THREADS", "0"))
+                                   or max(1, len(cores) // self.workers))
+        self.batch_size = batch_size or int(os.getenv("EMBED_POOL_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+        self.input_bytes = input_bytes or int(os.getenv("EMBED_POOL_INPUT_BYTES", DEFAULT_INPUT_BYTES))
+        self._context = multiprocessing.get_context("spawn")
+        # (texts, row indices, request), or None to stop a dispatcher
+        self._tasks: "queue.Queue[Optional[Tuple[List[str], List[int], _PoolRequest]]]" = queue.Queue()
+        self._closed = False
+        self.texts_encoded = 0
+        self.batches_encoded = 0
+        self.restarts = 0
+        self._stats_lock = threading.Lock()
+
+        self._workers: List[_Worker] = []
+        self._dispatchers: List[threading.Thread] = []
+        for index in range(self.workers):
+            # Consecutive slices of the cores, wrapping around if workers x threads exceeds them
+            slice_cores = [cores[(index * self.threads_per_worker + offset) % len(cores)]
+                           for offset in range(self.threads_per_worker)]
+            worker = _Worker(index, sorted(set(slice_cores)), self.threads_per_worker)
+            worker.input_block = shared_memory.SharedMemory(create=True, size=8 * (self.batch_size + 1)
+                                                            + self.input_bytes)
+            worker.output_block = shared_memory.SharedMemory(create=True, size=4 * self.batch_size
+                                                             * model.target_dimension)
+            self._start_worker(worker)
+            self._workers.append(worker)
+            thread = threading.Thread(target=self._dispatch, args=(worker,), name=f"embedding-pool-{index}",
+                                      daemon=True)
+            thread.start()
+            self._dispatchers.append(thread)
+        logger.info(f"Started embedding pool with {self.workers} worker process(es) of "
+                    f"{self.threads_per_worker} thread(s) each")
+
+    def _start_worker(self, worker: _Worker) -> None:
+        parent_conn, child_conn = self._context.Pipe()
+        worker.process = self._context.Process(
+            target=_worker_main, name=f"embedding-worker-{worker.index}", daemon=True,
+            args=(self._model, child_conn, worker.input_block.name, worker.output_block.name,
+                  self.batch_size, worker.cores, worker.threads))
+        worker.process.start()
+        child_conn.close()
+        worker.conn = parent_conn
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts in the worker processes.
+
+        Args:
+            texts: List of text strings to encode
+
+        Returns:
+            numpy.ndarray: float32 array of embeddings, in the order of texts
+        """
+        request = _PoolRequest(len(texts), self.target_dimension)
+        if not texts:
+            return request.embeddings
+        if self._closed:
+            raise RuntimeError("Cannot encode with a closed EmbeddingPool")
+        batches = self._make_batches(texts)
+        request.remaining = len(batches)
+        for rows in batches:
+            self._tasks.put(([texts[i] for i in rows], rows, request))
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.embeddings
+
+    def _make_batches(self, texts: List[str]) -> List[List[int]]:
+        """Sort texts by length and cut them into batches that fit a worker's blocks."""
+        order = sorted(range(len(texts)), key=lambda i: estimate_tokens(texts[i]))
+        batches: List[List[int]] = []
+        batch: List[int] = []
+        size = 0
+        for i in order:
+            # Encoded length is at most 4 bytes per character; checked exactly when the batch is sent
+            text_bytes = 4 * len(texts[i])
+            if batch and (len(batch) >= self.batch_size or size + text_bytes > self.input_bytes):
+                batches.append(batch)
+                batch, size = [], 0
+            batch.append(i)
+            size += text_bytes
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _dispatch(self, worker: _Worker) -> None:
+        """Send queued batches to one worker, one at a time, and copy its embeddings back."""
+        offsets = np.ndarray((self.batch_size + 1,), dtype=np.int64, buffer=worker.input_block.buf)
+        data_start = offsets.nbytes
+        output = np.ndarray((self.batch_size, self.target_dimension), dtype=np.float32,
+                            buffer=worker.output_block.buf)
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                return
+            texts, rows, request = task
+            try:
+                encoded = [text.encode("utf-8") for text in texts]
+                inline = None
+                if sum(len(data) for data in encoded) > self.input_bytes:
+                    inline = texts
+                else:
+                    position = 0
+                    offsets[0] = 0
+                    for i, data in enumerate(encoded):
+                        worker.input_block.buf[data_start + position:data_start + position + len(data)] = data
+                        position += len(data)
+                        offsets[i + 1] = position
+                worker.conn.send((len(texts), inline))
+                error = worker.conn.recv()
+                if error is not None:
+                    raise RuntimeError(f"Embedding worker {worker.index} failed: {error}")
+                request.embeddings[rows] = output[:len(texts)]
+                with self._stats_lock:
+                    self.texts_encoded += len(texts)
+                    self.batches_encoded += 1
+                request.finish()
+            except (EOFError, OSError) as e:
+                logger.error(f"Embedding worker {worker.index} exited ({str(e)}); restarting it")
+                request.finish(RuntimeError(f"Embedding worker {worker.index} exited"))
+                with self._stats_lock:
+                    self.restarts += 1
+                worker.process.join(timeout=1)
+                self._start_worker(worker)
+            except Exception as e:
+                request.finish(e)
+
+    def close(self) -> None:
+        """Finish queued batches, stop the workers and free the shared memory."""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._dispatchers:
+            self._tasks.put(None)
+        for thread in self._dispatchers:
+            thread.join()
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except (EOFError, OSError):
+                pass
+            worker.process.join(timeout=10)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.conn.close()
+            for block in (worker.input_block, worker.output_block):
+                block.close()
+                block.unlink()
+        logger.info(f"Embedding pool closed: {self.texts_encoded} texts in {self.batches_encoded} batches "
+                    f"on {self.workers} worker(s), {self.restarts} restart(s)")
+
+    def __enter__(self) -> "EmbeddingPool":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
@@ -0,0 +1,206 @@
+"""
+Columnar batch of embedding vectors for the TeacherBot data pipeline.
+
+An EmbeddingBatch holds the embeddings of many chunks as one contiguous
+float32 matrix, with the chunk metadata kept as columns (one list per
+metadata field) instead of one dictionary and one pydantic EmbeddingVector
+per chunk. Slicing a batch shares the matrix and the columns, so splitting
+a document into upsert batches copies nothing. Rows are turned into the
+id / values / metadata dictionaries the vector index expects only at the
+wire boundary, with to_wire(), when the upsert request is built.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from src.data_pipeline.chunks import ChunkRecord
+from src.data_pipeline.models import EmbeddingVector
+
+# Metadata fields of a ChunkRecord, in the order of ChunkRecord.to_dict()
+RECORD_FIELDS = ('document_name', 'page', 'chunk_index', 'start_token_index', 'end_token_index',
+                 'parent', 'id', 'raw_text', 'children', 'block_ids', 'end_page')
+# Rough size of a single float once serialized to JSON
+_BYTES_PER_FLOAT = 12
+# Marks a metadata field that a dictionary row does not have
+_MISSING = object()
+
+
+def _cell_bytes(value: Any) -> int:
+    """Approximate JSON size of one metadata value."""
+    if isinstance(value, str):
+        # Non-ASCII characters are escaped as \\uXXXX
+        return len(value) + 2 if value.isascii() else 6 * len(value) + 2
+    if isinstance(value, list):
+        return 2 + sum(_cell_bytes(item) + 1 for item in value)
+    return len(str(value))
+
+
+class EmbeddingBatch:
+    """
+    Embedding vectors of a list of chunks, as a float32 matrix and metadata columns.
+
+    A batch is a view of rows [start, stop) of its matrix and columns;
+    slices share both with the batch they were taken from.
+    """
+    __slots__ = ('_ids', '_values', '_columns', '_start', '_stop')
+
+    def __init__(self, ids: List[str], values: np.ndarray, columns: Dict[str, List[Any]],
+                 start: int = 0, stop: Optional[int] = None):
+        """
+        Args:
+            ids: Vector ID of every row
+            values: float32 array of shape (len(ids), dimension)
+            columns: Metadata field name -> value of every row
+            start: First row of the view
+            stop: End of the view (default: the last row)
+        """
+        self._ids = ids
+        self._values = values
+        self._columns = columns
+        self._start = start
+        self._stop = len(ids) if stop is None else stop
+
+    @classmethod
+    def from_records(cls, records: Sequence[Union[ChunkRecord, Dict[str, Any]]],
+                     values: np.ndarray) -> "EmbeddingBatch":
+        """
+        Build a batch from chunk metadata and its embeddings.
+
+        Args:
+            records: ChunkRecords or metadata dictionaries, one per row
+            values: Embeddings of the records, in the same order
+
+        Returns:
+            A batch holding values as a contiguous float32 matrix
+        """
+        values = np.ascontiguousarray(values, dtype=np.float32)
+        if values.ndim != 2:
+            values = values.reshape(len(records), -1) if values.size else np.zeros((len(records), 0), np.float32)
+        if records and all(isinstance(record, ChunkRecord) for record in records):
+            columns = {field: [getattr(record, field) for record in records] for field in RECORD_FIELDS}
+        else:
+            rows = [record.to_dict() if isinstance(record, ChunkRecord) else record for record in records]
+            fields = list(dict.fromkeys(field for row in rows for field in row))
+            columns = {field: [row.get(field, _MISSING) for row in rows] for field in fields}
+        ids = [vector_id if vector_id is not _MISSING and vector_id is not None else ''
+               for vector_id in columns.get('id', [''] * len(records))]
+        return cls(ids, values, columns)
+
+    @classmethod
+    def from_vectors(cls, vectors: Sequence[EmbeddingVector]) -> "EmbeddingBatch":
+        """
+        Build a batch from EmbeddingVector objects.
+
+        Args:
+            vectors: Embedding vectors, all of the same dimension
+
+        Returns:
+            A batch with the vectors' IDs, values and metadata
+        """
+        if not vectors:
+            return cls.empty()
+        batch = cls.from_records([vector.metadata for vector in vectors], [vector.values for vector in vectors])
+        batch._ids = [vector.id for vector in vectors]
+        return batch
+
+    @classmethod
+    def empty(cls, dimension: int = 0) -> "EmbeddingBatch":
+        """A batch without rows."""
+        return cls([], np.zeros((0, dimension), dtype=np.float32), {})
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def __getitem__(self, rows: slice) -> "EmbeddingBatch":
+        """Rows of the batch as a view sharing its matrix and columns; only contiguous slices are supported."""
+        if not isinstance(rows, slice) or rows.step not in (None, 1):
+            raise TypeError("EmbeddingBatch only supports contiguous slices")
+        start, stop, _ = rows.indices(len(self))
+        return EmbeddingBatch(self._ids, self._values, self._columns, self._start + start,
+                              self._start + max(start, stop))
+
+    @property
+    def ids(self) -> List[str]:
+        """Vector IDs of the rows."""
+        return self._ids[self._start:self._stop]
+
+    @property
+    def values(self) -> np.ndarray:
+        """float32 embeddings of the rows, a view of the batch's matrix."""
+        return self._values[self._start:self._stop]
+
+    @property
+    def dimension(self) -> int:
+        """Embedding dimension."""
+        return self._values.shape[1]
+
+    def column(self, field: str) -> List[Any]:
+        """
+        Metadata values of one field for the rows.
+
+        Args:
+            field: Metadata field name
+
+        Returns:
+            The field of every row, None where a row does not have it
+        """
+        values = self._columns.get(field)
+        if values is None:
+            return [None] * len(self)
+        return [None if value is _MISSING else value for value in values[self._start:self._stop]]
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        """
+        Vector metadata of one row, as stored in the index.
+
+        Fields without a value are left out, since the index does not accept
+        nulls, except 'parent', which is an empty string for chunks without one.
+
+        Args:
+            row: Row of the batch
+
+        Returns:
+            The metadata dictionary of the row
+        """
+        position = self._start + row
+        metadata: Dict[str, Any] = {}
+        for field, values in self._columns.items():
+            value = values[position]
+            if value is None or value is _MISSING:
+                if field == 'parent':
+                    metadata[field] = ""
+                continue
+            metadata[field] = list(value) if isinstance(value, list) else value
+        if 'parent' not in metadata:
+            metadata['parent'] = ""
+        return metadata
+
+    def estimate_bytes(self) -> List[int]:
+        """
+        Estimate the serialized upsert payload size of every row.
+
+        Returns:
+            Approximate JSON size in bytes of each row's id, values and metadata
+        """
+        sizes = [len(vector_id) + _BYTES_PER_FLOAT * self.dimension for vector_id in self.ids]
+        for field, values in self._columns.items():
+            overhead = len(field) + 4
+            for row, value in enumerate(values[self._start:self._stop]):
+                if value is not None and value is not _MISSING:
+                    sizes[row] += overhead + _cell_bytes(value)
+        return sizes
+
+    def to_wire(self) -> List[Dict[str, Any]]:
+        """
+        Build the upsert payload of the rows.
+
+        Returns:
+            Dictionaries with 'id', 'values' (a list of floats) and 'metadata' keys
+        """
+        values = self.values.tolist()
+        return [{"id": vector_id, "values": row_values, "metadata": self.metadata(row)}
+                for row, (vector_id, row_values) in enumerate(zip(self.ids, values))]
+
+    def to_vectors(self) -> List[EmbeddingVector]:
+        """Convert the rows to EmbeddingVector objects, for callers of the list-based API."""
+        return [EmbeddingVector(**vector) for vector in self.to_wire()]
@@ -0,0 +1,505 @@
+"""
+In-process stand-ins for external services used by the TeacherBot data pipeline.
+
+These fakes mimic the small subset of the Google Cloud Storage, Pinecone and
+document database APIs used by the pipeline, plus a deterministic embedding
+model and a local server for the OpenAI embeddings API, so that ingestion
+throughput can be measured offline, without network access, credentials or
+model downloads. install_fakes() wires them into the
+pipeline's shared client getters and database functions.
+"""
+import base64
+import hashlib
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.data_pipeline.logger import setup_logger
+from src.data_pipeline.models import DocumentText
+
+logger = setup_logger(__name__)
+
+
+class FakeVectorIndex:
+    """
+    In-memory vector index exposing the Pinecone Index methods used by the pipeline.
+
+    An optional per-request latency simulates the network round trip of a
+    real upsert, and failure_rate makes a fraction of requests raise so that
+    retry behaviour can be exercised.
+    """
+    def __init__(self, dimension: Optional[int] = None, latency: float = 0.0, failure_rate: float = 0.0):
+        """
+        Args:
+            dimension: Expected vector dimension, or None to accept any dimension
+            latency: Seconds to sleep per request, simulating a network round trip
+            failure_rate: Fraction of upsert requests (0.0-1.0) that raise an error
+        """
+        self.dimension = dimension
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.vectors: Dict[str, Dict[str, Any]] = {}
+        self.upsert_requests = 0
+        self.failed_requests = 0
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors: List[Dict[str, Any]], **kwargs) -> Dict[str, int]:
+        """
+        Store vectors in memory.
+
+        Args:
+            vectors: List of dictionaries with 'id', 'values' and 'metadata' keys
+
+        Returns:
+            Dictionary with the number of upserted vectors, like Pinecone's response
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.upsert_requests += 1
+            if self.failure_rate and (self.upsert_requests * self.failure_rate) % 1 < self.failure_rate:
+                self.failed_requests += 1
+                raise ConnectionError("Simulated upsert failure")
+            for vector in vectors:
+                if self.dimension is not None and len(vector["values"]) != self.dimension:
+                    raise ValueError(f"Vector dimension {len(vector['values'])} does not match "
+                                     f"index dimension {self.dimension}")
+                self.vectors[vector["id"]] = vector
+        return {"upserted_count": len(vectors)}
+
+    def fetch(self, ids: List[str], **kwargs) -> Dict[str, Any]:
+        """
+        Return stored vectors by ID.
+
+        Args:
+            ids: The vector IDs to fetch
+
+        Returns:
+            Dictionary with a 'vectors' mapping of ID to vector
+        """
+        with self._lock:
+            return {"vectors": {i: self.vectors[i] for i in ids if i in self.vectors}}
+
+    def list(self, prefix: Optional[str] = None, limit: int = 100, **kwargs) -> Iterator[List[str]]:
+        """
+        Page through the stored vector IDs, like Pinecone's list() on serverless indexes.
+
+        Args:
+            prefix: Only list IDs starting with this prefix
+            limit: Maximum number of IDs per page
+
+        Yields:
+            Lists of at most limit vector IDs
+        """
+        with self._lock:
+            ids = [i for i in self.vectors if prefix is None or i.startswith(prefix)]
+        for start in range(0, len(ids), limit):
+            yield ids[start:start + limit]
+
+    def delete(self, ids: List[str], **kwargs) -> Dict[str, Any]:
+        """
+        Remove vectors by ID.
+
+        Args:
+            ids: The vector IDs to delete
+
+        Returns:
+            An empty dictionary, like Pinecone's response
+        """
+        with self._lock:
+            for i in ids:
+                self.vectors.pop(i, None)
+        return {}
+
+    def describe_index_stats(self, **kwargs) -> Dict[str, Any]:
+        """
+        Return index statistics.
+
+        Returns:
+            Dictionary with the index dimension and total vector count
+        """
+        with self._lock:
+            return {"dimension": self.dimension, "total_vector_count": len(self.vectors)}
+
+
+class FakeBlob:
+    """In-memory blob exposing the google.cloud.storage Blob methods used by the pipeline."""
+    def __init__(self, bucket: "FakeBucket", name: str, data: Optional[bytes] = None):
+        self.bucket = bucket
+        self.name = name
+        self.data = data
+        self.crc32c: Optional[str] = None
+
+    @property
+    def size(self) -> Optional[int]:
+        return len(self.data) if self.data is not None else None
+
+    @property
+    def md5_hash(self) -> Optional[str]:
+        """Base64-encoded MD5 of the content, as reported by GCS."""
+        if self.data is None:
+            return None
+        return base64.b64encode(hashlib.md5(self.data).digest()).decode("ascii")
+
+    def exists(self) -> bool:
+        return self.bucket.get_blob(self.name) is not None
+
+    def download_as_bytes(self) -> bytes:
+        if self.bucket.latency:
+            time.sleep(self.bucket.latency)
+        blob = self.bucket.get_blob(self.name)
+        if blob is None:
+            raise FileNotFoundError(f"No such object: {self.bucket.name}/{self.name}")
+        return blob.data
+
+    def download_as_text(self, encoding: str = "utf-8") -> str:
+        return self.download_as_bytes().decode(encoding)
+
+    def upload_from_string(self, data: Any, content_type: Optional[str] = None) -> None:
+        self.data = data.encode("utf-8") if isinstance(data, str) else bytes(data)
+        self.bucket.put_blob(self)
+
+
+class FakeBucket:
+    """In-memory bucket exposing the google.cloud.storage Bucket methods used by the pipeline."""
+    def __init__(self, name: str, latency: float = 0.0):
+        """
+        Args:
+            name: Bucket name
+            latency: Seconds to sleep per download, simulating a network round trip
+        """
+        self.name = name
+        self.latency = latency
+        self._blobs: Dict[str, FakeBlob] = {}
+        self._lock = threading.Lock()
+
+    def blob(self, name: str) -> FakeBlob:
+        return FakeBlob(self, name)
+
+    def get_blob(self, name: str) -> Optional[FakeBlob]:
+        with self._lock:
+            return self._blobs.get(name)
+
+    def put_blob(self, blob: FakeBlob) -> None:
+        with self._lock:
+            self._blobs[blob.name] = blob
+
+    def add(self, name: str, data: bytes) -> FakeBlob:
+        """
+        Store an object in the bucket.
+
+        Args:
+            name: Object name
+            data: Object content
+
+        Returns:
+            The stored blob
+        """
+        blob = FakeBlob(self, name, data)
+        self.put_blob(blob)
+        return blob
+
+    def list_blobs(self, prefix: Optional[str] = None, max_results: Optional[int] = None) -> List[FakeBlob]:
+        with self._lock:
+            blobs = [blob for name, blob in sorted(self._blobs.items())
+                     if prefix is None or name.startswith(prefix)]
+        return blobs[:max_results] if max_results is not None else blobs
+
+
+class FakeStorageClient:
+    """In-memory client exposing the google.cloud.storage Client methods used by the pipeline."""
+    def __init__(self, latency: float = 0.0):
+        """
+        Args:
+            latency: Seconds to sleep per download in buckets created by this client
+        """
+        self.latency = latency
+        self._buckets: Dict[str, FakeBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, bucket_name: str) -> FakeBucket:
+        """Return the bucket with the given name, creating it on first use."""
+        with self._lock:
+            if bucket_name not in self._buckets:
+                self._buckets[bucket_name] = FakeBucket(bucket_name, latency=self.latency)
+            return self._buckets[bucket_name]
+
+    def get_bucket(self, bucket_name: str) -> FakeBucket:
+        return self.bucket(bucket_name)
+
+    def list_blobs(self, bucket_name: str, prefix: Optional[str] = None,
+                   max_results: Optional[int] = None) -> List[FakeBlob]:
+        return self.bucket(bucket_name).list_blobs(prefix=prefix, max_results=max_results)
+
+
+class FakeDocumentStore:
+    """
+    In-memory stand-in for the PostgreSQL documents table.
+
+    Exposes the functions of src.data_pipeline.db used by the pipeline, with an
+    optional per-call latency simulating a database round trip.
+    """
+    def __init__(self, latency: float = 0.0):
+        """
+        Args:
+            latency: Seconds to sleep per call, simulating a database round trip
+        """
+        self.latency = latency
+        self.documents: Dict[str, List[DocumentText]] = {}
+        self._lock = threading.Lock()
+
+    def initialize_db(self) -> bool:
+        return True
+
+    def store_document(self, doc: DocumentText) -> bool:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.documents.setdefault(doc.filename, []).append(doc)
+        return True
+
+    def document_exists(self, filename: str) -> bool:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            return bool(self.documents.get(filename))
+
+    def delete_documents(self, filename: str) -> bool:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.documents.pop(filename, None)
+        return True
+
+
+class FakeEmbeddingModel:
+    """
+    Deterministic embedding model that hashes words into a fixed-size vector.
+
+    Exposes the same interface as all_minilm_l6_v2, so pipeline code can run
+    without downloading model weights. cost_per_token adds a simulated
+    encode cost so that embedding still shows up in stage breakdowns.
+    """
+    def __init__(self, dimension: int = 384, target_dimension: Optional[int] = None,
+                 cost_per_token: float = 0.0, max_seq_length: Optional[int] = 256):
+        """
+        Args:
+            dimension: Dimension of the returned embeddings
+            target_dimension: Dimension reported to the pipeline (default: dimension)
+            cost_per_token: Seconds to sleep per whitespace-separated token encoded
+            max_seq_length: Input length reported to the pipeline, special tokens included
+        """
+        self._model_name = "fake/hashing-embedding"
+        self._dimension = dimension
+        self._target_dimension = target_dimension or dimension
+        self.cost_per_token = cost_per_token
+        self._max_seq_length = max_seq_length
+        self.texts_encoded = 0
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode a list of texts into normalized hashed bag-of-words embeddings.
+
+        Args:
+            texts: List of text strings to encode
+
+        Returns:
+            numpy.ndarray: Array of embeddings
+        """
+        embeddings = np.zeros((len(texts), self._dimension), dtype=np.float32)
+        tokens = 0
+        for row, text in enumerate(texts):
+            words = text.lower().split()
+            tokens += len(words)
+            for word in words:
+                embeddings[row, zlib.crc32(word.encode("utf-8")) % self._dimension] += 1.0
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings /= np.where(norms == 0, 1.0, norms)
+        if self.cost_per_token:
+            time.sleep(tokens * self.cost_per_token)
+        self.texts_encoded += len(texts)
+        return embeddings
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Count whitespace-separated words, which is what encode() hashes."""
+        return [len(text.split()) for text in texts]
+
+    @property
+    def max_seq_length(self) -> Optional[int]:
+        return self._max_seq_length
+
+    @property
+    def num_special_tokens(self) -> int:
+        return 2
+
+    @property
+    def model_name(self) -> str:
+        return self._model_name
+
+    @property
+    def target_dimension(self) -> int:
+        return self._target_dimension
+
+    def get_model_name(self) -> str:
+        return self._model_name
+
+
+class FakeEmbeddingServer:
+    """
+    Local HTTP server speaking the OpenAI /v1/embeddings protocol.
+
+    Embeds with a FakeEmbeddingModel, so responses are deterministic and can
+    be compared with a local encode. latency and latency_per_input simulate
+    the API's response time, and failure_rate answers a fraction of requests
+    with failure_status (429 by default) so that retries can be exercised.
+    Counts requests and the most requests handled at once.
+    """
+    def __init__(self, dimension: int = 1536, latency: float = 0.0, latency_per_input: float = 0.0,
+                 failure_rate: float = 0.0, failure_status: int = 429, port: int = 0):
+        """
+        Args:
+            dimension: Dimension of the returned embeddings
+            latency: Seconds to sleep per request
+            latency_per_input: Additional seconds to sleep per input of a request
+            failure_rate: Fraction of requests (0.0-1.0) answered with failure_status
+            failure_status: HTTP status of the failed requests
+            port: Port to listen on, 0 for any free port
+        """
+        self.model = FakeEmbeddingModel(dimension=dimension)
+        self.latency = latency
+        self.latency_per_input = latency_per_input
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.requests = 0
+        self.failed_requests = 0
+        self.inputs = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._port = port
+        self._server: Any = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """Base URL to pass to OpenAIEmbeddingModel, ending in /v1."""
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def start(self) -> "FakeEmbeddingServer":
+        """Start serving in a background thread."""
+        import json
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep connections alive between requests, like the real API
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; do not wait for the client's delayed ACK
+            disable_nagle_algorithm = True
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                status, payload = fake._handle(self.path, body)
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", self._port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-embedding-server",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def _handle(self, path: str, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """Answer one embeddings request with (status, JSON payload)."""
+        inputs = body.get("input", [])
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            failed = bool(self.failure_rate) and (self.requests * self.failure_rate) % 1 < self.failure_rate
+            if failed:
+                self.failed_requests += 1
+        try:
+            delay = self.latency + self.latency_per_input * len(inputs)
+            if delay:
+                time.sleep(delay)
+            if failed:
+                return self.failure_status, {"error": {"message": "Simulated failure", "type": "rate_limit_error"}}
+            if not path.rstrip("/").endswith("/embeddings"):
+                return 404, {"error": {"message": f"Unknown path {path}"}}
+            embeddings = self.model.encode(inputs)
+            as_base64 = body.get("encoding_format") == "base64"
+            data = [{"object": "embedding", "index": index,
+                     "embedding": (base64.b64encode(vector.astype("<f4").tobytes()).decode("ascii") if as_base64
+                                   else vector.tolist())}
+                    for index, vector in enumerate(embeddings)]
+            tokens = sum(self.model.count_tokens(inputs))
+            with self._lock:
+                self.inputs += len(inputs)
+            return 200, {"object": "list", "data": data, "model": body.get("model"),
+                         "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def stop(self) -> None:
+        """Stop serving."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeEmbeddingServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+
+@contextmanager
+def install_fakes(storage_client: Optional[FakeStorageClient] = None,
+                  index: Optional[FakeVectorIndex] = None,
+                  document_store: Optional[FakeDocumentStore] = None) -> Iterator[None]:
+    """
+    Route the pipeline's storage, vector index and document database to fakes.
+
+    The fakes replace the shared clients returned by get_storage_client() and
+    get_pinecone_index() and the db functions used by the pipeline, and the
+    originals are restored on exit. Only affects the current process.
+
+    Args:
+        storage_client: Fake storage client to use
+        index: Fake vector index to use
+        document_store: Fake document store to use
+    """
+    from src.data_pipeline import db, utils
+
+    saved_clients = (utils._storage_client, utils._pinecone_index)
+    db_functions = ("initialize_db", "store_document", "document_exists", "delete_documents")
+    saved_db = {name: getattr(db, name) for name in db_functions}
+    if storage_client is not None:
+        utils._storage_client = storage_client
+    if index is not None:
+        utils._pinecone_index = index
+    if document_store is not None:
+        for name in db_functions:
+            setattr(db, name, getattr(document_store, name))
+    try:
+        yield
+    finally:
+        utils._storage_client, utils._pinecone_index = saved_clients
+        for name, function in saved_db.items():
+            setattr(db, name, function)
@@ -0,0 +1,100 @@
+"""
+Per-model vector index configuration for the TeacherBot data pipeline.
+
+Embeddings are stored at each model's native dimension (384 for
+all-MiniLM-L6-v2) instead of being zero-padded to a shared width, so every
+embedding model needs its own Pinecone index created with that dimension.
+This module resolves the index of a model and checks, before anything is
+written, that the index dimension matches the vectors the model produces.
+
+Indexes that still hold vectors zero-padded by earlier versions of the
+pipeline are migrated with migrate_index.py.
+"""
+import os
+import re
+from typing import Any, Optional
+
+from src.data_pipeline.logger import setup_logger
+from src.data_pipeline.models import IndexConfig
+
+logger = setup_logger(__name__)
+
+
+def model_env_suffix(model_name: str) -> str:
+    """
+    Turn a model name into an environment variable suffix.
+
+    Args:
+        model_name: Model name, e.g. "sentence-transformers/all-minilm-l6-v2"
+
+    Returns:
+        The last path component in upper snake case, e.g. "ALL_MINILM_L6_V2"
+    """
+    return re.sub(r"[^A-Za-z0-9]+", "_", model_name.rsplit("/", 1)[-1]).strip("_").upper()
+
+
+def get_index_config(model: Any) -> IndexConfig:
+    """
+    Resolve the vector index configuration of an embedding model.
+
+    The index name is read from PINECONE_INDEX_NAME_<MODEL> (e.g.
+    PINECONE_INDEX_NAME_ALL_MINILM_L6_V2), falling back to
+    PINECONE_INDEX_NAME, so several models can be indexed side by side.
+    The dimension is the model's native target_dimension and the metric is
+    read from PINECONE_METRIC.
+
+    Args:
+        model: Embedding model (or EmbeddingBatcher)
+
+    Returns:
+        The model's index configuration
+    """
+    model_name = model.get_model_name()
+    name = os.getenv(f"PINECONE_INDEX_NAME_{model_env_suffix(model_name)}") or os.getenv("PINECONE_INDEX_NAME", "")
+    return IndexConfig(name=name, model_name=model_name, dimension=model.target_dimension,
+                       metric=os.getenv("PINECONE_METRIC", "cosine"))
+
+
+def get_index_dimension(index: Any) -> Optional[int]:
+    """
+    Read the dimension of a vector index from its statistics.
+
+    Args:
+        index: Pinecone index (or FakeVectorIndex)
+
+    Returns:
+        The index dimension, or None if the index does not report one
+    """
+    stats = index.describe_index_stats()
+    dimension = stats.get("dimension") if isinstance(stats, dict) else getattr(stats, "dimension", None)
+    return int(dimension) if dimension else None
+
+
+def validate_index_dimension(index: Any, config: IndexConfig) -> bool:
+    """
+    Check that a vector index stores vectors of the model's native dimension.
+
+    Args:
+        index: Pinecone index (or FakeVectorIndex)
+        config: Index configuration from get_index_config()
+
+    Returns:
+        True if the dimensions match (or the index does not report one), False otherwise
+    """
+    try:
+        dimension = get_index_dimension(index)
+    except Exception as e:
+        logger.error(f"Failed to read the dimension of index {config.name}: {str(e)}")
+        return False
+    if dimension is None or dimension == config.dimension:
+        return True
+    if dimension > config.dimension:
+        logger.error(f"Index {config.name} has dimension {dimension} but {config.model_name} produces "
+                     f"{config.dimension}-dimensional vectors. If it holds zero-padded vectors from an earlier "
+                     f"version, migrate them to a {config.dimension}-dimensional index with "
+                     f"python -m src.data_pipeline.migrate_index --source {config.name} --target <new index>")
+    else:
+        logger.error(f"Index {config.name} has dimension {dimension} but {config.model_name} produces "
+                     f"{config.dimension}-dimensional vectors; configure an index for the model with "
+                     f"PINECONE_INDEX_NAME_{model_env_suffix(config.model_name)}")
+    return False
@@ -0,0 +1,348 @@
+"""
+Durable run journal for the TeacherBot data pipeline.
+
+The journal is an append-only JSON Lines log of per-file ingestion events:
+a file starting, each stage completing, the file finishing (with the
+fingerprint and vector IDs that go into the ingestion manifest) or failing.
+Every event is flushed to a local file as it happens and the file is
+checkpointed to the GCS bucket periodically, so a preempted run loses at most
+the last checkpoint interval.
+
+On restart the journal acts as a write-ahead log for the manifest: finished
+files are replayed into the manifest and skipped, vectors upserted by
+interrupted attempts are cleaned up, and failed files can be retried on
+their own.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.data_pipeline.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_JOURNAL_BLOB = "manifests/ingestion_journal.jsonl"
+DEFAULT_JOURNAL_PATH = "ingestion_journal.jsonl"
+DEFAULT_CHECKPOINT_INTERVAL = 30.0
+
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class RunJournal:
+    """
+    Thread-safe append-only log of per-file stage completion.
+
+    The state of a file is rebuilt by replaying its events: a "start" event
+    begins a new attempt, "stage" events add completed stages (the upsert
+    stage also records the vector IDs it wrote), and "done" or "failed" end
+    the attempt.
+    """
+    def __init__(self, bucket: Optional[Any] = None, blob_name: Optional[str] = None,
+                 path: Optional[str] = None, checkpoint_interval: Optional[float] = None):
+        """
+        Args:
+            bucket: GCS bucket to checkpoint the journal to
+            blob_name: Name of the journal blob in the bucket
+            path: Local file the journal is appended to
+            checkpoint_interval: Minimum seconds between checkpoints to the bucket
+        """
+        self._bucket = bucket
+        self._blob_name = blob_name or os.getenv("INGESTION_JOURNAL_BLOB", DEFAULT_JOURNAL_BLOB)
+        self._path = path or os.getenv("INGESTION_JOURNAL_PATH", DEFAULT_JOURNAL_PATH)
+        self._checkpoint_interval = (checkpoint_interval if checkpoint_interval is not None
+                                     else float(os.getenv("INGESTION_JOURNAL_CHECKPOINT_INTERVAL",
+                                                          DEFAULT_CHECKPOINT_INTERVAL)))
+        self.run_id = uuid.uuid4().hex[:12]
+        self._states: Dict[str, Dict[str, Any]] = {}
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._checkpoint_lock = threading.Lock()
+        self._last_checkpoint = time.monotonic()
+        self._file = None
+
+    def load(self) -> "RunJournal":
+        """
+        Replay the journal from the bucket and the local file, then open it for appending.
+
+        Events from both copies are merged, so a restart on the same machine
+        keeps events newer than the last checkpoint and a restart on a new
+        machine picks up the checkpoint.
+
+        Returns:
+            The journal itself, for chaining
+        """
+        events: Dict[str, Dict[str, Any]] = {}
+        for raw in (self._read_checkpoint(), self._read_local()):
+            for line in raw.splitlines():
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    # A preempted write can leave a truncated last line
+                    continue
+                events[event.get("id", line)] = event
+
+        ordered = sorted(events.values(), key=lambda event: (event.get("ts", 0), event.get("seq", 0)))
+        for event in ordered:
+            self._apply(event)
+
+        # Rewrite the local file with the merged history before appending to it
+        self._rewrite(ordered)
+        logger.info(f"Loaded run journal with {len(ordered)} event(s) for {len(self._states)} file(s); "
+                    f"{len(self.failed_files())} failed, {len(self.interrupted_files())} interrupted")
+        return self
+
+    def start_file(self, file_name: str) -> None:
+        """
+        Record the start of a new attempt at a file.
+
+        Args:
+            file_name: Blob name
+        """
+        self._append({"event": "start", "file": file_name})
+
+    def record_stage(self, file_name: str, stage: str, vector_ids: Optional[List[str]] = None) -> None:
+        """
+        Record that a stage completed for a file.
+
+        Args:
+            file_name: Blob name
+            stage: Stage name
+            vector_ids: IDs of the vectors written by the stage, for the upsert stage
+        """
+        event: Dict[str, Any] = {"event": "stage", "file": file_name, "stage": stage}
+        if vector_ids is not None:
+            event["vector_ids"] = vector_ids
+        self._append(event)
+
+    def record_vectors(self, file_name: str, vector_ids: List[str]) -> None:
+        """
+        Record vectors about to be written for a file, before they are upserted.
+
+        Used when a file is upserted in several batches, so vectors of an
+        attempt interrupted mid-way are known and cleaned up on restart.
+
+        Args:
+            file_name: Blob name
+            vector_ids: IDs of the vectors in the next batch
+        """
+        self._append({"event": "vectors", "file": file_name, "vector_ids": vector_ids})
+
+    def record_done(self, file_name: str, fingerprint: Optional[str] = None,
+                    content_hash: Optional[str] = None, vector_ids: Optional[List[str]] = None) -> None:
+        """
+        Record that a file was fully ingested.
+
+        Args:
+            file_name: Blob name
+            fingerprint: Manifest fingerprint the file was ingested with
+            content_hash: Content hash of the blob
+            vector_ids: IDs of all vectors of the file
+        """
+        self._append({"event": "done", "file": file_name, "fingerprint": fingerprint,
+                      "content_hash": content_hash, "vector_ids": vector_ids or []})
+
+    def record_failed(self, file_name: str, stage: str, error: str) -> None:
+        """
+        Record that a file failed.
+
+        Args:
+            file_name: Blob name
+            stage: Stage the file failed in
+            error: Error message
+        """
+        self._append({"event": "failed", "file": file_name, "stage": stage, "error": error})
+
+    def state(self, file_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the state of the latest attempt at a file.
+
+        Args:
+            file_name: Blob name
+
+        Returns:
+            Dictionary with status, completed stages, vector IDs, attempts and
+            the failing stage and error if any, or None if the file is not in the journal
+        """
+        with self._lock:
+            state = self._states.get(file_name)
+            return dict(state, stages=list(state["stages"])) if state is not None else None
+
+    def failed_files(self) -> List[str]:
+        """Blob names whose latest attempt failed."""
+        return self._files_with_status(STATUS_FAILED)
+
+    def interrupted_files(self) -> List[str]:
+        """Blob names whose latest attempt started but never finished or failed."""
+        return self._files_with_status(STATUS_RUNNING)
+
+    def completed_entries(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Return the manifest data of every file whose latest attempt finished.
+
+        Returns:
+            Mapping of blob name to fingerprint, content hash and vector IDs
+        """
+        with self._lock:
+            return {name: {"fingerprint": state["fingerprint"], "content_hash": state["content_hash"],
+                           "vector_ids": list(state["vector_ids"])}
+                    for name, state in self._states.items() if state["status"] == STATUS_DONE}
+
+    def orphaned_vector_ids(self) -> Dict[str, List[str]]:
+        """
+        Return vectors written by attempts that failed or were interrupted after upserting.
+
+        These vectors are not referenced by the manifest and are replaced when
+        the file is processed again, so they should be deleted.
+
+        Returns:
+            Mapping of blob name to vector IDs
+        """
+        with self._lock:
+            return {name: list(state["vector_ids"]) for name, state in self._states.items()
+                    if state["status"] != STATUS_DONE and state["vector_ids"]}
+
+    def compact(self, keep: Optional[Iterable[str]] = None) -> None:
+        """
+        Drop the history of finished files, once the manifest holding them is saved.
+
+        Only the latest attempt of unfinished files (and of files in keep) is
+        retained, so failed files stay retryable and the journal does not grow
+        across runs.
+
+        Args:
+            keep: Additional blob names whose latest state to retain
+        """
+        keep_names = set(keep or [])
+        with self._lock:
+            retained = {name: state for name, state in self._states.items()
+                        if state["status"] != STATUS_DONE or name in keep_names}
+            events = [self._state_event(name, state) for name, state in retained.items()]
+            self._states = {}
+            for event in events:
+                self._apply(event)
+        self._rewrite(events)
+        self.checkpoint(force=True)
+
+    def checkpoint(self, force: bool = False) -> bool:
+        """
+        Upload the local journal to the bucket.
+
+        Args:
+            force: Upload even if the checkpoint interval has not elapsed
+
+        Returns:
+            True if the journal is checkpointed (or there is no bucket), False otherwise
+        """
+        if self._bucket is None:
+            return True
+        if not force and time.monotonic() - self._last_checkpoint < self._checkpoint_interval:
+            return True
+        # Only one thread uploads at a time; others keep appending locally
+        if not self._checkpoint_lock.acquire(blocking=force):
+            return True
+        try:
+            with self._lock:
+                if self._file is not None:
+                    self._file.flush()
+                with open(self._path, "r", encoding="utf-8") as f:
+                    payload = f.read()
+                self._last_checkpoint = time.monotonic()
+            self._bucket.blob(self._blob_name).upload_from_string(payload, content_type="application/x-ndjson")
+            logger.debug(f"Checkpointed run journal to {self._blob_name}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to checkpoint run journal: {str(e)}")
+            return False
+        finally:
+            self._checkpoint_lock.release()
+
+    def close(self) -> None:
+        """Checkpoint the journal and close the local file."""
+        self.checkpoint(force=True)
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _append(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            self._sequence += 1
+            event.update({"id": f"{self.run_id}:{self._sequence}", "run": self.run_id,
+                          "seq": self._sequence, "ts": time.time()})
+            self._apply(event)
+            if self._file is None:
+                self._file = open(self._path, "a", encoding="utf-8")
+            self._file.write(json.dumps(event) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self.checkpoint()
+
+    def _apply(self, event: Dict[str, Any]) -> None:
+        name = event.get("file")
+        if name is None:
+            return
+        kind = event.get("event")
+        state = self._states.get(name)
+        if kind == "start" or state is None:
+            attempts = state["attempts"] if state is not None else 0
+            state = self._states[name] = {"status": STATUS_RUNNING, "stages": [], "vector_ids": [],
+                                          "attempts": attempts + (1 if kind == "start" else 0),
+                                          "fingerprint": None, "content_hash": None,
+                                          "stage": None, "error": None}
+        if kind == "stage":
+            state["stages"].append(event["stage"])
+            if event.get("vector_ids") is not None:
+                state["vector_ids"] = event["vector_ids"]
+        elif kind == "vectors":
+            state["vector_ids"] = state["vector_ids"] + event.get("vector_ids", [])
+        elif kind == "done":
+            state.update(status=STATUS_DONE, fingerprint=event.get("fingerprint"),
+                         content_hash=event.get("content_hash"), vector_ids=event.get("vector_ids", []))
+        elif kind == "failed":
+            state.update(status=STATUS_FAILED, stage=event.get("stage"), error=event.get("error"))
+        elif kind == "state":
+            # Compacted snapshot of a file's latest attempt
+            state.update({key: event[key] for key in state if key in event})
+
+    def _state_event(self, name: str, state: Dict[str, Any]) -> Dict[str, Any]:
+        self._sequence += 1
+        return dict(state, stages=list(state["stages"]), event="state", file=name,
+                    id=f"{self.run_id}:{self._sequence}", run=self.run_id, seq=self._sequence, ts=time.time())
+
+    def _files_with_status(self, status: str) -> List[str]:
+        with self._lock:
+            return [name for name, state in self._states.items() if state["status"] == status]
+
+    def _read_checkpoint(self) -> str:
+        if self._bucket is None:
+            return ""
+        try:
+            blob = self._bucket.blob(self._blob_name)
+            return blob.download_as_text() if blob.exists() else ""
+        except Exception as e:
+            logger.error(f"Failed to read run journal checkpoint, ignoring it: {str(e)}")
+            return ""
+
+    def _read_local(self) -> str:
+        if not os.path.exists(self._path):
+            return ""
+        with open(self._path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def _rewrite(self, events: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            tmp_path = f"{self._path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for event in events:
+                    f.write(json.dumps(event) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._path)
+            self._file = open(self._path, "a", encoding="utf-8")
@@ -0,0 +1,233 @@
+"""
+Incremental ingestion manifest for the TeacherBot data pipeline.
+
+The manifest records, for every ingested blob, a fingerprint built from the
+blob's content hash and the hyperparameters that shape its vectors
+(chunk_size, chunk_overlap, embedding model name and chunking method). Blobs
+whose fingerprint matches the manifest are skipped before download, so a
+re-run only processes new or changed documents.
+
+The manifest is a small JSON document stored in the GCS bucket next to the
+data (or on local disk when no bucket is given).
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.data_pipeline.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_MANIFEST_BLOB = "manifests/ingestion_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def blob_content_hash(blob: Any) -> Optional[str]:
+    """
+    Return the content hash GCS reports for a blob, without downloading it.
+
+    Args:
+        blob: A google.cloud.storage Blob (or any object with md5_hash/crc32c attributes)
+
+    Returns:
+        The MD5 hash if available (not set for composite objects), otherwise the
+        CRC32C checksum, otherwise None
+    """
+    md5_hash = getattr(blob, "md5_hash", None)
+    if md5_hash:
+        return f"md5:{md5_hash}"
+    crc32c = getattr(blob, "crc32c", None)
+    if crc32c:
+        return f"crc32c:{crc32c}"
+    return None
+
+
+def compute_fingerprint(content_hash: str, chunk_size: int, chunk_overlap: int, model_name: str,
+                        chunker: str = "") -> str:
+    """
+    Combine a content hash with the ingestion hyperparameters into one fingerprint.
+
+    Args:
+        content_hash: Content hash of the source blob
+        chunk_size: Maximum number of tokens per chunk
+        chunk_overlap: Number of tokens to overlap between chunks
+        model_name: Name of the embedding model
+        chunker: Identifies the chunking method (e.g. the tokenizer), so that
+            changing it re-indexes documents
+
+    Returns:
+        A hex SHA-256 digest identifying this version of the document's vectors
+    """
+    key = f"{content_hash}|{chunk_size}|{chunk_overlap}|{model_name}"
+    if chunker:
+        key += f"|{chunker}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class IngestionManifest:
+    """
+    Thread-safe record of which blobs have been ingested with which fingerprint.
+
+    Entries are keyed by blob name and hold the fingerprint, the content hash,
+    the vector IDs that were upserted and the time of ingestion. The vector IDs
+    let a changed document's stale vectors be deleted after it is re-indexed.
+    """
+    def __init__(self, bucket: Optional[Any] = None, blob_name: Optional[str] = None,
+                 path: Optional[str] = None):
+        """
+        Args:
+            bucket: GCS bucket to store the manifest in
+            blob_name: Name of the manifest blob in the bucket
+            path: Local file path to store the manifest in when no bucket is given
+        """
+        self._bucket = bucket
+        self._blob_name = blob_name or os.getenv("INGESTION_MANIFEST_BLOB", DEFAULT_MANIFEST_BLOB)
+        self._path = path or os.getenv("INGESTION_MANIFEST_PATH", "")
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    def load(self) -> "IngestionManifest":
+        """
+        Load the manifest from storage. A missing or unreadable manifest starts empty.
+
+        Returns:
+            The manifest itself, for chaining
+        """
+        try:
+            raw: Optional[str] = None
+            if self._bucket is not None:
+                blob = self._bucket.blob(self._blob_name)
+                if blob.exists():
+                    raw = blob.download_as_text()
+            elif self._path and os.path.exists(self._path):
+                with open(self._path, "r", encoding="utf-8") as f:
+                    raw = f.read()
+
+            if raw:
+                data = json.loads(raw)
+                if data.get("version") == MANIFEST_VERSION:
+                    self._entries = data.get("documents", {})
+                else:
+                    logger.warning(f"Ignoring manifest with unsupported version {data.get('version')}")
+            logger.info(f"Loaded ingestion manifest with {len(self._entries)} document(s)")
+        except Exception as e:
+            logger.error(f"Failed to load ingestion manifest, starting empty: {str(e)}")
+            self._entries = {}
+        return self
+
+    def save(self) -> bool:
+        """
+        Write the manifest back to storage if it changed.
+
+        Returns:
+            True if the manifest is persisted, False otherwise
+        """
+        with self._lock:
+            if not self._dirty:
+                return True
+            payload = json.dumps({"version": MANIFEST_VERSION, "documents": self._entries})
+            self._dirty = False
+        try:
+            if self._bucket is not None:
+                self._bucket.blob(self._blob_name).upload_from_string(payload, content_type="application/json")
+            elif self._path:
+                tmp_path = f"{self._path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(payload)
+                os.replace(tmp_path, self._path)
+            else:
+                logger.warning("No manifest location configured; manifest not saved")
+                return False
+            logger.info(f"Saved ingestion manifest with {len(self._entries)} document(s)")
+            return True
+        except Exception as e:
+            with self._lock:
+                self._dirty = True
+            logger.error(f"Failed to save ingestion manifest: {str(e)}")
+            return False
+
+    def get(self, file_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the manifest entry for a blob.
+
+        Args:
+            file_name: Blob name
+
+        Returns:
+            The entry dictionary, or None if the blob has not been ingested
+        """
+        with self._lock:
+            entry = self._entries.get(file_name)
+            return dict(entry) if entry is not None else None
+
+    def is_unchanged(self, file_name: str, fingerprint: str) -> bool:
+        """
+        Check whether a blob was already ingested with the given fingerprint.
+
+        Args:
+            file_name: Blob name
+            fingerprint: Fingerprint from compute_fingerprint()
+
+        Returns:
+            True if the recorded fingerprint matches
+        """
+        with self._lock:
+            entry = self._entries.get(file_name)
+            return entry is not None and entry.get("fingerprint") == fingerprint
+
+    def record(self, file_name: str, fingerprint: str, content_hash: str, vector_ids: List[str]) -> None:
+        """
+        Record a successful ingestion of a blob.
+
+        Args:
+            file_name: Blob name
+            fingerprint: Fingerprint the blob was ingested with
+            content_hash: Content hash of the blob
+            vector_ids: IDs of the vectors upserted for the blob
+        """
+        with self._lock:
+            self._entries[file_name] = {
+                "fingerprint": fingerprint,
+                "content_hash": content_hash,
+                "vector_ids": list(dict.fromkeys(vector_ids)),
+                "ingested_at": time.time()
+            }
+            self._dirty = True
+
+    def forget_missing(self, present_file_names: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Drop entries for blobs that no longer exist in the bucket.
+
+        Args:
+            present_file_names: Names of all blobs currently in the bucket
+
+        Returns:
+            The removed entries keyed by blob name, so their vectors can be deleted
+        """
+        present = set(present_file_names)
+        with self._lock:
+            removed = {name: entry for name, entry in self._entries.items() if name not in present}
+            for name in removed:
+                del self._entries[name]
+            if removed:
+                self._dirty = True
+        return removed
+
+    def all_vector_ids(self) -> List[str]:
+        """
+        Return the vector IDs recorded for all blobs.
+
+        Returns:
+            Unique vector IDs, in manifest order
+        """
+        with self._lock:
+            return list(dict.fromkeys(vector_id for entry in self._entries.values()
+                                      for vector_id in entry.get("vector_ids", [])))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,319 @@
+"""
+Ingestion metrics for the TeacherBot data pipeline.
+
+Records latency histograms and counters for every ingestion stage
+(download, parse, chunk, embed, upsert, store), labeled by document source
+(uscis_pdf, uscis_html, reddit_post), so a run shows which stage bounds
+throughput. Metrics can be rendered in the Prometheus text exposition format
+or written out as a JSON run report.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.data_pipeline.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+STAGES = ("download", "parse", "chunk", "embed", "upsert", "store")
+SOURCES = ("uscis_pdf", "uscis_html", "reddit_post")
+UNKNOWN_SOURCE = "unknown"
+
+# Upper bounds in seconds, from sub-millisecond chunking up to multi-minute parses
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+METRIC_PREFIX = "ingestion"
+
+
+def source_from_file_name(file_name: str) -> str:
+    """
+    Derive the document source label from a blob name.
+
+    Blobs are uploaded as structured_data/<source>/..., see
+    src/data_ingestion/scripts/upload_to_gcp.py.
+
+    Args:
+        file_name: Blob name in the bucket
+
+    Returns:
+        One of SOURCES, or "unknown" if the path does not name a known source
+    """
+    for part in file_name.split("/"):
+        if part in SOURCES:
+            return part
+    return UNKNOWN_SOURCE
+
+
+class Histogram:
+    """Cumulative latency histogram with fixed bucket bounds."""
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts: List[int] = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float) -> None:
+        """
+        Record one observation.
+
+        Args:
+            value: The observed value in seconds
+        """
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile by linear interpolation within the matching bucket.
+
+        Args:
+            q: Quantile between 0 and 1
+
+        Returns:
+            Estimated value, or 0.0 if nothing was observed
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                estimate = lower + (bound - lower) * (rank - seen) / bucket_count
+                return min(max(estimate, self.min), self.max)
+            seen += bucket_count
+            lower = bound
+        # The quantile falls in the +Inf bucket
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return count, total, mean, min, max and estimated p50/p95/p99."""
+        return {
+            "count": self.count,
+            "total_seconds": self.sum,
+            "mean_seconds": self.sum / self.count if self.count else 0.0,
+            "min_seconds": self.min or 0.0,
+            "max_seconds": self.max or 0.0,
+            "p50_seconds": self.quantile(0.50),
+            "p95_seconds": self.quantile(0.95),
+            "p99_seconds": self.quantile(0.99),
+        }
+
+
+class IngestionMetrics:
+    """
+    Thread-safe registry of per-stage latency histograms and counters.
+
+    Latencies are keyed by (stage, source) and counters by (name, source).
+    Stage functions record into the process-wide registry from get_metrics(),
+    which the /metrics endpoint and the run report read from.
+    """
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS):
+        """
+        Args:
+            buckets: Latency histogram bucket upper bounds in seconds
+        """
+        self._buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._counters: Dict[Tuple[str, str], float] = {}
+        self.started_at = time.time()
+
+    def observe(self, stage: str, source: str, seconds: float) -> None:
+        """
+        Record the latency of one stage execution.
+
+        Args:
+            stage: Stage name, one of STAGES
+            source: Document source label
+            seconds: Time spent in the stage
+        """
+        with self._lock:
+            histogram = self._histograms.get((stage, source))
+            if histogram is None:
+                histogram = self._histograms[(stage, source)] = Histogram(self._buckets)
+            histogram.observe(seconds)
+
+    def increment(self, name: str, source: str, value: float = 1) -> None:
+        """
+        Add to a counter.
+
+        Args:
+            name: Counter name, e.g. "documents_succeeded"
+            source: Document source label
+            value: Amount to add
+        """
+        with self._lock:
+            self._counters[(name, source)] = self._counters.get((name, source), 0) + value
+
+    @contextmanager
+    def timer(self, stage: str, source: str) -> Iterator[None]:
+        """
+        Time the enclosed block as one execution of a stage.
+
+        Failed executions are timed as well and counted in stage_failures.
+
+        Args:
+            stage: Stage name, one of STAGES
+            source: Document source label
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.increment(f"{stage}_failures", source)
+            raise
+        finally:
+            self.observe(stage, source, time.perf_counter() - start)
+
+    def reset(self) -> None:
+        """Drop all recorded metrics."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self.started_at = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Return all metrics as a JSON-serializable run report.
+
+        Returns:
+            Dictionary with per-stage latency summaries (overall and by source),
+            counters by source, and the stage with the largest total time
+        """
+        with self._lock:
+            histograms = {key: (h.to_dict(), h) for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+
+        stages: Dict[str, Any] = {}
+        for stage in sorted({stage for stage, _ in histograms}, key=_stage_order):
+            merged = Histogram(self._buckets)
+            by_source: Dict[str, Any] = {}
+            for (name, source), (summary, histogram) in histograms.items():
+                if name != stage:
+                    continue
+                by_source[source] = summary
+                _merge_into(merged, histogram)
+            stages[stage] = dict(merged.to_dict(), sources=by_source)
+
+        counter_report: Dict[str, Dict[str, float]] = {}
+        for (name, source), value in sorted(counters.items()):
+            counter_report.setdefault(name, {})[source] = value
+
+        bottleneck = max(stages, key=lambda name: stages[name]["total_seconds"]) if stages else None
+        return {
+            "started_at": self.started_at,
+            "elapsed_seconds": time.time() - self.started_at,
+            "stages": stages,
+            "counters": counter_report,
+            "bottleneck_stage": bottleneck,
+        }
+
+    def write_report(self, path: str, extra: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Write the run report as JSON.
+
+        Args:
+            path: Output file path
+            extra: Additional fields to include, e.g. pipeline stats
+
+        Returns:
+            True if the report was written, False otherwise
+        """
+        report = self.to_dict()
+        if extra:
+            report.update(extra)
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, default=str)
+            logger.info(f"Wrote ingestion metrics report to {path}")
+            return True
+        except OSError as e:
+            logger.error(f"Failed to write metrics report to {path}: {str(e)}")
+            return False
+
+    def to_prometheus(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Returns:
+            The metrics page, e.g. for a /metrics endpoint
+        """
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        name = f"{METRIC_PREFIX}_stage_duration_seconds"
+        lines = [f"# HELP {name} Time spent in each ingestion stage per document.",
+                 f"# TYPE {name} histogram"]
+        for (stage, source), histogram in histograms:
+            labels = f'stage="{stage}",source="{source}"'
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.6f}")
+            lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+        emitted = set()
+        for (counter, source), value in counters:
+            metric = f"{METRIC_PREFIX}_{counter}_total"
+            if metric not in emitted:
+                lines.append(f"# TYPE {metric} counter")
+                emitted.add(metric)
+            lines.append(f'{metric}{{source="{source}"}} {_prometheus_value(value)}')
+        return "\n".join(lines) + "\n"
+
+    def log_summary(self) -> None:
+        """Log one line per stage with its latency percentiles and total time."""
+        report = self.to_dict()
+        for stage, summary in report["stages"].items():
+            logger.info(f"Stage {stage}: {summary['count']} run(s), total {summary['total_seconds']:.2f}s, "
+                        f"p50 {summary['p50_seconds']:.3f}s, p95 {summary['p95_seconds']:.3f}s, "
+                        f"max {summary['max_seconds']:.3f}s")
+        if report["bottleneck_stage"] is not None:
+            logger.info(f"Most time spent in stage: {report['bottleneck_stage']}")
+
+
+def _prometheus_value(value: float) -> str:
+    """Exact text of a sample value: integers without exponent, other floats with full precision."""
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _stage_order(stage: str) -> Tuple[int, str]:
+    return (STAGES.index(stage) if stage in STAGES else len(STAGES), stage)
+
+
+def _merge_into(target: Histogram, histogram: Histogram) -> None:
+    target.counts = [a + b for a, b in zip(target.counts, histogram.counts)]
+    target.count += histogram.count
+    target.sum += histogram.sum
+    if histogram.min is not None:
+        target.min = histogram.min if target.min is None else min(target.min, histogram.min)
+        target.max = histogram.max if target.max is None else max(target.max, histogram.max)
+
+
+_metrics = IngestionMetrics()
+
+
+def get_metrics() -> IngestionMetrics:
+    """
+    Returns the process-wide ingestion metrics registry.
+
+    Returns:
+        The shared IngestionMetrics instance
+    """
+    return _metrics
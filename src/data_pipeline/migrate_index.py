@@ -0,0 +1,165 @@
+"""
+Migration of zero-padded vectors to a native-dimension index for the TeacherBot data pipeline.
+
+Earlier versions of the pipeline padded every all-MiniLM-L6-v2 embedding
+with zeros from 384 to 3072 dimensions. Pinecone index dimensions are fixed
+at creation, so the vectors are copied into a new index created with the
+model's native dimension, truncated to their first --dimension values. IDs
+and metadata are kept, so the ingestion manifest, dedup index and parent /
+child links stay valid and no document has to be re-embedded. A vector
+whose values beyond --dimension are not all zero was not padded and is
+skipped and reported.
+
+Vector IDs are listed from the source index (list() is only available on
+serverless indexes) or, with --from-manifest, read from the ingestion
+manifest in BUCKET_NAME. Once the copy is complete, point
+PINECONE_INDEX_NAME (or PINECONE_INDEX_NAME_<MODEL>) at the target index;
+the source index can be deleted after retrieval has been switched over.
+
+Usage:
+    python -m src.data_pipeline.migrate_index --source teacherbot --target teacherbot-384 --create
+    python -m src.data_pipeline.migrate_index --source teacherbot --target teacherbot-384 --from-manifest
+"""
+import argparse
+import os
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv, find_dotenv
+
+from src.data_pipeline.index_config import get_index_config, validate_index_dimension
+from src.data_pipeline.logger import setup_logger
+from src.data_pipeline.models import EmbeddingVector
+from src.data_pipeline.vector_writer import BatchedVectorWriter
+
+logger = setup_logger(__name__)
+
+load_dotenv(find_dotenv())
+
+
+def _vector_fields(vector: Any) -> Tuple[List[float], Dict[str, Any]]:
+    """Values and metadata of a fetched vector, from a Pinecone Vector or a dictionary."""
+    if isinstance(vector, dict):
+        return list(vector.get("values", [])), dict(vector.get("metadata") or {})
+    return list(vector.values), dict(vector.metadata or {})
+
+
+def _fetched_vectors(response: Any) -> Dict[str, Any]:
+    """The ID -> vector mapping of a fetch() response."""
+    return response.get("vectors", {}) if isinstance(response, dict) else response.vectors
+
+
+def batched(ids: Iterable[str], batch_size: int) -> Iterator[List[str]]:
+    """
+    Group vector IDs into lists of at most batch_size.
+
+    Args:
+        ids: Vector IDs
+        batch_size: Maximum IDs per list
+
+    Yields:
+        Lists of vector IDs
+    """
+    batch: List[str] = []
+    for vector_id in ids:
+        batch.append(vector_id)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def migrate_index(source: Any, target: Any, dimension: int, id_batches: Iterable[List[str]],
+                  writer: Optional[BatchedVectorWriter] = None) -> Dict[str, int]:
+    """
+    Copy zero-padded vectors from one index to another, truncated to their native dimension.
+
+    Args:
+        source: Index holding the padded vectors
+        target: Index created with the native dimension
+        dimension: Native dimension to truncate to
+        id_batches: Lists of vector IDs to migrate, at most 1000 per list (Pinecone's fetch limit)
+        writer: Batched writer on the target index (default: one created and closed here)
+
+    Returns:
+        Counts of the vectors 'migrated', 'skipped' (not zero-padded) and 'missing' from the source
+    """
+    counts = {"migrated": 0, "skipped": 0, "missing": 0}
+    own_writer = writer is None
+    if own_writer:
+        writer = BatchedVectorWriter(target)
+    futures = []
+    try:
+        for ids in id_batches:
+            fetched = _fetched_vectors(source.fetch(ids=ids))
+            counts["missing"] += len(ids) - len(fetched)
+            vectors: List[EmbeddingVector] = []
+            for vector_id, vector in fetched.items():
+                values, metadata = _vector_fields(vector)
+                if len(values) < dimension or any(values[dimension:]):
+                    logger.warning(f"Vector {vector_id} has {len(values)} values that are not zero-padded "
+                                   f"beyond {dimension}; skipping it")
+                    counts["skipped"] += 1
+                    continue
+                vectors.append(EmbeddingVector(id=vector_id, values=values[:dimension], metadata=metadata))
+            if vectors:
+                futures.append(writer.write(vectors))
+                counts["migrated"] += len(vectors)
+        for future in futures:
+            future.result()
+    finally:
+        if own_writer:
+            writer.close()
+    return counts
+
+
+def manifest_vector_ids() -> List[str]:
+    """Return every vector ID recorded in the ingestion manifest of BUCKET_NAME."""
+    from src.data_pipeline.manifest import IngestionManifest
+    from src.data_pipeline.utils import get_storage_client
+
+    bucket = get_storage_client().get_bucket(os.getenv("BUCKET_NAME", ""))
+    return IngestionManifest(bucket=bucket).load().all_vector_ids()
+
+
+def main() -> None:
+    from src.data_pipeline.embed_models import all_minilm_l6_v2
+    from src.data_pipeline.utils import create_pinecone_index, initialize_pinecone
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", required=True, help="Index holding the zero-padded vectors")
+    parser.add_argument("--target", required=True, help="Index to copy the native-dimension vectors to")
+    parser.add_argument("--dimension", type=int, default=0,
+                        help="Native dimension (default: the dimension of the pipeline's embedding model)")
+    parser.add_argument("--create", action="store_true", help="Create the target index if it does not exist")
+    parser.add_argument("--from-manifest", action="store_true",
+                        help="Read vector IDs from the ingestion manifest instead of listing the source index")
+    parser.add_argument("--batch-size", type=int, default=100, help="Vector IDs fetched per request")
+    args = parser.parse_args()
+
+    config = get_index_config(all_minilm_l6_v2())
+    config = config.copy(update={"name": args.target, "dimension": args.dimension or config.dimension})
+    if args.create and not create_pinecone_index(config):
+        raise SystemExit(1)
+    source = initialize_pinecone(args.source)
+    target = initialize_pinecone(args.target)
+    if not validate_index_dimension(target, config):
+        raise SystemExit(1)
+
+    if args.from_manifest:
+        id_batches = batched(manifest_vector_ids(), args.batch_size)
+    else:
+        id_batches = source.list(limit=args.batch_size)
+
+    start = time.time()
+    counts = migrate_index(source, target, config.dimension, id_batches)
+    logger.info(f"Migrated {counts['migrated']} vector(s) from {args.source} to {args.target} at dimension "
+                f"{config.dimension} in {time.time() - start:.1f} seconds; skipped {counts['skipped']}, "
+                f"missing {counts['missing']}")
+    if counts["skipped"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
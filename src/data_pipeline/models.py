@@ -68,6 +68,24 @@ class BlockData(BaseModel):
     type: str  # Type of the block (e.g., "text", "title", "figure caption")
     parent: Optional[str] = None  # ID of the parent block, if any 
 
+class ParsedDocument(BaseModel):
+    """
+    Result of decoding a PDF document once.
+    
+    Holds both the classified layout blocks used for chunking and the plain
+    text of every page used for full-text storage, so each page is decoded a
+    single time on the ingestion path.
+    """
+    blocks: List[BlockData]  # Classified layout blocks in document order
+    page_texts: List[str]  # Plain text of each page, in page order
+    start_page: int = 1  # Page number of the first entry in page_texts
+    
+    @property
+    def raw_text(self) -> str:
+        """Page-delimited raw text, in the format stored in DocumentText.content."""
+        return "".join(f"\n\n--- Page {self.start_page + i} ---\n\n{text}"
+                       for i, text in enumerate(self.page_texts))
+
 # Model for PostgreSQL document storage
 class DocumentText(BaseModel):
     """
@@ -79,4 +97,17 @@ class DocumentText(BaseModel):
     id: str
     filename: str
     title: Optional[str] = None
-    content: str 
\ No newline at end of file
+    content: str 
+
+# Model for index_config.py
+class IndexConfig(BaseModel):
+    """
+    Vector index configuration for one embedding model.
+    
+    Vectors are stored at the model's native dimension, so every model
+    needs an index created with that dimension (see index_config.py).
+    """
+    name: str  # Pinecone index name
+    model_name: str  # Embedding model whose vectors the index stores
+    dimension: int  # Native embedding dimension of the model
+    metric: str = "cosine"  # Similarity metric the index was created with
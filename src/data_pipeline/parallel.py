@@ -0,0 +1,235 @@
+"""
+Process-pool PDF parsing for the TeacherBot data pipeline.
+
+PDF decoding, block classification and chunk tokenization are CPU-bound
+Python and serialize on the GIL when run from ingestion threads. This module
+runs the parse + chunk stages in a pool of worker processes sized to the
+available cores. Large PDFs are split into page ranges that are parsed in
+parallel. Each task receives a small PDF holding only its pages (see
+slice_pdf) rather than the whole file, and ships back compact tuples instead
+of Pydantic models or dictionaries; the parent process stitches the ranges
+together (hierarchy, children, chunk indices and page texts) before
+embedding and upload.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import fitz  # pymupdf
+
+from src.data_pipeline.logger import setup_logger
+from src.data_pipeline.models import BlockData, ParsedDocument
+
+logger = setup_logger(__name__)
+
+DEFAULT_PAGES_PER_TASK = 16
+
+# (id, page, bbox, text, type)
+BlockTuple = Tuple[str, int, Tuple[float, ...], str, str]
+# (id, page, start_token_index, end_token_index, raw_text, block_ids, end_page);
+# block_ids and end_page are None unless blocks were packed (CHUNK_PACKING=hierarchy)
+ChunkTuple = Tuple[str, int, int, int, str, Optional[Tuple[str, ...]], Optional[int]]
+# (blocks, chunks, page_texts) for one page range
+RangeResult = Tuple[List[BlockTuple], List[ChunkTuple], List[str]]
+
+# Token counters of a worker process, by model name
+_token_counters: Dict[str, Any] = {}
+
+
+def split_page_ranges(page_count: int, pages_per_task: int) -> List[Tuple[int, int]]:
+    """
+    Split a document into contiguous page ranges.
+
+    Args:
+        page_count: Number of pages in the document
+        pages_per_task: Maximum number of pages per range
+
+    Returns:
+        List of (start, end) zero-based page ranges, end exclusive
+    """
+    pages_per_task = max(1, pages_per_task)
+    return [(start, min(start + pages_per_task, page_count))
+            for start in range(0, page_count, pages_per_task)]
+
+
+def slice_pdf(document: fitz.Document, page_range: Tuple[int, int]) -> bytes:
+    """
+    Copy one page range of an open PDF into a PDF of its own.
+
+    Only the objects the pages reference (content streams, fonts, images) are
+    copied, so a task carries its share of the file instead of all of it.
+
+    Args:
+        document: The open source PDF
+        page_range: (start, end) zero-based page range, end exclusive
+
+    Returns:
+        Bytes of a PDF holding exactly the pages of the range
+    """
+    with fitz.open() as part:
+        part.insert_pdf(document, from_page=page_range[0], to_page=page_range[1] - 1)
+        return part.tobytes()
+
+
+def parse_page_range(pdf_data: bytes, page_range: Tuple[int, int], file_name: str,
+                     chunk_size: int, chunk_overlap: int, token_counter: Optional[Any] = None) -> RangeResult:
+    """
+    Extract, classify and chunk one page range of a PDF. Runs in a worker process.
+
+    Args:
+        pdf_data: Bytes of a PDF holding exactly the pages of page_range (see slice_pdf)
+        page_range: (start, end) zero-based page range in the whole document, end exclusive
+        file_name: Name of the document, used for chunk metadata
+        chunk_size: Maximum number of tokens per chunk
+        chunk_overlap: Number of tokens to overlap between chunks
+        token_counter: ModelTokenCounter to measure chunks in model tokens
+
+    Returns:
+        Tuple of compact block tuples, chunk tuples and page texts for the range
+    """
+    # Imported here so worker processes only load the parsing code they need
+    from src.data_pipeline.process_pdf import parse_pdf_document
+    from src.data_pipeline.chunks import generate_chunk_records
+
+    parsed = parse_pdf_document(pdf_data)
+    layout_data = parsed.blocks
+    # Number pages as in the whole document, before chunk records copy them
+    for block in layout_data:
+        block.page += page_range[0]
+    if token_counter is not None:
+        # Reuse the worker's counter, with its loaded tokenizer and cache, across tasks
+        token_counter = _token_counters.setdefault(token_counter.model_name, token_counter)
+    records = generate_chunk_records(layout_data, chunk_size, file_name, chunk_overlap, token_counter=token_counter)
+
+    blocks = [(block.id, block.page, tuple(block.bbox), block.text, block.type) for block in layout_data]
+    chunks = [(record.id, record.page, record.start_token_index, record.end_token_index, record.raw_text,
+               tuple(record.block_ids) if record.block_ids is not None else None, record.end_page)
+              for record in records]
+    return blocks, chunks, parsed.page_texts
+
+
+def merge_page_ranges(file_name: str, results: List[RangeResult]) -> Tuple[ParsedDocument, List[Any]]:
+    """
+    Stitch per-range parse results into document-wide blocks and chunk records.
+
+    Parent links are recomputed over the whole document so that blocks at the
+    start of a range attach to the heading from a previous range, and children
+    lists are rebuilt in a single linear pass. With packed chunks the parent is
+    the chunk that contains the parent block; packing never merges blocks
+    across page ranges.
+
+    Args:
+        file_name: Name of the document
+        results: Worker results in page order
+
+    Returns:
+        Tuple of the parsed document and the ChunkRecords, as produced by
+        generate_chunk_records
+    """
+    from src.data_pipeline.chunks import ChunkRecord
+    from src.data_pipeline.process_pdf import link_block_hierarchy
+
+    layout_data = [
+        BlockData(id=block_id, page=page, bbox=list(bbox), text=text, type=block_type)
+        for blocks, _, _ in results
+        for block_id, page, bbox, text, block_type in blocks
+    ]
+    link_block_hierarchy(layout_data)
+    parents = {block.id: block.parent for block in layout_data}
+    # Packed chunks are identified by their first block; map every block to its chunk
+    chunk_of: Dict[str, str] = {}
+    for _, chunks, _ in results:
+        for block_id, _, _, _, _, block_ids, _ in chunks:
+            for merged_id in block_ids or ():
+                chunk_of[merged_id] = block_id
+
+    children: Dict[str, Dict[str, None]] = {}
+    records: List[ChunkRecord] = []
+    # Block of every record; only the first chunk of a split block carries the block ID (see piece_id)
+    record_blocks: List[str] = []
+    block_id = ""
+    for _, chunks, _ in results:
+        for chunk_id, page, start, end, raw_text, block_ids, end_page in chunks:
+            if chunk_id in parents:
+                block_id = chunk_id
+                parent = parents[block_id]
+                if parent is not None:
+                    parent = chunk_of.get(parent, parent)
+                    children.setdefault(parent, {})[block_id] = None
+            records.append(ChunkRecord(file_name, page, len(records), start, end, parent, chunk_id, raw_text,
+                                       block_ids=list(block_ids) if block_ids is not None else None,
+                                       end_page=end_page))
+            record_blocks.append(block_id)
+
+    # Chunks of the same block share one children list
+    child_lists: Dict[str, List[str]] = {}
+    for record, block_id in zip(records, record_blocks):
+        if block_id not in child_lists:
+            child_lists[block_id] = list(children.get(block_id, {}))
+        record.children = child_lists[block_id]
+
+    page_texts = [text for _, _, texts in results for text in texts]
+    return ParsedDocument(blocks=layout_data, page_texts=page_texts), records
+
+
+class ParsePool:
+    """
+    Pool of worker processes that parse and chunk PDFs.
+
+    The pool is sized to the available cores by default. A document with more
+    than pages_per_task pages is split into page ranges parsed in parallel.
+    parse_and_chunk() is thread-safe, so ingestion threads can share one pool
+    and keep downloading, embedding and uploading while workers parse.
+    """
+    def __init__(self, max_workers: Optional[int] = None, pages_per_task: Optional[int] = None):
+        """
+        Args:
+            max_workers: Number of worker processes (default: PARSE_WORKERS or the CPU count)
+            pages_per_task: Pages per parse task (default: PARSE_PAGES_PER_TASK or 16)
+        """
+        self.max_workers = max_workers or int(os.getenv("PARSE_WORKERS", "0")) or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task or int(os.getenv("PARSE_PAGES_PER_TASK", DEFAULT_PAGES_PER_TASK))
+        # Worker processes are spawned rather than forked, since the parent
+        # runs writer and ingestion threads that may hold locks at fork time
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        logger.info(f"Started PDF parse pool with {self.max_workers} worker process(es)")
+
+    def parse_and_chunk(self, pdf_data: bytes, file_name: str, chunk_size: int,
+                        chunk_overlap: int = 0, token_counter: Optional[Any] = None
+                        ) -> Tuple[ParsedDocument, List[Any]]:
+        """
+        Parse and chunk a PDF in the worker processes.
+
+        Args:
+            pdf_data: Bytes of the PDF file
+            file_name: Name of the document, used for chunk metadata
+            chunk_size: Maximum number of tokens per chunk
+            chunk_overlap: Number of tokens to overlap between chunks
+            token_counter: ModelTokenCounter to measure chunks in model tokens
+
+        Returns:
+            Tuple of the parsed document and ChunkRecords, equivalent to
+            parse_pdf_document followed by generate_chunk_records
+        """
+        with fitz.open(stream=pdf_data) as document:
+            page_count = document.page_count
+            page_ranges = split_page_ranges(page_count, self.pages_per_task)
+            logger.info(f"Parsing {file_name} ({page_count} pages) in {len(page_ranges)} task(s)")
+            # Every task pickles its arguments, so send each one only its pages
+            futures = [self._executor.submit(parse_page_range,
+                                             pdf_data if len(page_ranges) == 1 else slice_pdf(document, page_range),
+                                             page_range, file_name, chunk_size, chunk_overlap, token_counter)
+                       for page_range in page_ranges]
+        return merge_page_ranges(file_name, [future.result() for future in futures])
+
+    def close(self) -> None:
+        """Shut down the worker processes."""
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "ParsePool":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
@@ -0,0 +1,273 @@
+"""
+Staged streaming pipeline engine for the TeacherBot data pipeline.
+
+A StagedPipeline runs a sequence of stages, each with its own pool of worker
+threads and a bounded queue in front of it. Items flow from one stage to the
+next as soon as they are ready, so network-bound stages (download, upsert,
+database writes) overlap with CPU-bound ones (parse, embed), and the bounded
+queues apply backpressure so a fast stage cannot run arbitrarily far ahead
+of a slow one.
+"""
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from src.data_pipeline.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_QUEUE_SIZE = 8
+
+# Marks the end of a stage's input
+_SENTINEL = object()
+
+
+class Stage:
+    """
+    One step of a StagedPipeline.
+
+    The stage function receives an item and returns the item to pass to the
+    next stage. Returning None drops the item (e.g. nothing left to do).
+    """
+    def __init__(self, name: str, fn: Callable[[Any], Any], workers: int = 1,
+                 queue_size: int = DEFAULT_QUEUE_SIZE):
+        """
+        Args:
+            name: Stage name used in logs and stats
+            fn: Function applied to every item
+            workers: Number of worker threads for this stage
+            queue_size: Capacity of the queue feeding this stage
+        """
+        if workers < 1:
+            raise ValueError(f"Stage {name} needs at least one worker, got {workers}")
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, queue_size))
+
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.busy_seconds = 0.0
+        self.max_queue_depth = 0
+        self._finished_workers = 0
+        self._lock = threading.Lock()
+
+    def stats(self, elapsed: float) -> Dict[str, Any]:
+        """
+        Return counters for this stage.
+
+        Args:
+            elapsed: Wall time in seconds since the pipeline started
+
+        Returns:
+            Dictionary with item counts, throughput, utilization and queue depth
+        """
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "processed": self.processed,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "items_per_sec": self.processed / elapsed if elapsed > 0 else 0.0,
+                "busy_seconds": self.busy_seconds,
+                "utilization": self.busy_seconds / (elapsed * self.workers) if elapsed > 0 else 0.0,
+                "queue_depth": self.queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+            }
+
+
+class StagedPipeline:
+    """
+    Runs items through a sequence of stages on per-stage worker threads.
+
+    submit() blocks while the first stage's queue is full. close() drains the
+    pipeline: it waits until every submitted item has either passed through
+    the last stage, been dropped, or failed, so no work is lost on shutdown.
+    Failures are reported to on_error and the failed item leaves the pipeline.
+    An interrupt (a BaseException such as KeyboardInterrupt) in the thread
+    feeding or closing the pipeline cancels it instead.
+    """
+    def __init__(self, stages: List[Stage],
+                 on_error: Optional[Callable[[str, Any, Exception], None]] = None,
+                 on_complete: Optional[Callable[[Any], None]] = None):
+        """
+        Args:
+            stages: Stages in execution order
+            on_error: Called with (stage name, item, exception) when a stage raises
+            on_complete: Called with the result of the last stage for every item
+        """
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = stages
+        self._on_error = on_error
+        self._on_complete = on_complete
+        self._threads: List[threading.Thread] = []
+        self._start_time: Optional[float] = None
+        self._submitted = 0
+        self._completed = 0
+        self._closed = False
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+    def start(self) -> "StagedPipeline":
+        """
+        Start the worker threads of every stage.
+
+        Returns:
+            The pipeline itself, for chaining
+        """
+        self._start_time = time.time()
+        for index, stage in enumerate(self.stages):
+            for worker in range(stage.workers):
+                thread = threading.Thread(target=self._run_worker, args=(index,),
+                                          name=f"pipeline-{stage.name}-{worker}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        logger.info("Started pipeline: " + " -> ".join(f"{s.name}(x{s.workers})" for s in self.stages))
+        return self
+
+    def submit(self, item: Any) -> None:
+        """
+        Feed an item into the first stage, blocking while its queue is full.
+
+        Args:
+            item: The item to process
+        """
+        if self._closed:
+            raise RuntimeError("Cannot submit to a closed pipeline")
+        with self._lock:
+            self._submitted += 1
+        self._put(self.stages[0], item)
+
+    def close(self) -> None:
+        """
+        Signal the end of input and wait for every submitted item to drain.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        first = self.stages[0]
+        try:
+            for _ in range(first.workers):
+                first.queue.put(_SENTINEL)
+            for thread in self._threads:
+                thread.join()
+        except BaseException:
+            # Interrupted while draining
+            self.cancel()
+            raise
+        logger.info(f"Pipeline drained: {self._completed} of {self._submitted} item(s) completed "
+                    f"in {self.elapsed():.2f} seconds")
+
+    def cancel(self) -> None:
+        """
+        Stop the pipeline without draining it, when the process is about to stop.
+
+        Items still waiting in a stage queue are dropped, and workers exit
+        once they finish the item they are processing. Does not wait for
+        them; workers are daemon threads, so idle ones do not keep the
+        process alive.
+        """
+        self._closed = True
+        self._cancelled = True
+        dropped = 0
+        for stage in self.stages:
+            while True:
+                try:
+                    item = stage.queue.get_nowait()
+                except queue.Empty:
+                    break
+                dropped += item is not _SENTINEL
+        logger.warning(f"Pipeline cancelled: {self._completed} of {self._submitted} item(s) completed, "
+                       f"{dropped} queued item(s) dropped")
+
+    def __enter__(self) -> "StagedPipeline":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None and not issubclass(exc_type, Exception):
+            self.cancel()
+        else:
+            self.close()
+
+    def elapsed(self) -> float:
+        """Seconds since the pipeline started."""
+        return time.time() - self._start_time if self._start_time is not None else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return per-stage throughput and queue-depth counters.
+
+        Returns:
+            Dictionary with overall counts and a 'stages' mapping of stage name to stats
+        """
+        elapsed = self.elapsed()
+        with self._lock:
+            submitted, completed = self._submitted, self._completed
+        return {
+            "elapsed_seconds": elapsed,
+            "submitted": submitted,
+            "completed": completed,
+            "stages": {stage.name: stage.stats(elapsed) for stage in self.stages},
+        }
+
+    def _put(self, stage: Stage, item: Any) -> None:
+        stage.queue.put(item)
+        depth = stage.queue.qsize()
+        with stage._lock:
+            if depth > stage.max_queue_depth:
+                stage.max_queue_depth = depth
+
+    def _run_worker(self, index: int) -> None:
+        stage = self.stages[index]
+        next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            item = stage.queue.get()
+            if item is _SENTINEL:
+                break
+            if self._cancelled:
+                return
+
+            start = time.perf_counter()
+            try:
+                result = stage.fn(item)
+            except Exception as e:
+                with stage._lock:
+                    stage.failed += 1
+                    stage.busy_seconds += time.perf_counter() - start
+                logger.error(f"Stage {stage.name} failed: {str(e)}")
+                if self._on_error is not None:
+                    self._safe_call(self._on_error, stage.name, item, e)
+                continue
+
+            with stage._lock:
+                stage.processed += 1
+                stage.busy_seconds += time.perf_counter() - start
+                if result is None:
+                    stage.dropped += 1
+            if result is None:
+                continue
+            if next_stage is not None:
+                self._put(next_stage, result)
+            else:
+                with self._lock:
+                    self._completed += 1
+                if self._on_complete is not None:
+                    self._safe_call(self._on_complete, result)
+
+        # The last worker of this stage to finish ends the next stage's input
+        with stage._lock:
+            stage._finished_workers += 1
+            last = stage._finished_workers == stage.workers
+        if last and next_stage is not None:
+            for _ in range(next_stage.workers):
+                next_stage.queue.put(_SENTINEL)
+
+    @staticmethod
+    def _safe_call(callback: Callable, *args: Any) -> None:
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.error(f"Pipeline callback failed: {str(e)}")
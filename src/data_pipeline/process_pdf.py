@@ -1,32 +1,42 @@
-from google.cloud import storage
 import fitz  # pymupdf
 import json
 import uuid
 
 
-from src.data_pipeline.embed import generate_embedding_vector
-from src.data_pipeline.embed_models import EmbeddingModel, all_minilm_l6_v2
-from src.data_pipeline.chunks import generate_chunks
-from src.data_pipeline.utils import initialize_pinecone, upload_pinecone
+from src.data_pipeline.embed import generate_embedding_batch
+from src.data_pipeline.embedding_batch import EmbeddingBatch
+from src.data_pipeline.embed_models import EmbeddingModel, get_model_registry
+from src.data_pipeline.chunks import (ChunkRecord, ModelTokenCounter, generate_chunk_records, get_chunking_signature,
+                                      get_token_counter, iter_chunk_records)
+from src.data_pipeline.utils import create_pinecone_index, get_pinecone_index, get_storage_client, select_pinecone_index
+from src.data_pipeline.index_config import get_index_config, validate_index_dimension
+from src.data_pipeline.vector_writer import BatchedVectorWriter
+from src.data_pipeline.manifest import IngestionManifest, blob_content_hash, compute_fingerprint
+from src.data_pipeline.dedup import ChunkDeduplicator, DedupSession, dedup_enabled, get_dedup_signature
+from src.data_pipeline.journal import RunJournal
+from src.data_pipeline.parallel import ParsePool
+from src.data_pipeline.pipeline import Stage, StagedPipeline
+from src.data_pipeline.embed_batcher import EmbeddingBatcher
+from src.data_pipeline.embed_cache import CachedEmbeddingModel, EmbeddingCache
+from src.data_pipeline.embed_pool import EmbeddingPool
+from src.data_pipeline.metrics import get_metrics, source_from_file_name
 from src.data_pipeline.logger import setup_logger
-from src.data_pipeline.utils import store_raw_text_in_postgres, extract_raw_text_from_pdf
-from src.data_pipeline.db import initialize_db, store_document, document_exists
-from src.data_pipeline.models import BlockData, DocumentText
-import nltk
+from src.data_pipeline.utils import store_raw_text_in_postgres
+from src.data_pipeline.models import BlockData, DocumentText, ParsedDocument
+import signal
+import threading
 import time 
 from concurrent.futures import ThreadPoolExecutor, as_completed  
 from dotenv import load_dotenv, find_dotenv 
 import os 
-from typing import List, Dict, Any, Optional, Tuple
+from typing import Callable, Iterator, List, Dict, Any, Optional, Tuple, Union
 
 logger = setup_logger(__name__)
 
-nltk.download('punkt')
-
+# Importing this module must stay free of network calls: the GCS client,
+# PostgreSQL and NLTK data are all initialized on first use (see main()).
 load_dotenv(find_dotenv())
 
-client = storage.Client()
-bucket_name: str = os.getenv('BUCKET_NAME', '')
 # google_credentials: str = os.getenv('GOOGLE_APPLICATION_CREDENTIALS', '')
 # os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = google_credentials
 
@@ -43,20 +53,24 @@ bucket_name: str = os.getenv('BUCKET_NAME', '')
         
 # write_google_application_credential_file()
 
-try:
-    logger.info(f" Bucket name: {bucket_name}")
-    blobs = list(client.list_blobs(bucket_name, max_results=1))
-    logger.info(f"Successfully accessed bucket '{bucket_name}', found {len(blobs)} file(s)")
-except Exception as e:
-    logger.error(f"Failed to access GCS bucket: {str(e)}")
-
-try:
-    if initialize_db():
-        logger.info("Connected to PostgreSQL successfully.")
-    else:
-        logger.error(" Failed to initialize DB.")
-except Exception as e:
-    logger.error(f" DB connection error: {str(e)}")
+def check_bucket_access(bucket_name: str) -> bool:
+    """
+    Checks that the GCS bucket can be listed with the current credentials.
+    
+    Args:
+        bucket_name: GCS bucket name
+        
+    Returns:
+        True if the bucket is accessible, False otherwise
+    """
+    try:
+        logger.info(f" Bucket name: {bucket_name}")
+        blobs = list(get_storage_client().list_blobs(bucket_name, max_results=1))
+        logger.info(f"Successfully accessed bucket '{bucket_name}', found {len(blobs)} file(s)")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to access GCS bucket: {str(e)}")
+        return False
     
 
 def classify_text(block_text: str) -> str:
@@ -113,7 +127,171 @@ def classify_text(block_text: str) -> str:
         logger.error(f"Unexpected error during text classification: {str(e)}. Defaulting to paragraph.")
         return "paragraph"
 
-def extract_text_and_layout_from_pdf(pdf_data: bytes) -> List[BlockData]:
+class BlockHierarchyLinker:
+    """
+    Sets the parent of blocks one at a time, from the classified block types.
+    
+    Subheadings are attached to the last heading, and paragraphs to the last
+    subheading (or the last heading if there is no subheading since that heading).
+    The linker only remembers the last heading and subheading, so blocks can
+    be linked as they are extracted, page by page.
+    """
+    def __init__(self):
+        self.last_heading_id: Optional[str] = None
+        self.last_subheading_id: Optional[str] = None
+
+    def link(self, block_data: BlockData) -> BlockData:
+        """
+        Set the parent of the next block in document order.
+        
+        Args:
+            block_data: Block with its type already classified
+            
+        Returns:
+            The same block, with its parent field updated in place
+        """
+        parent_id: Optional[str] = None
+
+        if block_data.type == "heading":
+            self.last_heading_id = block_data.id
+            self.last_subheading_id = None  
+        elif block_data.type == "subheading":
+            parent_id = self.last_heading_id
+            self.last_subheading_id = block_data.id
+        elif block_data.type == "paragraph":
+            parent_id = self.last_subheading_id if self.last_subheading_id is not None else self.last_heading_id
+
+        block_data.parent = parent_id
+        return block_data
+
+def link_block_hierarchy(layout_data: List[BlockData]) -> List[BlockData]:
+    """
+    Sets the parent of each block from the classified block types, in document order.
+    
+    Subheadings are attached to the last heading, and paragraphs to the last
+    subheading (or the last heading if there is no subheading since that heading).
+    Used by extract_text_and_layout_from_pdf and to stitch together blocks that
+    were extracted from separate page ranges.
+    
+    Args:
+        layout_data: Blocks in document order, with their type already classified
+        
+    Returns:
+        The same list, with the parent field of every block updated in place
+    """
+    linker = BlockHierarchyLinker()
+    for block_data in layout_data:
+        linker.link(block_data)
+    return layout_data
+
+def iter_pdf_pages(pdf_data: bytes, page_range: Optional[Tuple[int, int]] = None
+                   ) -> Iterator[Tuple[List[BlockData], str]]:
+    """
+    Decodes a PDF one page at a time, yielding the layout blocks and text of each page.
+    
+    Each page is decoded with a single get_text("dict") call. Blocks are
+    classified and linked into the heading hierarchy as they are extracted,
+    so only the current page is held in memory.
+    
+    Args:
+        pdf_data: Bytes of the PDF file to process
+        page_range: Optional (start, end) zero-based page range to process, end exclusive.
+            Blocks before the first heading of the range have no parent.
+        
+    Yields:
+        (blocks, page_text) for each page, in page order; page_text matches page.get_text()
+        
+    Raises:
+        PyMuPDFError: If there's an issue opening or processing the PDF file
+    """
+    document = fitz.open(stream=pdf_data)  
+    linker = BlockHierarchyLinker()
+    try:
+        start_page, end_page = page_range if page_range is not None else (0, len(document))
+
+        for page_number in range(start_page, min(end_page, len(document))):
+            logger.debug(f"Processing page {page_number + 1}")
+            page = document.load_page(page_number)
+            # Plain-text flags skip decoding embedded images, which are never used
+            blocks = page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]
+            page_blocks: List[BlockData] = []
+            page_lines: List[str] = []
+
+            for block in blocks:
+                if "lines" in block:
+                    block_text: str = ""
+                    for line in block["lines"]:
+                        line_text: str = ""
+                        for span in line["spans"]:
+                            block_text += span["text"] + " "
+                            line_text += span["text"]
+                        page_lines.append(line_text + "\n")
+
+                    block_type: str = classify_text(block_text.strip())
+
+                    block_id: str = str(uuid.uuid4())  
+
+                    block_data = BlockData(
+                        id=block_id, 
+                        page=page_number + 1,
+                        bbox=block["bbox"],
+                        text=block_text.strip(),
+                        type=block_type
+                    )
+                    page_blocks.append(linker.link(block_data))
+
+                    logger.debug(f"Extracted block: {block_data}")
+
+            yield page_blocks, "".join(page_lines)
+    finally:
+        document.close()
+
+def iter_text_and_layout_from_pdf(pdf_data: bytes, page_range: Optional[Tuple[int, int]] = None,
+                                  page_texts: Optional[List[str]] = None) -> Iterator[BlockData]:
+    """
+    Streaming form of extract_text_and_layout_from_pdf: yields blocks page by page.
+    
+    Args:
+        pdf_data: Bytes of the PDF file to process
+        page_range: Optional (start, end) zero-based page range to process, end exclusive
+        page_texts: Optional list the plain text of each page is appended to as it is decoded
+        
+    Yields:
+        BlockData objects in document order, with their parent already set
+    """
+    for page_blocks, page_text in iter_pdf_pages(pdf_data, page_range):
+        if page_texts is not None:
+            page_texts.append(page_text)
+        yield from page_blocks
+
+def parse_pdf_document(pdf_data: bytes, page_range: Optional[Tuple[int, int]] = None) -> ParsedDocument:
+    """
+    Decodes a PDF once, producing both its layout blocks and its page texts.
+    
+    Each page is decoded with a single get_text("dict") call. The layout blocks
+    are built from the text blocks as in extract_text_and_layout_from_pdf, and
+    the plain page text is assembled from the same lines, matching page.get_text().
+    
+    Args:
+        pdf_data: Bytes of the PDF file to process
+        page_range: Optional (start, end) zero-based page range to process, end exclusive.
+            Blocks before the first heading of the range have no parent; use
+            link_block_hierarchy on the concatenated ranges to restore them.
+        
+    Returns:
+        A ParsedDocument with the classified blocks and the text of each page
+        
+    Raises:
+        PyMuPDFError: If there's an issue opening or processing the PDF file
+    """
+    page_texts: List[str] = []
+    layout_data = list(iter_text_and_layout_from_pdf(pdf_data, page_range, page_texts))
+    logger.info("Finished processing PDF")
+
+    start_page = page_range[0] if page_range is not None else 0
+    return ParsedDocument(blocks=layout_data, page_texts=page_texts, start_page=start_page + 1)
+
+def extract_text_and_layout_from_pdf(pdf_data: bytes, page_range: Optional[Tuple[int, int]] = None) -> List[BlockData]:
     """
     Extracts text and layout information from a PDF file.
     
@@ -121,9 +299,11 @@ def extract_text_and_layout_from_pdf(pdf_data: bytes) -> List[BlockData]:
     with their layout information (bounding boxes, page numbers). It also classifies 
     each text block as heading, subheading, or paragraph, and establishes parent-child 
     relationships between them to maintain the document's hierarchical structure.
+    Use parse_pdf_document instead when the raw page text is needed as well.
     
     Args:
         pdf_data: Bytes of the PDF file to process
+        page_range: Optional (start, end) zero-based page range to process, end exclusive
         
     Returns:
         A list of BlockData objects containing the extracted text blocks with their
@@ -132,57 +312,374 @@ def extract_text_and_layout_from_pdf(pdf_data: bytes) -> List[BlockData]:
     Raises:
         PyMuPDFError: If there's an issue opening or processing the PDF file
     """
-    document = fitz.open(stream=pdf_data)  
-    layout_data: List[BlockData] = []
-
-    last_heading_id: Optional[str] = None
-    last_subheading_id: Optional[str] = None
-
-    for page_number in range(len(document)):
-        logger.debug(f"Processing page {page_number + 1}")
-        page = document.load_page(page_number)
-        blocks = page.get_text("dict")["blocks"]
-
-        for block in blocks:
-            if "lines" in block:
-                block_text: str = ""
-                for line in block["lines"]:
-                    for span in line["spans"]:
-                        block_text += span["text"] + " "
-
-                block_type: str = classify_text(block_text.strip())
-                parent_id: Optional[str] = None
-
-                block_id: str = str(uuid.uuid4())  
-
-                if block_type == "heading":
-                    last_heading_id = block_id
-                    last_subheading_id = None  
-                elif block_type == "subheading":
-                    parent_id = last_heading_id
-                    last_subheading_id = block_id
-                elif block_type == "paragraph":
-                    parent_id = last_subheading_id if last_subheading_id is not None else last_heading_id
-
-                block_data = BlockData(
-                    id=block_id, 
-                    page=page_number + 1,
-                    bbox=block["bbox"],
-                    text=block_text.strip(),
-                    type=block_type,
-                    parent=parent_id
-                )
-                layout_data.append(block_data)
-
-                logger.debug(f"Extracted block: {block_data}")
-
-    document.close()
-    logger.info("Finished processing PDF")
+    return parse_pdf_document(pdf_data, page_range=page_range).blocks
 
-    return layout_data
+class IngestionJob:
+    """
+    State of one file as it moves through the ingestion stages.
+    
+    Each stage function below reads the fields filled in by the previous
+    stages and fills in its own, so the same stages can run back to back in
+    process_pdf_and_upload or on separate workers in a StagedPipeline.
+    """
+    def __init__(self, bucket_name: str, file_name: str, content_hash: Optional[str] = None):
+        self.bucket_name = bucket_name
+        self.file_name = file_name
+        self.content_hash = content_hash
+        self.source: str = source_from_file_name(file_name)
+        self.start_time: float = time.time()
+        self.previous_entry: Optional[Dict[str, Any]] = None
+        self.fingerprint: Optional[str] = None
+        self.data: Optional[bytes] = None
+        self.raw_text: Optional[str] = None
+        self.metadata: List[Union[ChunkRecord, Dict[str, Any]]] = []
+        self.embedding_vectors: Optional[EmbeddingBatch] = None
+        # IDs of the vectors upserted for the file, kept after the vectors themselves are released
+        self.vector_ids: List[str] = []
+        # Corpus-wide deduplication of the file's chunks, when enabled
+        self.dedup: Optional[DedupSession] = None
+
+    def referenced_vector_ids(self) -> List[str]:
+        """IDs of the vectors upserted for the file and of the canonical vectors its duplicate chunks share."""
+        if self.dedup is None:
+            return self.vector_ids
+        return list(dict.fromkeys(self.vector_ids + self.dedup.shared_vector_ids))
+
+    def release_buffers(self) -> None:
+        """Drop the downloaded bytes and intermediate results once they are no longer needed."""
+        self.data = None
+        self.raw_text = None
+        self.metadata = []
+        self.embedding_vectors = None
+        self.vector_ids = []
+        self.dedup = None
+
+def get_ingestion_signature() -> str:
+    """Chunking and deduplication settings that are part of the manifest fingerprint."""
+    return get_chunking_signature() + get_dedup_signature()
+
+def start_dedup(job: IngestionJob, deduplicator: Optional[ChunkDeduplicator]) -> Optional[DedupSession]:
+    """
+    Start deduplicating a job's chunks against the corpus, once per job.
+    
+    Args:
+        job: The ingestion job
+        deduplicator: Corpus-wide chunk index, or None to embed every chunk
+        
+    Returns:
+        The job's dedup session, or None without a deduplicator
+    """
+    if deduplicator is not None and job.dedup is None:
+        previous_ids = job.previous_entry.get("vector_ids", []) if job.previous_entry is not None else []
+        job.dedup = deduplicator.start(job.file_name, previous_ids)
+    return job.dedup
+
+def abort_dedup(job: IngestionJob) -> None:
+    """Drop the dedup references of a failed job, so its canonical chunks are written by the next copy."""
+    if job.dedup is not None:
+        job.dedup.abort()
+        job.dedup = None
+
+def download_document(job: IngestionJob, manifest: Optional[IngestionManifest] = None) -> IngestionJob:
+    """
+    Download stage: fetch the blob from GCS.
+    
+    Args:
+        job: The ingestion job
+        manifest: Ingestion manifest, used to look up a previous ingestion of the file
+        
+    Returns:
+        The job, with its data filled in
+    """
+    job.previous_entry = manifest.get(job.file_name) if manifest is not None else None
+    metrics = get_metrics()
+    with metrics.timer("download", job.source):
+        client = get_storage_client()
+        bucket = client.get_bucket(job.bucket_name)
+        blob = bucket.blob(job.file_name)
+        job.data = blob.download_as_bytes()
+    metrics.increment("bytes_downloaded", job.source, len(job.data))
+    print(f"Downloaded {job.file_name} from GCS bucket {job.bucket_name}")
+    return job
+
+def parse_document(job: IngestionJob, chunk_size: int, chunk_overlap: int = 0,
+                   parse_pool: Optional[ParsePool] = None,
+                   token_counter: Optional[ModelTokenCounter] = None) -> IngestionJob:
+    """
+    Parse and chunk stage: extract layout and raw text, and generate chunk metadata.
+    
+    Parsing and chunking are timed separately, except with a parse pool where
+    both run in the worker processes and are timed together as "parse".
+    
+    Args:
+        job: The ingestion job, with its data downloaded
+        chunk_size: Maximum number of tokens per chunk
+        chunk_overlap: Number of tokens to overlap between chunks
+        parse_pool: Process pool to run PDF parsing and chunking in
+        token_counter: Counter to measure chunks in embedding model tokens
+        
+    Returns:
+        The job, with its metadata and raw text filled in
+    """
+    file_name = job.file_name
+    pdf_data = job.data
+    # Page-delimited raw text for PostgreSQL, taken from the same decode pass as the layout
+    raw_text: Optional[str] = None
+    metrics = get_metrics()
+    if ".pdf" in file_name and parse_pool is not None:
+        # Parse and chunk in worker processes, off the GIL of the ingestion threads
+        with metrics.timer("parse", job.source):
+            parsed, metadata = parse_pool.parse_and_chunk(pdf_data, file_name, chunk_size, chunk_overlap,
+                                                          token_counter)
+        raw_text = parsed.raw_text
+    elif ".pdf" in file_name:
+
+        with metrics.timer("parse", job.source):
+            parsed: ParsedDocument = parse_pdf_document(pdf_data)
+        raw_text = parsed.raw_text
+
+        with metrics.timer("chunk", job.source):
+            # Chunk the blocks as they are; records become dictionaries when the vectors are built
+            metadata = generate_chunk_records(parsed.blocks, chunk_size, file_name, chunk_overlap,
+                                              token_counter=token_counter)
+    else:
+        metadata: Dict[str, Any] = {
+                            'document_name': file_name,
+                            'page': 1,
+                            'chunk_index': 1,
+                            # 'start_token_index': 0,
+                            # 'end_token_index': 0,
+                            # 'parent': parent,
+                            # Vector IDs must be unique strings, like the block IDs of PDF chunks
+                            'id': str(uuid.uuid4()),
+                            'raw_text': pdf_data.decode('utf-8', errors='ignore'),  # Decode bytes to string
+                            'children': []  # Placeholder for children, if any
+                        }
+        metadata = [metadata]  # Wrap in a list to match expected input format
+        raw_text = metadata[0]['raw_text']
+    metrics.increment("chunks", job.source, len(metadata))
+    # print(f"Extracted metadata: {metadata}")
+    job.metadata = metadata
+    job.raw_text = raw_text
+    return job
+
+def embed_document(job: IngestionJob, model: Optional[EmbeddingModel] = None,
+                   deduplicator: Optional[ChunkDeduplicator] = None) -> IngestionJob:
+    """
+    Embed stage: generate embedding vectors for the job's chunks.
+    
+    With a deduplicator, chunks that duplicate a chunk already in the corpus
+    are not embedded; the file references the canonical vector instead.
+    
+    Args:
+        job: The ingestion job, with its chunk metadata generated
+        model: Embedding model to use
+        deduplicator: Corpus-wide chunk index to skip duplicate chunks with
+        
+    Returns:
+        The job, with its embedding vectors filled in
+    """
+    metadata = job.metadata
+    session = start_dedup(job, deduplicator)
+    if session is not None and metadata:
+        metadata = session.filter(metadata)
+        if not metadata:
+            job.embedding_vectors = EmbeddingBatch.empty()
+            return job
+    with get_metrics().timer("embed", job.source):
+        job.embedding_vectors = generate_embedding_batch(metadata=metadata, model=model)
+    return job
+
+def upsert_document(job: IngestionJob, writer: BatchedVectorWriter) -> IngestionJob:
+    """
+    Upsert stage: queue the job's vectors on the shared writer and wait until they land.
+    
+    Args:
+        job: The ingestion job, with its embedding vectors generated
+        writer: Shared batched vector writer
+        
+    Returns:
+        The job, once all of its vectors are upserted
+    """
+    metrics = get_metrics()
+    embedding_vectors = job.embedding_vectors if job.embedding_vectors is not None else EmbeddingBatch.empty()
+    with metrics.timer("upsert", job.source):
+        writer.write(embedding_vectors).result()
+    job.vector_ids = embedding_vectors.ids
+    if job.dedup is not None:
+        job.dedup.commit()
+    metrics.increment("vectors_upserted", job.source, len(embedding_vectors))
+    return job
+
+def streaming_enabled(job: IngestionJob, parse_pool: Optional[ParsePool] = None) -> bool:
+    """
+    Whether a file is processed with stream_pdf_document, from INGESTION_STREAMING.
+    
+    Streaming applies to PDFs parsed in the ingestion thread; with a parse
+    pool, PDFs are parsed by page range in the worker processes instead.
+    
+    Args:
+        job: The ingestion job
+        parse_pool: Process pool PDFs are parsed in, if any
+        
+    Returns:
+        True if the file should be streamed
+    """
+    return (os.getenv("INGESTION_STREAMING", "0") == "1" and ".pdf" in job.file_name
+            and parse_pool is None)
+
+def stream_pdf_document(job: IngestionJob, chunk_size: int, chunk_overlap: int,
+                        model: Optional[EmbeddingModel], writer: BatchedVectorWriter,
+                        token_counter: Optional[ModelTokenCounter] = None,
+                        journal: Optional[RunJournal] = None,
+                        deduplicator: Optional[ChunkDeduplicator] = None) -> IngestionJob:
+    """
+    Parse, chunk, embed and upsert stages for a PDF, streamed page by page.
+    
+    Pages are decoded one at a time and chunks are embedded in batches of
+    INGESTION_STREAM_BATCH as soon as they are final (see iter_chunk_records),
+    then queued on the writer, whose in-flight limit applies backpressure.
+    Only the current page, the open sections and one batch of chunks are
+    held, instead of the whole document's blocks, chunks and vectors. The
+    page texts are still collected for the store stage.
+    
+    The IDs of each batch are written to the journal before the batch is
+    upserted, so vectors of an interrupted stream are cleaned up on restart.
+    With a deduplicator, duplicate chunks are dropped from each batch before
+    it is embedded.
+    
+    Args:
+        job: The ingestion job, with its data downloaded
+        chunk_size: Maximum number of tokens per chunk
+        chunk_overlap: Number of tokens to overlap between chunks
+        model: Embedding model to use
+        writer: Shared batched vector writer
+        token_counter: Counter to measure chunks in embedding model tokens
+        journal: Run journal to record the vector IDs in
+        deduplicator: Corpus-wide chunk index to skip duplicate chunks with
+        
+    Returns:
+        The job, once all of its vectors are upserted, with its raw text and vector IDs filled in
+    """
+    metrics = get_metrics()
+    batch_size = int(os.getenv("INGESTION_STREAM_BATCH", "256"))
+    page_texts: List[str] = []
+    records = iter_chunk_records(iter_text_and_layout_from_pdf(job.data, page_texts=page_texts),
+                                 chunk_size, job.file_name, chunk_overlap, token_counter=token_counter)
+    session = start_dedup(job, deduplicator)
+    futures = []
+    batch: List[ChunkRecord] = []
+    chunk_count = 0
+    # Parsing and chunking interleave, so they are timed together as "parse"
+    parse_seconds = 0.0
+    while True:
+        start = time.perf_counter()
+        record = next(records, None)
+        parse_seconds += time.perf_counter() - start
+        if record is not None:
+            batch.append(record)
+            chunk_count += 1
+        if batch and (record is None or len(batch) >= batch_size):
+            if session is not None:
+                batch = session.filter(batch)
+            if batch:
+                with metrics.timer("embed", job.source):
+                    embedding_vectors = generate_embedding_batch(metadata=batch, model=model)
+                vector_ids = embedding_vectors.ids
+                if journal is not None:
+                    journal.record_vectors(job.file_name, vector_ids)
+                job.vector_ids.extend(vector_ids)
+                futures.append(writer.write(embedding_vectors))
+            batch = []
+        if record is None:
+            break
+    metrics.observe("parse", job.source, parse_seconds)
+    metrics.increment("chunks", job.source, chunk_count)
+    if not chunk_count:
+        raise ValueError("Metadata list cannot be empty")
+
+    with metrics.timer("upsert", job.source):
+        for future in futures:
+            future.result()
+    if session is not None:
+        session.commit()
+    metrics.increment("vectors_upserted", job.source, len(job.vector_ids))
+    job.raw_text = ParsedDocument(blocks=[], page_texts=page_texts).raw_text
+    return job
+
+def store_document_text(job: IngestionJob, chunk_size: int, chunk_overlap: int = 0,
+                        model: Optional[EmbeddingModel] = None,
+                        manifest: Optional[IngestionManifest] = None) -> IngestionJob:
+    """
+    Store stage: save the raw text in PostgreSQL and record the file in the manifest.
+    
+    Vectors of the file's previous version that it no longer uses are
+    deleted, unless another file still shares them through deduplication.
+    
+    Args:
+        job: The ingestion job, with its vectors upserted
+        chunk_size: Maximum number of tokens per chunk, part of the manifest fingerprint
+        chunk_overlap: Number of tokens to overlap between chunks, part of the manifest fingerprint
+        model: Embedding model used, part of the manifest fingerprint
+        manifest: Ingestion manifest to record the file in
+        
+    Returns:
+        The job, once its text is stored
+    """
+    file_name = job.file_name
+    previous_entry = job.previous_entry
+    # Store raw text in PostgreSQL, replacing the old text if the document changed
+    with get_metrics().timer("store", job.source):
+        if not store_raw_text_in_postgres(file_name, job.data, replace=previous_entry is not None,
+                                          raw_text=job.raw_text):
+            raise RuntimeError("Failed to store raw text in PostgreSQL")
+
+    if manifest is not None and job.content_hash is not None:
+        vector_ids = job.referenced_vector_ids()
+        if previous_entry is not None:
+            stale_ids = list(set(previous_entry.get("vector_ids", [])) - set(vector_ids))
+            if stale_ids and job.dedup is not None:
+                stale_ids = job.dedup.release(stale_ids)
+            if stale_ids:
+                get_pinecone_index().delete(ids=stale_ids)
+                logger.info(f"Deleted {len(stale_ids)} stale vector(s) for changed file {file_name}")
+        model_name = (model or get_model_registry().get()).get_model_name()
+        fingerprint = compute_fingerprint(job.content_hash, chunk_size, chunk_overlap, model_name,
+                                          get_ingestion_signature())
+        manifest.record(file_name, fingerprint, job.content_hash, vector_ids)
+        job.fingerprint = fingerprint
+    return job
+
+def record_stage_completion(journal: Optional[RunJournal], job: IngestionJob, stage: str) -> None:
+    """
+    Record a completed stage of a job in the run journal.
+    
+    The upsert stage records the vector IDs it wrote, so they can be cleaned
+    up if the file is interrupted before it finishes, and the store stage
+    (the last one) marks the file as done with its manifest entry, which
+    also lists the canonical vectors its duplicate chunks share.
+    
+    Args:
+        journal: Run journal, or None to record nothing
+        job: The ingestion job
+        stage: Name of the stage that completed
+    """
+    if journal is None:
+        return
+    vector_ids = job.vector_ids
+    journal.record_stage(job.file_name, stage, vector_ids=vector_ids if stage == "upsert" else None)
+    if stage == "store":
+        journal.record_done(job.file_name, job.fingerprint, job.content_hash, job.referenced_vector_ids())
 
 def process_pdf_and_upload(bucket_name: str, file_name: str, chunk_size: int, chunk_overlap: int = 0, 
-                          model: Optional[EmbeddingModel] = None) -> None:
+                          model: Optional[EmbeddingModel] = None, *,
+                          writer: Optional[BatchedVectorWriter] = None,
+                          manifest: Optional[IngestionManifest] = None,
+                          content_hash: Optional[str] = None,
+                          parse_pool: Optional[ParsePool] = None,
+                          journal: Optional[RunJournal] = None,
+                          token_counter: Optional[ModelTokenCounter] = None,
+                          deduplicator: Optional[ChunkDeduplicator] = None) -> bool:
     """
     Process a PDF file, extract text and layout, generate chunks, embed them, and upload to Pinecone.
     
@@ -192,58 +689,264 @@ def process_pdf_and_upload(bucket_name: str, file_name: str, chunk_size: int, ch
         chunk_size: Maximum number of tokens per chunk (hyperparameter)
         chunk_overlap: Number of tokens to overlap between chunks (hyperparameter)
         model: Embedding model to use (hyperparameter)
+        writer: Shared batched vector writer. If not provided, a writer for this
+            file only is created on the shared Pinecone index and closed on return.
+        manifest: Ingestion manifest to record the file in once it is fully processed.
+            If the file was ingested before, its stale vectors and stored text are replaced.
+        content_hash: Content hash of the blob as reported by GCS, required with manifest
+        parse_pool: Process pool to run PDF parsing and chunking in. If not provided,
+            parsing runs in the calling thread.
+        journal: Run journal to record the start, stage completions and outcome of the file in
+        token_counter: Counter to measure chunks in embedding model tokens. If not
+            provided, one is created for model according to CHUNK_BUDGET.
+        deduplicator: Corpus-wide chunk index. Chunks that duplicate a chunk of
+            another file are not embedded again.
+        
+    Returns:
+        True if the file was processed successfully, False otherwise
     """
     logger.info(f"Starting processing for file: {file_name}")
-    start_time: float = time.time() 
+    job = IngestionJob(bucket_name, file_name, content_hash)
+    if token_counter is None:
+        token_counter = get_token_counter(model)
+    success = False
+    own_writer = writer is None
+    stage = "download"
+    if journal is not None:
+        journal.start_file(file_name)
     try:
-        client = storage.Client()
-        bucket = client.get_bucket(bucket_name)
-        blob = bucket.blob(file_name)
-        pdf_data: bytes = blob.download_as_bytes()
-        print(f"Downloaded {file_name} from GCS bucket {bucket_name}")
-        
-        if ".pdf" in file_name:
+        download_document(job, manifest)
+        record_stage_completion(journal, job, stage)
 
-            layout_data: List[BlockData] = extract_text_and_layout_from_pdf(pdf_data)
-
-            # Convert Pydantic models to dictionaries for further processing
-            layout_dict_data = [block.dict() for block in layout_data]
-        
-            # Generate chunks and metadata
-            _, metadata = generate_chunks(layout_dict_data, chunk_size, file_name, chunk_overlap)
+        if streaming_enabled(job, parse_pool):
+            # Parse, chunk, embed and upsert the PDF page by page with bounded memory
+            stage = "stream"
+            if own_writer:
+                writer = BatchedVectorWriter(get_pinecone_index())
+            stream_pdf_document(job, chunk_size, chunk_overlap, model, writer, token_counter, journal,
+                                deduplicator)
+            for completed_stage in ("parse", "embed", "upsert"):
+                record_stage_completion(journal, job, completed_stage)
         else:
-            metadata: Dict[str, Any] = {
-                                'document_name': file_name,
-                                'page': 1,
-                                'chunk_index': 1,
-                                # 'start_token_index': 0,
-                                # 'end_token_index': 0,
-                                # 'parent': parent,
-                                'id': 1,
-                                'raw_text': pdf_data.decode('utf-8', errors='ignore'),  # Decode bytes to string
-                                'children': []  # Placeholder for children, if any
-                            }
-            metadata = [metadata]  # Wrap in a list to match expected input format
-        # print(f"Extracted metadata: {metadata}")
-        # Generate embeddings from metadata
-        embedding_vectors = generate_embedding_vector(metadata=metadata, model=model)
-        
+            stage = "parse"
+            parse_document(job, chunk_size, chunk_overlap, parse_pool, token_counter)
+            record_stage_completion(journal, job, stage)
 
-        # Initialize and upload to Pinecone vector database
-        index = initialize_pinecone()
-        for embedding_vector in embedding_vectors:
-            upload_pinecone(index, embedding_vector)
-        
-        # Store raw text in PostgreSQL
-        store_raw_text_in_postgres(file_name, pdf_data)
+            stage = "embed"
+            embed_document(job, model, deduplicator)
+            record_stage_completion(journal, job, stage)
+
+            # Queue vectors on the shared batched writer and wait until this file's batches land
+            stage = "upsert"
+            if own_writer:
+                writer = BatchedVectorWriter(get_pinecone_index())
+            upsert_document(job, writer)
+            record_stage_completion(journal, job, stage)
+
+        stage = "store"
+        store_document_text(job, chunk_size, chunk_overlap, model, manifest)
+        record_stage_completion(journal, job, stage)
 
         logger.info(f"Processing for file {file_name} completed successfully.")
+        get_metrics().increment("documents_succeeded", job.source)
+        success = True
     except Exception as e:
-        logger.error(f"Error processing file {file_name}: {str(e)}")
+        logger.error(f"Error processing file {file_name} in stage {stage}: {str(e)}")
+        get_metrics().increment("documents_failed", job.source)
+        abort_dedup(job)
+        if journal is not None:
+            journal.record_failed(file_name, stage, str(e))
     finally:
+        if own_writer and writer is not None:
+            writer.close()
+        job.release_buffers()
         end_time: float = time.time() 
-        total_time: float = end_time - start_time  
+        total_time: float = end_time - job.start_time  
         logger.info(f"Total time taken for processing file {file_name}: {total_time:.2f} seconds")
+    return success
+
+def run_staged_pipeline(bucket_name: str, pending_blobs: List[Tuple[Any, Optional[str]]], chunk_size: int,
+                        chunk_overlap: int, model: EmbeddingModel, writer: BatchedVectorWriter,
+                        manifest: Optional[IngestionManifest] = None,
+                        parse_pool: Optional[ParsePool] = None,
+                        journal: Optional[RunJournal] = None,
+                        token_counter: Optional[ModelTokenCounter] = None,
+                        deduplicator: Optional[ChunkDeduplicator] = None) -> Dict[str, Any]:
+    """
+    Process files through a StagedPipeline instead of one worker per file.
+    
+    Download, parse, embed, upsert and store each get their own worker threads
+    and a bounded queue in front of them, so downloads keep prefetching while
+    embedding saturates the CPU. Worker counts are read from the
+    PIPELINE_<STAGE>_WORKERS environment variables and queue capacity from
+    PIPELINE_QUEUE_SIZE.
+    
+    Args:
+        bucket_name: GCS bucket name
+        pending_blobs: (blob, content_hash) pairs to process
+        chunk_size: Maximum number of tokens per chunk
+        chunk_overlap: Number of tokens to overlap between chunks
+        model: Embedding model to use
+        writer: Shared batched vector writer
+        manifest: Ingestion manifest to record processed files in
+        parse_pool: Process pool to run PDF parsing and chunking in
+        journal: Run journal to record the start, stage completions and outcome of each file in
+        token_counter: Counter to measure chunks in embedding model tokens
+        deduplicator: Corpus-wide chunk index to skip duplicate chunks with
+        
+    Returns:
+        Per-stage throughput and queue-depth counters from StagedPipeline.stats()
+    """
+    queue_size = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+    default_parse_workers = parse_pool.max_workers if parse_pool is not None else (os.cpu_count() or 1)
+
+    def on_error(stage_name: str, job: IngestionJob, error: Exception) -> None:
+        logger.error(f"Error processing file {job.file_name} in stage {stage_name}: {str(error)}")
+        get_metrics().increment("documents_failed", job.source)
+        abort_dedup(job)
+        if journal is not None:
+            journal.record_failed(job.file_name, stage_name, str(error))
+        job.release_buffers()
+
+    def journaled(stage_name: str, fn: Callable[[IngestionJob], IngestionJob]) -> Callable[[IngestionJob], IngestionJob]:
+        def run(job: IngestionJob) -> IngestionJob:
+            result = fn(job)
+            record_stage_completion(journal, job, stage_name)
+            return result
+        return run
+
+    def on_complete(job: IngestionJob) -> None:
+        get_metrics().increment("documents_succeeded", job.source)
+        job.release_buffers()
+        logger.info(f"Processing for file {job.file_name} completed successfully "
+                    f"in {time.time() - job.start_time:.2f} seconds.")
+
+    stages = [
+        Stage("download", journaled("download", lambda job: download_document(job, manifest)),
+              workers=int(os.getenv("PIPELINE_DOWNLOAD_WORKERS", "8")), queue_size=queue_size),
+        Stage("parse", journaled("parse", lambda job: parse_document(job, chunk_size, chunk_overlap, parse_pool,
+                                                                    token_counter)),
+              workers=int(os.getenv("PIPELINE_PARSE_WORKERS", str(default_parse_workers))), queue_size=queue_size),
+        Stage("embed", journaled("embed", lambda job: embed_document(job, model, deduplicator)),
+              workers=int(os.getenv("PIPELINE_EMBED_WORKERS", "4")), queue_size=queue_size),
+        Stage("upsert", journaled("upsert", lambda job: upsert_document(job, writer)),
+              workers=int(os.getenv("PIPELINE_UPSERT_WORKERS", "4")), queue_size=queue_size),
+        Stage("store", journaled("store", lambda job: store_document_text(job, chunk_size, chunk_overlap, model, manifest)),
+              workers=int(os.getenv("PIPELINE_STORE_WORKERS", "2")), queue_size=queue_size),
+    ]
+
+    # On IngestionPreempted the pipeline is cancelled instead of drained, leaving queued files to the next run
+    with StagedPipeline(stages, on_error=on_error, on_complete=on_complete) as pipeline:
+        for blob, content_hash in pending_blobs:
+            if journal is not None:
+                journal.start_file(blob.name)
+            pipeline.submit(IngestionJob(bucket_name, blob.name, content_hash))
+
+    stats = pipeline.stats()
+    for name, stage_stats in stats["stages"].items():
+        logger.info(f"Stage {name}: {stage_stats['processed']} processed, {stage_stats['failed']} failed, "
+                    f"{stage_stats['items_per_sec']:.2f} items/sec, utilization {stage_stats['utilization']:.0%}, "
+                    f"max queue depth {stage_stats['max_queue_depth']}")
+    return stats
+
+def recover_from_journal(journal: RunJournal, manifest: IngestionManifest,
+                         deduplicator: Optional[ChunkDeduplicator] = None) -> None:
+    """
+    Bring the manifest up to date with a journal left behind by an interrupted run.
+    
+    Files that finished are recorded in the manifest so they are not
+    processed again, and vectors upserted by attempts that failed or were
+    interrupted are deleted, since the next attempt writes new ones.
+    
+    Args:
+        journal: The loaded run journal
+        manifest: The loaded ingestion manifest
+        deduplicator: The loaded dedup index; vectors another file shares are kept
+    """
+    recovered = 0
+    for name, entry in journal.completed_entries().items():
+        if entry["fingerprint"] is None or entry["content_hash"] is None:
+            continue
+        current = manifest.get(name)
+        if current is None or current.get("fingerprint") != entry["fingerprint"]:
+            manifest.record(name, entry["fingerprint"], entry["content_hash"], entry["vector_ids"])
+            recovered += 1
+    if recovered:
+        logger.info(f"Recovered {recovered} finished file(s) from the run journal")
+
+    for name, vector_ids in journal.orphaned_vector_ids().items():
+        try:
+            if deduplicator is not None:
+                vector_ids = deduplicator.release(name, vector_ids)
+            if vector_ids:
+                get_pinecone_index().delete(ids=vector_ids)
+            journal.record_stage(name, "cleanup", vector_ids=[])
+            logger.info(f"Deleted {len(vector_ids)} vector(s) left by an unfinished attempt at {name}")
+        except Exception as e:
+            logger.error(f"Failed to delete vectors left by an unfinished attempt at {name}: {str(e)}")
+
+class IngestionPreempted(BaseException):
+    """
+    Raised in the main thread when the container is asked to stop, to stop the run.
+    
+    A BaseException like KeyboardInterrupt, so the handlers that log a
+    file's error and carry on do not catch it.
+    """
+
+class PreemptionHandler:
+    """
+    SIGTERM handler that stops the run, so main() can checkpoint it and exit.
+    
+    A signal handler runs in the main thread between two bytecodes, possibly
+    while main() holds the lock of the manifest, journal or dedup index, so
+    the handler takes no locks: the first SIGTERM raises IngestionPreempted
+    out of whatever main() is waiting on, and main()'s finally block saves
+    progress. restore() then hands the signal to the previous handler, which
+    terminates the process.
+    """
+    def __init__(self):
+        self.previous = signal.getsignal(signal.SIGTERM) or signal.SIG_DFL
+        self.requested = False
+        # Cleared once main() is checkpointing, so a SIGTERM then only records the request
+        self.armed = True
+
+    def _on_sigterm(self, signum: int, frame: Any) -> None:
+        self.requested = True
+        if self.armed:
+            self.armed = False
+            raise IngestionPreempted()
+
+    def restore(self) -> None:
+        """Reinstall the previous SIGTERM handler and pass it a SIGTERM received during the run."""
+        self.armed = False
+        signal.signal(signal.SIGTERM, self.previous)
+        if not self.requested:
+            return
+        if callable(self.previous):
+            self.previous(signal.SIGTERM, None)
+        else:
+            os.kill(os.getpid(), signal.SIGTERM)
+
+def install_preemption_checkpoint() -> Optional[PreemptionHandler]:
+    """
+    Stop the run and checkpoint it when the container is asked to stop.
+    
+    Cloud Run and Kubernetes send SIGTERM before killing a preempted
+    container. Files that have not started are not started, main() does not
+    wait for the ones in flight, and its finally block saves the manifest,
+    dedup index and journal before the previous handler terminates the
+    process. Signal handlers can only be installed from the main thread, so
+    nothing is installed when main() runs in a request thread.
+    
+    Returns:
+        The installed handler, to restore once the run ends, or None if no
+        handler was installed
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return None
+    handler = PreemptionHandler()
+    signal.signal(signal.SIGTERM, handler._on_sigterm)
+    return handler
 
 def main(bucket_name=None, file_name=None, chunk_size=None, chunk_overlap=None, model=None) -> None:
     """
@@ -257,8 +960,38 @@ def main(bucket_name=None, file_name=None, chunk_size=None, chunk_overlap=None,
     4. Lists PDF files in the source bucket
     5. Processes each PDF file in parallel using ThreadPoolExecutor
     6. Logs processing time and results
+    
+    Blobs whose content hash and hyperparameters match the ingestion manifest
+    are skipped before download. Set INGESTION_FULL_REBUILD=1 to reprocess all.
+    
+    With INGESTION_EXECUTION_MODE=process, PDF parsing and chunking run in a
+    process pool sized to the available cores, while download, embedding and
+    upload stay on the ingestion threads.
+    
+    With INGESTION_PIPELINE=staged, files flow through a StagedPipeline with
+    separate workers and bounded queues per stage (see run_staged_pipeline).
+    
+    Vectors are written at the embedding model's native dimension to the
+    index configured for the model (see index_config.py); the run stops if
+    the index has another dimension. Set PINECONE_CREATE_INDEX=1 to create
+    a missing index.
+    
+    Per-stage latencies and counters are logged at the end of the run and,
+    if INGESTION_METRICS_REPORT is set, written there as a JSON run report.
+    
+    Every file's stage completions are recorded in a RunJournal. A restarted
+    run replays files that finished before the interruption into the
+    manifest (so they are skipped), deletes vectors left behind by attempts
+    that did not finish, and processes the rest. Set
+    INGESTION_RETRY_FAILED=1 to process only the files whose last attempt
+    failed, or pass file_name to process a single file.
+    
+    With CHUNK_DEDUP=1 (the default), chunks are deduplicated across the
+    corpus against a ChunkDeduplicator index saved next to the manifest, so
+    boilerplate shared by many files is embedded once.
     """
     start_time: float = time.time() 
+    get_metrics().reset()
         
     # Get chunking parameters from environment variables (HYPERPARAMETERS)
     chunk_size = int(os.getenv("CHUNK_SIZE", "256"))
@@ -266,42 +999,193 @@ def main(bucket_name=None, file_name=None, chunk_size=None, chunk_overlap=None,
     
     logger.info(f"Using chunk size: {chunk_size} with overlap: {chunk_overlap}")
     
-    # Create the embedding model (HYPERPARAMETER)
-    model = all_minilm_l6_v2()
+    # Use the process's shared embedding model (HYPERPARAMETER), unless a model instance was passed in
+    if model is None or isinstance(model, str):
+        model = get_model_registry().get()
     
     logger.info(f"Using embedding model: {model.get_model_name()} with target dimension: {model.target_dimension}")
+    # Measure chunks in the model's tokens so none is truncated when embedded (CHUNK_BUDGET)
+    token_counter = get_token_counter(model)
+    if token_counter is not None:
+        logger.info(f"Budgeting chunks at {token_counter.budget(chunk_size)} {model.get_model_name()} tokens")
+    
+    # Vectors are stored at the model's native dimension, in the index configured for the model
+    index_config = get_index_config(model)
+    select_pinecone_index(index_config.name)
+    if os.getenv("PINECONE_CREATE_INDEX", "0") == "1" and not create_pinecone_index(index_config):
+        logger.error("Failed to create the Pinecone index. Exiting.")
+        return
+    if not validate_index_dimension(get_pinecone_index(), index_config):
+        logger.error("Pinecone index dimension does not match the embedding model. Exiting.")
+        return
+    logger.info(f"Using Pinecone index {index_config.name} with dimension {index_config.dimension}")
     
     # Initialize PostgreSQL database
+    from src.data_pipeline.db import initialize_db
     if not initialize_db():
         logger.error("Failed to initialize PostgreSQL database. Exiting.")
         return
+    logger.info("Connected to PostgreSQL successfully.")
     
     bucket_name = os.getenv('BUCKET_NAME', '')
-    client = storage.Client()
+    if not check_bucket_access(bucket_name):
+        logger.error("Failed to access GCS bucket. Exiting.")
+        return
+    client = get_storage_client()
     bucket = client.get_bucket(bucket_name)
-    blobs = bucket.list_blobs(prefix="structured_data/")
+    blobs = list(bucket.list_blobs(prefix="structured_data/"))
 
     ## TODO: Use the given parameters to pass here to the process_pdf_and_upload function
 
-    with ThreadPoolExecutor(max_workers=5) as executor:  
-        futures = [executor.submit(
-            process_pdf_and_upload, 
-            bucket_name, 
-            blob.name, 
-            chunk_size, 
-            chunk_overlap,
-            model
-        ) for blob in blobs]
-        for future in as_completed(futures):
-            try:
-                future.result()
-            except Exception as e:
-                logger.error(f"Error in processing: {str(e)}")
+    # Skip blobs that were already ingested with the same content and hyperparameters
+    manifest = IngestionManifest(bucket=bucket).load()
+    journal = RunJournal(bucket=bucket).load()
+    deduplicator = ChunkDeduplicator(bucket=bucket).load() if dedup_enabled() else None
+    recover_from_journal(journal, manifest, deduplicator)
+
+    candidates = blobs
+    if file_name:
+        candidates = [blob for blob in blobs if blob.name == file_name]
+        logger.info(f"Processing only {file_name}")
+    elif os.getenv("INGESTION_RETRY_FAILED", "0") == "1":
+        failed = set(journal.failed_files())
+        candidates = [blob for blob in blobs if blob.name in failed]
+        logger.info(f"Retrying {len(candidates)} file(s) that failed in a previous run")
+
+    full_rebuild = os.getenv("INGESTION_FULL_REBUILD", "0") == "1"
+    pending_blobs: List[Tuple[Any, Optional[str]]] = []
+    for blob in candidates:
+        content_hash = blob_content_hash(blob)
+        if content_hash is not None and not full_rebuild:
+            fingerprint = compute_fingerprint(content_hash, chunk_size, chunk_overlap, model.get_model_name(),
+                                              get_ingestion_signature())
+            if manifest.is_unchanged(blob.name, fingerprint):
+                continue
+        pending_blobs.append((blob, content_hash))
+    logger.info(f"{len(pending_blobs)} of {len(candidates)} file(s) are new or changed and will be processed")
+
+    # Remove vectors of documents that were deleted from the bucket
+    removed = manifest.forget_missing(blob.name for blob in blobs)
+    stale_ids = []
+    for name, entry in removed.items():
+        vector_ids = entry.get("vector_ids", [])
+        # Keep canonical vectors that files still in the bucket share
+        stale_ids.extend(deduplicator.release(name, vector_ids) if deduplicator is not None else vector_ids)
+    if stale_ids:
+        get_pinecone_index().delete(ids=stale_ids)
+        logger.info(f"Deleted {len(stale_ids)} vector(s) of {len(removed)} removed file(s)")
+
+    # One index handle and one batched writer shared by all worker threads
+    writer = BatchedVectorWriter(get_pinecone_index())
+
+    # Spread encode calls over pinned worker processes. The pool batches each call itself and serves
+    # concurrent callers in parallel, which the batcher's single encode thread would serialize.
+    embed_pool: Optional[EmbeddingPool] = None
+    if os.getenv("EMBEDDING_POOL", "0") == "1":
+        embed_pool = EmbeddingPool(model)
+        model = embed_pool
+
+    # Share one batcher across workers so chunks from different documents are encoded together
+    batcher: Optional[EmbeddingBatcher] = None
+    if embed_pool is None and os.getenv("EMBEDDING_BATCHER", "1") == "1":
+        batcher = EmbeddingBatcher(model)
+        model = batcher
+
+    # Serve texts embedded in earlier runs from the on-disk cache; only misses reach the batcher
+    cached_model: Optional[CachedEmbeddingModel] = None
+    cache_dir = os.getenv("EMBED_CACHE_DIR", "")
+    if cache_dir:
+        cached_model = CachedEmbeddingModel(
+            model, EmbeddingCache(cache_dir, model.get_model_name(), model.target_dimension))
+        model = cached_model
+
+    execution_mode = os.getenv("INGESTION_EXECUTION_MODE", "thread")
+    parse_pool = ParsePool() if execution_mode == "process" else None
+    logger.info(f"Using execution mode: {execution_mode}")
+    # Keep enough ingestion threads in flight to saturate the parse workers
+    max_threads = max(5, parse_pool.max_workers) if parse_pool is not None else 5
+
+    pipeline_stats: Optional[Dict[str, Any]] = None
+    preemption = install_preemption_checkpoint()
+    try:
+        if os.getenv("INGESTION_PIPELINE", "file") == "staged":
+            with writer:
+                pipeline_stats = run_staged_pipeline(bucket_name, pending_blobs, chunk_size, chunk_overlap,
+                                    model, writer, manifest=manifest, parse_pool=parse_pool,
+                                    journal=journal, token_counter=token_counter,
+                                    deduplicator=deduplicator)
+        else:
+            with writer:
+                executor = ThreadPoolExecutor(max_workers=max_threads)
+                preempted = False
+                try:
+                    futures = [executor.submit(
+                        process_pdf_and_upload, 
+                        bucket_name, 
+                        blob.name, 
+                        chunk_size, 
+                        chunk_overlap,
+                        model,
+                        writer=writer,
+                        manifest=manifest,
+                        content_hash=content_hash,
+                        parse_pool=parse_pool,
+                        journal=journal,
+                        token_counter=token_counter,
+                        deduplicator=deduplicator
+                    ) for blob, content_hash in pending_blobs]
+                    for future in as_completed(futures):
+                        try:
+                            future.result()
+                        except Exception as e:
+                            logger.error(f"Error in processing: {str(e)}")
+                except IngestionPreempted:
+                    preempted = True
+                    raise
+                finally:
+                    # When preempted, files not started yet are left to the next run and the
+                    # checkpoint does not wait for the ones in flight
+                    executor.shutdown(wait=not preempted, cancel_futures=preempted)
+    except IngestionPreempted:
+        logger.warning("Received SIGTERM, stopping the run and checkpointing run journal and manifest")
+    finally:
+        if preemption is not None:
+            preemption.armed = False
+        if parse_pool is not None:
+            parse_pool.close()
+        if batcher is not None:
+            batcher.close()
+        if embed_pool is not None:
+            embed_pool.close()
+        if cached_model is not None:
+            cached_model.close()
+        if deduplicator is not None:
+            deduplicator.save()
+        # Finished files live in the saved manifest, so the journal only needs to keep the rest
+        if manifest.save():
+            journal.compact()
+        journal.close()
+        if preemption is not None:
+            preemption.restore()
+    failed_files = journal.failed_files()
+    if failed_files:
+        logger.warning(f"{len(failed_files)} file(s) failed; rerun with INGESTION_RETRY_FAILED=1 to retry them")
 
     end_time: float = time.time() 
     total_time: float = end_time - start_time  
     logger.info(f"Total time taken for the entire process: {total_time:.2f} seconds")
 
+    metrics = get_metrics()
+    metrics.log_summary()
+    report_path = os.getenv("INGESTION_METRICS_REPORT", "")
+    if report_path:
+        metrics.write_report(report_path, extra={
+            "files_listed": len(blobs),
+            "files_pending": len(pending_blobs),
+            "total_seconds": total_time,
+            "pipeline": pipeline_stats,
+        })
+
 # Entry point for docker container
 if __name__ == "__main__":
     main()
\ No newline at end of file
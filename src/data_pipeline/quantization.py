@@ -0,0 +1,436 @@
+"""
+Quantized local vector index for the TeacherBot data pipeline.
+
+QuantizedVectorIndex keeps a compact code per vector in memory for the first
+search pass, and the float32 originals in a memory-mapped file on disk that
+is read only to rescore candidates:
+
+- int8: every dimension is scaled to 256 levels between its minimum and
+  maximum over the indexed vectors (1 byte per dimension, 4x smaller than
+  float32). Queries are scored against the codes in float32 (asymmetric
+  distance), so only the stored side loses precision.
+- binary: every dimension is reduced to the sign of its deviation from the
+  mean over the indexed vectors (1 bit per dimension, 32x smaller) and
+  candidates are ranked by Hamming distance to the query's bits.
+
+The first pass keeps top_k * rescore_factor candidates, which are rescored
+exactly with the float32 originals; a rescore_factor of 0 returns the
+first-pass ranking with its approximate scores. Recall and latency of each
+setting on our corpus are measured by benchmarks/quantization.py.
+
+The query(), fetch(), list(), upsert() and delete() methods accept and
+return the same shapes as a Pinecone index. With VECTOR_STORE=local the
+pipeline (get_pinecone_index) and retrieval (rag/retrieval.py) use
+open_local_index() in place of Pinecone, one index per name under
+VECTOR_INDEX_DIR, so ingestion and search run without a Pinecone account.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from src.data_pipeline.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+QUANTIZATION_MODES = ("none", "int8", "binary")
+DEFAULT_RESCORE_FACTOR = 4
+# Rows of int8 codes converted to float32 at a time while scoring; small enough to stay in cache
+_SCORE_BLOCK = 512
+# Rows of originals quantized at a time when the codes are rebuilt
+_BUILD_BLOCK = 16384
+# Rows the originals file starts with; it doubles when full
+_INITIAL_CAPACITY = 1024
+# IDs per SQLite IN (...) query
+_LOOKUP_CHUNK = 500
+
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    """Number of set bits in every element."""
+    bitwise_count = getattr(np, "bitwise_count", None)
+    if bitwise_count is not None:
+        return bitwise_count(values)
+    # numpy < 2.0: unpack the bytes of every element
+    as_bytes = values.view(np.uint8).reshape(values.shape + (-1,))
+    return np.unpackbits(as_bytes, axis=-1).sum(axis=-1, dtype=np.uint8)
+
+
+class ScalarQuantizer:
+    """Per-dimension 8-bit scalar quantization, fitted on the vectors it encodes."""
+    def __init__(self, vectors: np.ndarray):
+        """
+        Args:
+            vectors: float32 array of shape (count, dimension) to fit the ranges on
+        """
+        self.low = vectors.min(axis=0)
+        span = vectors.max(axis=0) - self.low
+        self.scale = np.where(span > 0, span / 255.0, 1.0).astype(np.float32)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Quantize float32 vectors to uint8 codes."""
+        return np.clip(np.rint((vectors - self.low) / self.scale), 0, 255).astype(np.uint8)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Dot products of a float32 query with the dequantized codes."""
+        scaled = query * self.scale
+        offset = float(query @ self.low)
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), _SCORE_BLOCK):
+            block = codes[start:start + _SCORE_BLOCK]
+            scores[start:start + len(block)] = block.astype(np.float32) @ scaled + offset
+        return scores
+
+
+class BinaryQuantizer:
+    """Sign-of-deviation binary quantization, centred on the mean of the vectors it encodes."""
+    def __init__(self, vectors: np.ndarray):
+        """
+        Args:
+            vectors: float32 array of shape (count, dimension) to compute the mean on
+        """
+        # Embeddings with mostly non-negative dimensions would otherwise share most of their bits
+        self.mean = vectors.mean(axis=0)
+        self.dimension = vectors.shape[1]
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Quantize float32 vectors to bits packed into uint8 codes."""
+        return np.packbits(vectors > self.mean, axis=-1)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Similarity from the Hamming distance: the number of matching bits minus the differing ones."""
+        bits = self.encode(query)
+        if codes.shape[1] % 8 == 0:
+            # XOR and count eight bytes at a time
+            codes, bits = codes.view(np.uint64), bits.view(np.uint64)
+        distances = _popcount(codes ^ bits).sum(axis=1, dtype=np.int32)
+        return (self.dimension - 2 * distances).astype(np.float32)
+
+
+class QuantizedVectorIndex:
+    """
+    Disk-backed vector index searching in-memory quantized codes and rescoring with float32.
+
+    Only the first-pass codes and the vector IDs are held in memory. The
+    float32 originals live in a memory-mapped file that is read while fitting
+    the codes and, afterwards, only for the rescored candidates; metadata
+    lives in SQLite and is read only for returned matches. Codes are rebuilt
+    on the first query after vectors were added or removed, so the quantizer
+    always fits the vectors in the index.
+
+    Given a directory the index persists there and reopens with its vectors
+    (VECTOR_STORE=local keeps one per index name under VECTOR_INDEX_DIR);
+    without one it uses a temporary directory removed by close(). Vectors are
+    written to the file and flushed before their IDs are committed to SQLite,
+    as in the embedding cache. Like the cache, a directory is meant for one
+    process at a time; ingestion only writes from the main process.
+    """
+    def __init__(self, dimension: Optional[int] = None, quantization: Optional[str] = None,
+                 rescore_factor: Optional[int] = None, metric: str = "cosine", directory: Optional[str] = None):
+        """
+        Args:
+            dimension: Vector dimension (default: the stored dimension, or that of the first vectors added)
+            quantization: 'none', 'int8' or 'binary' (default: VECTOR_QUANTIZATION)
+            rescore_factor: Candidates rescored per result (default: VECTOR_RESCORE_FACTOR)
+            metric: 'cosine' (vectors and queries are normalized) or 'dotproduct'
+            directory: Directory to persist the index in (default: a temporary directory)
+        """
+        self.quantization = quantization or os.getenv("VECTOR_QUANTIZATION", "int8")
+        if self.quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown vector quantization {self.quantization!r}; "
+                             f"expected one of {', '.join(QUANTIZATION_MODES)}")
+        if rescore_factor is None:
+            rescore_factor = int(os.getenv("VECTOR_RESCORE_FACTOR", DEFAULT_RESCORE_FACTOR))
+        self.rescore_factor = rescore_factor
+        self.metric = metric
+        self._temporary = directory is None
+        self.directory = tempfile.mkdtemp(prefix="vector-index-") if directory is None else directory
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._codes: Optional[np.ndarray] = None
+        self._quantizer: Any = None
+
+        self._conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (id TEXT PRIMARY KEY, position INTEGER NOT NULL, "
+                           "metadata TEXT NOT NULL)")
+        row = self._conn.execute("SELECT value FROM settings WHERE key = 'dimension'").fetchone()
+        stored = int(row[0]) if row else None
+        if stored is not None and dimension is not None and stored != dimension:
+            raise ValueError(f"Index in {self.directory} has dimension {stored}, not {dimension}")
+        self.dimension = stored or dimension
+        # Position of every vector in the originals file
+        self._ids: List[str] = [vector_id for (vector_id,) in
+                                self._conn.execute("SELECT id FROM vectors ORDER BY position")]
+        self._positions: Dict[str, int] = {vector_id: position for position, vector_id in enumerate(self._ids)}
+        self._vectors: Optional[np.memmap] = None
+        if self.dimension is not None:
+            self._open_vectors(max(len(self._ids), _INITIAL_CAPACITY))
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _open_vectors(self, capacity: int) -> None:
+        """Map the originals file with room for capacity vectors, growing it if needed."""
+        path = os.path.join(self.directory, "vectors.f32")
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        size = capacity * self.dimension * 4
+        if not os.path.exists(path) or os.path.getsize(path) < size:
+            with open(path, "ab") as f:
+                f.truncate(size)
+        rows = os.path.getsize(path) // (self.dimension * 4)
+        self._vectors = np.memmap(path, dtype=np.float32, mode="r+", shape=(rows, self.dimension))
+
+    def _prepare(self, vectors: Any) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if self.dimension is not None and vectors.shape[1] != self.dimension:
+            raise ValueError(f"Vector dimension {vectors.shape[1]} does not match index dimension {self.dimension}")
+        if self.metric == "cosine":
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms > 0, norms, 1.0)
+        return vectors
+
+    def add(self, ids: List[str], vectors: Any, metadata: Optional[List[Dict[str, Any]]] = None) -> None:
+        """
+        Add or replace vectors.
+
+        Args:
+            ids: Vector IDs
+            vectors: Array-like of shape (len(ids), dimension)
+            metadata: Metadata per vector
+        """
+        if not ids:
+            return
+        vectors = self._prepare(vectors)
+        metadata = metadata or [{} for _ in ids]
+        # The last occurrence of a repeated ID wins, as with repeated upserts
+        latest = {vector_id: (row, meta) for row, (vector_id, meta) in enumerate(zip(ids, metadata))}
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+                self._conn.execute("INSERT OR REPLACE INTO settings VALUES ('dimension', ?)", (str(self.dimension),))
+                self._open_vectors(_INITIAL_CAPACITY)
+            positions = []
+            appended = []
+            for vector_id in latest:
+                position = self._positions.get(vector_id)
+                if position is None:
+                    position = len(self._ids) + len(appended)
+                    appended.append(vector_id)
+                positions.append(position)
+            needed = len(self._ids) + len(appended)
+            if needed > len(self._vectors):
+                # Double the file, so growing is amortized
+                self._open_vectors(max(needed, 2 * len(self._vectors)))
+            self._vectors[positions] = vectors[[row for row, _ in latest.values()]]
+            self._vectors.flush()
+            self._conn.executemany("INSERT OR REPLACE INTO vectors (id, position, metadata) VALUES (?, ?, ?)",
+                                   [(vector_id, position, json.dumps(meta))
+                                    for (vector_id, (_, meta)), position in zip(latest.items(), positions)])
+            self._conn.commit()
+            for vector_id in appended:
+                self._positions[vector_id] = len(self._ids)
+                self._ids.append(vector_id)
+            self._codes = None
+
+    def remove(self, ids: List[str]) -> None:
+        """
+        Remove vectors by ID.
+
+        The last vector is moved into the position of each removed one, so
+        the originals stay contiguous without rewriting the file.
+
+        Args:
+            ids: Vector IDs; unknown IDs are ignored
+        """
+        with self._lock:
+            drop = sorted({self._positions[i] for i in ids if i in self._positions}, reverse=True)
+            if not drop:
+                return
+            self._conn.executemany("DELETE FROM vectors WHERE id = ?", [(self._ids[position],) for position in drop])
+            # Highest positions first, so the last vector is never one still to be removed
+            for position in drop:
+                del self._positions[self._ids[position]]
+                last = len(self._ids) - 1
+                if position != last:
+                    moved = self._ids[last]
+                    self._vectors[position] = self._vectors[last]
+                    self._ids[position] = moved
+                    self._positions[moved] = position
+                    self._conn.execute("UPDATE vectors SET position = ? WHERE id = ?", (position, moved))
+                self._ids.pop()
+            self._vectors.flush()
+            self._conn.commit()
+            self._codes = None
+
+    def _build(self) -> None:
+        if self._codes is not None:
+            return
+        originals = self._vectors[:len(self._ids)]
+        if self.quantization == "int8":
+            self._quantizer = ScalarQuantizer(originals)
+        elif self.quantization == "binary":
+            self._quantizer = BinaryQuantizer(originals)
+        else:
+            self._quantizer = None
+            self._codes = originals
+            return
+        # Encoded a block at a time, so fitting never holds a float32 copy of the originals
+        self._codes = np.concatenate([self._quantizer.encode(np.asarray(originals[start:start + _BUILD_BLOCK]))
+                                      for start in range(0, len(originals), _BUILD_BLOCK)])
+
+    def search(self, vector: Any, top_k: int, rescore_factor: Optional[int] = None) -> List[tuple]:
+        """
+        Find the vectors most similar to a query.
+
+        Args:
+            vector: Query vector
+            top_k: Number of results
+            rescore_factor: Override of the index's rescore factor
+
+        Returns:
+            (ID, score) pairs in decreasing order of score
+        """
+        query = self._prepare(vector)[0]
+        rescore_factor = self.rescore_factor if rescore_factor is None else rescore_factor
+        with self._lock:
+            if not self._ids or top_k <= 0:
+                return []
+            self._build()
+            if self._quantizer is None:
+                scores = self._codes @ query
+                candidates = self._top(scores, top_k)
+            else:
+                approximate = self._quantizer.scores(self._codes, query)
+                if rescore_factor <= 0:
+                    candidates = self._top(approximate, top_k)
+                    scores = approximate
+                else:
+                    candidates = self._top(approximate, top_k * rescore_factor)
+                    scores = np.zeros(len(self._ids), dtype=np.float32)
+                    # Read the candidates' originals in file order
+                    ordered = np.sort(candidates)
+                    scores[ordered] = self._vectors[ordered] @ query
+                    candidates = candidates[self._top(scores[candidates], top_k)]
+            return [(self._ids[position], float(scores[position])) for position in candidates]
+
+    @staticmethod
+    def _top(scores: np.ndarray, count: int) -> np.ndarray:
+        """Positions of the count highest scores, highest first."""
+        if count < len(scores):
+            positions = np.argpartition(-scores, count - 1)[:count]
+        else:
+            positions = np.arange(len(scores))
+        return positions[np.argsort(-scores[positions], kind="stable")]
+
+    def memory_bytes(self) -> Dict[str, int]:
+        """
+        Size of the index arrays.
+
+        Returns:
+            Bytes of the in-memory first-pass 'codes' (0 without quantization, which scans the
+            originals) and of the float32 'originals' on disk
+        """
+        with self._lock:
+            if not self._ids:
+                return {"codes": 0, "originals": 0}
+            self._build()
+            codes = self._codes.nbytes if self._quantizer is not None else 0
+            return {"codes": codes, "originals": len(self._ids) * self.dimension * 4}
+
+    def _metadata(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Metadata of stored vectors, by ID."""
+        found: Dict[str, Dict[str, Any]] = {}
+        for start in range(0, len(ids), _LOOKUP_CHUNK):
+            chunk = ids[start:start + _LOOKUP_CHUNK]
+            found.update((vector_id, json.loads(metadata)) for vector_id, metadata in self._conn.execute(
+                f"SELECT id, metadata FROM vectors WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+        return found
+
+    def close(self) -> None:
+        """Flush the originals and close the index; a temporary index is deleted."""
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._vectors = None
+            self._codes = None
+            self._conn.close()
+        if self._temporary:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    # Pinecone-compatible methods
+    def upsert(self, vectors: List[Dict[str, Any]], **kwargs) -> Dict[str, int]:
+        """Add vectors given as dictionaries with 'id', 'values' and 'metadata' keys."""
+        self.add([vector["id"] for vector in vectors], [vector["values"] for vector in vectors],
+                 [vector.get("metadata") or {} for vector in vectors])
+        return {"upserted_count": len(vectors)}
+
+    def delete(self, ids: List[str], **kwargs) -> Dict[str, Any]:
+        """Remove vectors by ID."""
+        self.remove(ids)
+        return {}
+
+    def fetch(self, ids: List[str], **kwargs) -> Dict[str, Any]:
+        """Return stored vectors (normalized for the cosine metric) by ID."""
+        with self._lock:
+            stored = [i for i in dict.fromkeys(ids) if i in self._positions]
+            metadata = self._metadata(stored)
+            return {"vectors": {i: {"id": i, "values": self._vectors[self._positions[i]].tolist(),
+                                    "metadata": metadata.get(i, {})} for i in stored}}
+
+    def list(self, prefix: Optional[str] = None, limit: int = 100, **kwargs) -> Iterator[List[str]]:
+        """Page through the stored vector IDs, like Pinecone's list() on serverless indexes."""
+        with self._lock:
+            ids = [i for i in self._ids if prefix is None or i.startswith(prefix)]
+        for start in range(0, len(ids), limit):
+            yield ids[start:start + limit]
+
+    def query(self, vector: Optional[List[float]] = None, top_k: int = 10, include_metadata: bool = False,
+              id: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        """
+        Search by query vector, or by the stored vector of an ID.
+
+        Returns:
+            Dictionary with a 'matches' list of 'id', 'score' (and 'metadata') entries
+        """
+        if vector is None:
+            with self._lock:
+                if id not in self._positions:
+                    return {"matches": []}
+                vector = np.array(self._vectors[self._positions[id]])
+        matches = [{"id": vector_id, "score": score} for vector_id, score in self.search(vector, top_k)]
+        if include_metadata:
+            with self._lock:
+                metadata = self._metadata([match["id"] for match in matches])
+            for match in matches:
+                match["metadata"] = metadata.get(match["id"], {})
+        return {"matches": matches}
+
+    def describe_index_stats(self, **kwargs) -> Dict[str, Any]:
+        """Return the dimension and number of vectors, like Pinecone's response."""
+        return {"dimension": self.dimension, "total_vector_count": len(self)}
+
+
+def open_local_index(index_name: str) -> QuantizedVectorIndex:
+    """
+    Open the persistent local index standing in for a Pinecone index (VECTOR_STORE=local).
+
+    Args:
+        index_name: Pinecone index name; the index lives in VECTOR_INDEX_DIR/<index_name>
+
+    Returns:
+        The local index
+    """
+    directory = os.path.join(os.getenv("VECTOR_INDEX_DIR", "vector_index"), index_name or "default")
+    index = QuantizedVectorIndex(directory=directory, metric=os.getenv("PINECONE_METRIC", "cosine"))
+    logger.info(f"Opened local vector index {directory} with {len(index)} vectors "
+                f"({index.quantization}, rescore x{index.rescore_factor})")
+    return index
@@ -1,21 +1,19 @@
-from sentence_transformers import SentenceTransformer
-
-from retrieval import Retrieval
-from generation import Generation
-from consts import SENTENCE_TRANSFORMER
-
-EMBEDDING_MODEL = SentenceTransformer(model_name_or_path=SENTENCE_TRANSFORMER)
+from src.data_pipeline.embed_models import get_model_registry
+from src.data_pipeline.rag.retrieval import Retrieval
+from src.data_pipeline.rag.generation import Generation
 
 if __name__ == '__main__':
-    
-    retrieval_ob = Retrieval()
+
+    # load the shared embedding model (EMBEDDING_BACKEND) before the first query
+    embedding_model = get_model_registry().get(warm=True)
+    retrieval_ob = Retrieval(embedding_model)
     # gen_ob = Generation()
 
     query = "Can you tell me about this course"
     # convert to embeddings
-    query_embedding = EMBEDDING_MODEL.encode(sentences=query).tolist()
+    query_embedding = embedding_model.encode([query])[0].tolist()
     retrieval_ob.query_db(embeddings=query_embedding)
     print("Retreival result: \n", retrieval_ob.db_response)
     # send to critic model
-    
-    # gen_ob.generate_response(retrieved_docs=retrieval_ob.db_response, query=query)
\ No newline at end of file
+
+    # gen_ob.generate_response(retrieved_docs=retrieval_ob.db_response, query=query)
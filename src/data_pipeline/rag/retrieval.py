@@ -5,19 +5,33 @@ from pinecone import Pinecone
 
 load_dotenv()
 
-PINECONE_DB = Pinecone(api_key=os.getenv('PINECONE_API_KEY'))
+# no Pinecone client (or API key) needed when retrieving from the local index
+if os.getenv('VECTOR_STORE', 'pinecone') == 'local':
+    PINECONE_DB = None
+else:
+    PINECONE_DB = Pinecone(api_key=os.getenv('PINECONE_API_KEY'))
 
 class Retrieval:
-    def __init__(self) -> None:
+    def __init__(self, embedding_model=None) -> None:
+        # model the query embeddings come from (default: the shared EMBEDDING_BACKEND model)
+        self.embedding_model = embedding_model
         # initialise pinecone index
         self.init_pinecone()
     
     def init_pinecone(self):
         """
-        establish connection with pinecone
+        establish connection with the pinecone index of the embedding model
         """
-        
-        curr_index = os.getenv('PINECONE_INDEX_NAME')
+        from src.data_pipeline.embed_models import get_model_registry
+        from src.data_pipeline.index_config import get_index_config
+
+        # the index ingestion writes to: PINECONE_INDEX_NAME_<MODEL>, or PINECONE_INDEX_NAME
+        curr_index = get_index_config(self.embedding_model or get_model_registry().get()).name
+        # local quantized index written by ingestion with VECTOR_STORE=local
+        if os.getenv('VECTOR_STORE', 'pinecone') == 'local':
+            from src.data_pipeline.quantization import open_local_index
+            self.pinecone_index = open_local_index(curr_index)
+            return
         # name of all pinecone indexes
         try:
             pinecone_indexes = [index_info.get('name') for index_info in PINECONE_DB.list_indexes()]
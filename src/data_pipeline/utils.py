@@ -7,34 +7,57 @@ Storage operations for file management and data persistence.
 """
 import logging
 import os
+import threading
 import numpy as np
 import json
 import uuid
 import fitz  # pymupdf
 from dotenv import load_dotenv, find_dotenv
-from google.cloud import storage
-from google.auth import impersonated_credentials,default
-from pinecone import Pinecone
-from typing import Dict, List, Any, Optional
-from src.data_pipeline.models import EmbeddingVector, DocumentText
-from src.data_pipeline.db import store_document, document_exists
+from typing import Dict, List, Any, Optional, TYPE_CHECKING
+from src.data_pipeline.models import EmbeddingVector, DocumentText, IndexConfig
 from src.data_pipeline.logger import setup_logger
 
+# Cloud client libraries and the SQLAlchemy-backed db module are imported inside
+# the functions that use them, so importing the pipeline stays fast and never
+# touches the network.
+if TYPE_CHECKING:
+    from google.cloud import storage
+
 # ----------------------------------------------------
 # Utility Functions
 # ----------------------------------------------------
 
 logger = setup_logger(__name__)
 
+_pinecone_index: Optional[Any] = None
+# Name of the index get_pinecone_index() returns, PINECONE_INDEX_NAME unless another was selected
+_pinecone_index_name: Optional[str] = None
+_pinecone_index_lock = threading.Lock()
+_storage_client: Optional["storage.Client"] = None
+_storage_client_lock = threading.Lock()
+
 # ----------------------------------------------------
 # Pinecone Initialization & Upload
 # ----------------------------------------------------
-def initialize_pinecone() -> Any:
+def initialize_pinecone(index_name: Optional[str] = None) -> Any:
     """
     Initializes the Pinecone client using environment variables.
+    
+    With VECTOR_STORE=local the persistent QuantizedVectorIndex of that name
+    is opened instead, and no Pinecone account is needed.
+    
+    Args:
+        index_name: Name of the index to open (default: PINECONE_INDEX_NAME)
     """
+    if index_name is None:
+        index_name = os.getenv('PINECONE_INDEX_NAME', '')
+    if os.getenv('VECTOR_STORE', 'pinecone') == 'local':
+        from src.data_pipeline.quantization import open_local_index
+        return open_local_index(index_name)
+
+    from pinecone import Pinecone
+
     api_key: str = os.getenv('PINECONE_API_KEY', '')
-    index_name: str = os.getenv('PINECONE_INDEX_NAME', '')
     
     logger.info("Initializing Pinecone client.")
     pc = Pinecone(api_key=api_key)
@@ -42,6 +65,72 @@ def initialize_pinecone() -> Any:
     logger.info("Pinecone client initialized successfully.")
     return index
 
+def get_pinecone_index() -> Any:
+    """
+    Returns a process-wide Pinecone index handle, creating it on first use.
+    
+    The Pinecone Index object is thread-safe, so a single handle (and its
+    connection pool) is shared by all ingestion worker threads instead of
+    being re-created for every file.
+    
+    Returns:
+        The shared Pinecone index object
+    """
+    global _pinecone_index
+    if _pinecone_index is None:
+        with _pinecone_index_lock:
+            if _pinecone_index is None:
+                _pinecone_index = initialize_pinecone(_pinecone_index_name)
+    return _pinecone_index
+
+def select_pinecone_index(index_name: str) -> None:
+    """
+    Make get_pinecone_index() return the named index, e.g. the index configured for the embedding model.
+    
+    The shared handle is only replaced if it was opened on another index.
+    
+    Args:
+        index_name: Name of the Pinecone index
+    """
+    global _pinecone_index, _pinecone_index_name
+    with _pinecone_index_lock:
+        current = _pinecone_index_name if _pinecone_index_name is not None else os.getenv('PINECONE_INDEX_NAME', '')
+        if index_name != current:
+            _pinecone_index = None
+        _pinecone_index_name = index_name
+
+def create_pinecone_index(config: IndexConfig) -> bool:
+    """
+    Create a serverless Pinecone index for a configuration, unless it already exists.
+    
+    The cloud and region are read from PINECONE_CLOUD and PINECONE_REGION.
+    A local index (VECTOR_STORE=local) is created on first use, so there is
+    nothing to create.
+    
+    Args:
+        config: Index name, dimension and metric
+        
+    Returns:
+        True if the index exists or was created, False otherwise
+    """
+    if os.getenv('VECTOR_STORE', 'pinecone') == 'local':
+        return True
+    try:
+        from pinecone import Pinecone, ServerlessSpec
+
+        pc = Pinecone(api_key=os.getenv('PINECONE_API_KEY', ''))
+        if pc.has_index(config.name):
+            return True
+        logger.info(f"Creating Pinecone index {config.name} with dimension {config.dimension} "
+                    f"and metric {config.metric}")
+        pc.create_index(name=config.name, dimension=config.dimension, metric=config.metric,
+                        spec=ServerlessSpec(cloud=os.getenv('PINECONE_CLOUD', 'aws'),
+                                            region=os.getenv('PINECONE_REGION', 'us-east-1')))
+        return True
+    except Exception as e:
+        logger.error(f"Failed to create Pinecone index {config.name}: {str(e)}")
+        return False
+
 def upload_pinecone(index: Any, embedding_vector: EmbeddingVector) -> None:
     """
     Uploads an embedding vector to the Pinecone index.
@@ -69,7 +158,25 @@ def upload_pinecone(index: Any, embedding_vector: EmbeddingVector) -> None:
 # ----------------------------------------------------
 # Google Cloud Storage Initialization & Operations
 # ----------------------------------------------------
-def initialize_gcp_client() -> storage.Client:
+def get_storage_client() -> "storage.Client":
+    """
+    Returns a process-wide Google Cloud Storage client, creating it on first use.
+    
+    The client is created lazily so that importing the pipeline does not
+    require credentials or network access, and is shared by all threads.
+    
+    Returns:
+        The shared Google Cloud Storage client
+    """
+    global _storage_client
+    if _storage_client is None:
+        with _storage_client_lock:
+            if _storage_client is None:
+                from google.cloud import storage
+                _storage_client = storage.Client()
+    return _storage_client
+
+def initialize_gcp_client() -> "storage.Client":
     """
     Initializes the Google Cloud Storage client.
     
@@ -79,6 +186,9 @@ def initialize_gcp_client() -> storage.Client:
     Returns:
         A configured Google Cloud Storage client
     """
+    from google.auth import impersonated_credentials, default
+    from google.cloud import storage
+
     logger.info("Initializing Google Cloud Storage client.")
     
     source_credentials,_ = default()
@@ -91,7 +201,7 @@ def initialize_gcp_client() -> storage.Client:
     logger.info("Google Cloud Storage client initialized successfully.")
     return client
 
-def list_files_in_bucket(bucket_name: str) -> List[storage.Blob]:
+def list_files_in_bucket(bucket_name: str) -> List["storage.Blob"]:
     """
     Lists all files in the specified GCP bucket.
     
@@ -106,7 +216,7 @@ def list_files_in_bucket(bucket_name: str) -> List[storage.Blob]:
     bucket = client.get_bucket(bucket_name)
     blobs = bucket.list_blobs() 
     
-    blob_list: List[storage.Blob] = []
+    blob_list: List["storage.Blob"] = []
     for blob in blobs:
         logger.info(f"Found file: {blob.name} (Size: {blob.size} bytes)")
         blob_list.append(blob)
@@ -125,7 +235,7 @@ def upload_json_to_gcs(bucket_name: str, blob_name: str, data: Any) -> None:
         blob_name: The destination path/name in the bucket
         data: The Python object to serialize and upload as JSON
     """
-    client = storage.Client()
+    client = get_storage_client()
     bucket = client.get_bucket(bucket_name)
     
     json_data = json.dumps(data)
@@ -137,32 +247,40 @@ def upload_json_to_gcs(bucket_name: str, blob_name: str, data: Any) -> None:
 # ----------------------------------------------------
 # PostgreSQL Document Operations
 # ----------------------------------------------------
-def store_raw_text_in_postgres(file_name: str, pdf_data: bytes) -> bool:
+def store_raw_text_in_postgres(file_name: str, pdf_data: bytes, replace: bool = False,
+                               raw_text: Optional[str] = None) -> bool:
     """
     Extract raw text from PDF and store it in PostgreSQL.
     
     Args:
         file_name: The name of the PDF file
         pdf_data: The raw PDF data as bytes
+        replace: If True, replace any stored text for this file (used when the
+            source document has changed) instead of keeping the existing copy
+        raw_text: Page-delimited text already extracted by parse_pdf_document.
+            If not provided, the PDF is decoded again to extract it.
         
     Returns:
         True if storage successful, False otherwise
     """
+    from src.data_pipeline.db import store_document, document_exists, delete_documents
+
     try:
+        if replace:
+            if not delete_documents(file_name):
+                return False
         # Check if document already exists
-        if document_exists(file_name):
+        elif document_exists(file_name):
             logger.info(f"Document {file_name} already exists in PostgreSQL database")
             return True
         
-        # Extract raw text from PDF
-        raw_text = extract_raw_text_from_pdf(pdf_data)
+        # Extract raw text from PDF unless the caller already decoded it
+        if raw_text is None:
+            raw_text = extract_raw_text_from_pdf(pdf_data)
         
         # Get document title from filename
         title = os.path.splitext(os.path.basename(file_name))[0]
         
-        document = fitz.open(stream=pdf_data)
-        document.close()
-        
         # Create document object
         document = DocumentText(
             id=str(uuid.uuid4()),
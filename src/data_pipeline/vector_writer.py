@@ -0,0 +1,270 @@
+"""
+Batched vector upsert writer for the TeacherBot data pipeline.
+
+This module provides a shared writer that groups embedding vectors into
+size- and byte-bounded batches and upserts them to the vector index with
+several batches in flight at once. A single writer (and a single index
+handle) is meant to be shared by all ingestion worker threads.
+
+Vectors are buffered as slices of the callers' EmbeddingBatches; the
+id / values / metadata dictionaries of a request are only built when it is
+sent.
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, List, Optional, Sequence, Tuple, Union
+
+from src.data_pipeline.embedding_batch import EmbeddingBatch
+from src.data_pipeline.logger import setup_logger
+from src.data_pipeline.models import EmbeddingVector
+
+logger = setup_logger(__name__)
+
+# Pinecone rejects upsert requests larger than 2MB and recommends at most
+# 1000 vectors per request.
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_BATCH_BYTES = 2 * 1024 * 1024
+DEFAULT_MAX_IN_FLIGHT = 4
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_LINGER_SECONDS = 0.05
+
+
+class _WriteTicket:
+    """
+    Tracks completion of one write() call whose vectors may be spread
+    across several batches (and share batches with other callers).
+    """
+    def __init__(self, remaining: int):
+        self.future: Future = Future()
+        self._total = remaining
+        self._remaining = remaining
+        self._lock = threading.Lock()
+        if remaining == 0:
+            self.future.set_result(0)
+
+    def done(self, count: int) -> None:
+        with self._lock:
+            if self.future.done():
+                return
+            self._remaining -= count
+            if self._remaining <= 0:
+                self.future.set_result(self._total)
+
+    def fail(self, error: BaseException) -> None:
+        with self._lock:
+            if not self.future.done():
+                self.future.set_exception(error)
+
+
+# Rows of one write() call that are part of a batch, with the ticket of the call
+_Segment = Tuple[EmbeddingBatch, _WriteTicket]
+
+
+class BatchedVectorWriter:
+    """
+    Thread-safe writer that batches vector upserts to a vector index.
+
+    Vectors are buffered until a batch reaches batch_size vectors or
+    max_batch_bytes bytes, then sent on a background thread pool. At most
+    max_in_flight batches are sent concurrently; callers block in write()
+    once that limit is reached, which bounds memory held by the writer.
+    Failed batches are retried with exponential backoff and jitter.
+    A partial batch is sent once it has waited linger seconds, so callers
+    waiting on their write() future never stall on a half-full buffer.
+    """
+    def __init__(self, index: Any, batch_size: Optional[int] = None,
+                 max_batch_bytes: Optional[int] = None, max_in_flight: Optional[int] = None,
+                 max_retries: Optional[int] = None, retry_backoff: float = 0.5,
+                 linger: Optional[float] = None):
+        """
+        Args:
+            index: Vector index exposing upsert(vectors=[...]), e.g. a Pinecone Index
+            batch_size: Maximum number of vectors per upsert request
+            max_batch_bytes: Maximum estimated payload size per upsert request
+            max_in_flight: Maximum number of upsert requests sent concurrently
+            max_retries: Number of retries for a failed batch before giving up
+            retry_backoff: Base delay in seconds for exponential backoff
+            linger: Seconds a partial batch may wait for more vectors before it is sent
+        """
+        self._index = index
+        self._batch_size = batch_size or int(os.getenv("PINECONE_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+        self._max_batch_bytes = max_batch_bytes or int(os.getenv("PINECONE_MAX_BATCH_BYTES", DEFAULT_MAX_BATCH_BYTES))
+        self._max_in_flight = max_in_flight or int(os.getenv("PINECONE_MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT))
+        self._max_retries = max_retries if max_retries is not None else int(os.getenv("PINECONE_MAX_RETRIES", DEFAULT_MAX_RETRIES))
+        self._retry_backoff = retry_backoff
+        self._linger = linger if linger is not None else float(os.getenv("PINECONE_BATCH_LINGER", DEFAULT_LINGER_SECONDS))
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self._max_in_flight)
+        self._executor = ThreadPoolExecutor(max_workers=self._max_in_flight, thread_name_prefix="vector-writer")
+        self._pending: List[_Segment] = []
+        self._pending_count = 0
+        self._pending_bytes = 0
+        self._pending_since = 0.0
+        self._in_flight: List[Future] = []
+        self._closed = False
+        self._linger_wakeup = threading.Condition(self._lock)
+        self._linger_thread = threading.Thread(target=self._linger_loop, name="vector-writer-linger", daemon=True)
+        self._linger_thread.start()
+
+        self.vectors_written = 0
+        self.batches_written = 0
+        self.batches_failed = 0
+        self.retries = 0
+
+    def write(self, embedding_vectors: Union[EmbeddingBatch, Sequence[EmbeddingVector]]) -> Future:
+        """
+        Queue embedding vectors for upsert.
+
+        Args:
+            embedding_vectors: The vectors to upsert, as a batch or a list of EmbeddingVectors
+
+        Returns:
+            A Future that resolves to the number of vectors written once every
+            batch containing these vectors has been upserted, or raises the
+            error of the first batch that failed permanently
+        """
+        if self._closed:
+            raise RuntimeError("Cannot write to a closed BatchedVectorWriter")
+
+        batch = embedding_vectors if isinstance(embedding_vectors, EmbeddingBatch) \
+            else EmbeddingBatch.from_vectors(embedding_vectors)
+        ticket = _WriteTicket(len(batch))
+        sizes = batch.estimate_bytes()
+        ready: List[List[_Segment]] = []
+        with self._lock:
+            # Rows [start, row) are counted in the buffer but not yet added to it as a slice
+            start = 0
+            for row, size in enumerate(sizes):
+                if self._pending_count and (self._pending_count >= self._batch_size
+                                            or self._pending_bytes + size > self._max_batch_bytes):
+                    if row > start:
+                        self._pending.append((batch[start:row], ticket))
+                        start = row
+                    ready.append(self._take_pending())
+                if not self._pending_count:
+                    self._pending_since = time.monotonic()
+                self._pending_count += 1
+                self._pending_bytes += size
+            if start < len(batch):
+                self._pending.append((batch[start:], ticket))
+            if self._pending_count >= self._batch_size:
+                ready.append(self._take_pending())
+
+        for segments in ready:
+            self._submit(segments)
+        return ticket.future
+
+    def flush(self) -> None:
+        """
+        Send any buffered vectors and wait for all in-flight batches to finish.
+        """
+        with self._lock:
+            ready = self._take_pending() if self._pending else None
+        if ready:
+            self._submit(ready)
+
+        with self._lock:
+            in_flight = list(self._in_flight)
+        for future in in_flight:
+            try:
+                future.result()
+            except Exception:
+                # Errors are reported through the write() futures
+                pass
+
+    def close(self) -> None:
+        """
+        Flush remaining vectors and shut down the background senders.
+        """
+        if self._closed:
+            return
+        with self._lock:
+            self._closed = True
+            self._linger_wakeup.notify()
+        self._linger_thread.join()
+        self.flush()
+        self._executor.shutdown(wait=True)
+        logger.info(f"Vector writer closed: {self.vectors_written} vectors in {self.batches_written} batches "
+                    f"({self.batches_failed} failed batches, {self.retries} retries)")
+
+    def __enter__(self) -> "BatchedVectorWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _take_pending(self) -> List[_Segment]:
+        """Detach the current buffer. Must be called with self._lock held."""
+        segments = self._pending
+        self._pending, self._pending_count, self._pending_bytes = [], 0, 0
+        return segments
+
+    def _linger_loop(self) -> None:
+        """Background loop that sends partial batches older than the linger time."""
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                self._linger_wakeup.wait(timeout=self._linger)
+                if self._closed:
+                    return
+                ready = None
+                if self._pending and time.monotonic() - self._pending_since >= self._linger:
+                    ready = self._take_pending()
+            if ready:
+                self._submit(ready)
+
+    def _submit(self, segments: List[_Segment]) -> None:
+        """Send a batch on the pool, blocking while max_in_flight batches are outstanding."""
+        self._slots.acquire()
+        future = self._executor.submit(self._send, segments)
+        with self._lock:
+            self._in_flight.append(future)
+        future.add_done_callback(lambda f: self._on_sent(f, segments))
+
+    def _send(self, segments: List[_Segment]) -> int:
+        """Build the upsert request of a batch and send it, retrying with exponential backoff on failure."""
+        batch = [vector for segment, _ in segments for vector in segment.to_wire()]
+        attempt = 0
+        while True:
+            try:
+                self._index.upsert(vectors=batch)
+                return len(batch)
+            except Exception as e:
+                if attempt >= self._max_retries:
+                    raise
+                delay = self._retry_backoff * (2 ** attempt) * (1 + random.random())
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+                logger.warning(f"Upsert of {len(batch)} vectors failed ({str(e)}), "
+                               f"retry {attempt}/{self._max_retries} in {delay:.2f}s")
+                time.sleep(delay)
+
+    def _on_sent(self, future: Future, segments: List[_Segment]) -> None:
+        """Resolve the tickets covered by a finished batch and free its slot."""
+        self._slots.release()
+        with self._lock:
+            if future in self._in_flight:
+                self._in_flight.remove(future)
+
+        count = sum(len(segment) for segment, _ in segments)
+        error = future.exception()
+        if error is not None:
+            with self._lock:
+                self.batches_failed += 1
+            logger.error(f"Failed to upsert batch of {count} vectors: {str(error)}")
+            for _, ticket in segments:
+                ticket.fail(error)
+            return
+
+        with self._lock:
+            self.vectors_written += count
+            self.batches_written += 1
+        for segment, ticket in segments:
+            ticket.done(len(segment))
+        logger.debug(f"Upserted batch of {count} vectors")
@@ -0,0 +1,139 @@
+"""
+Long-lived query service for the Immigration Law Assistant.
+
+Serves answer_query from src/rag.py over HTTP, so the interpreter start,
+the openai/pinecone imports and the client construction happen once, at
+startup, instead of on every chat message. frontend/server.js proxies
+/api/chat to it over keep-alive connections.
+
+JSON contract:
+    POST /api/query  {"query": "..."}
+        200 {"answer": "...", "latency_ms": 812.4}
+        400 {"error": "No query content provided"}
+        500 {"error": "Failed to process query"}
+        503 {"error": "Query service is starting"}
+    GET /healthz
+        200 {"status": "ok", "warmup_seconds": 1.9}, or 503 {"status": "starting"}
+
+QUERY_ANSWERER selects the answer function as module:function (default
+src.rag:answer_query); a warmup() function in the same module runs at
+startup unless QUERY_SERVICE_WARMUP=0.
+
+Usage:
+    uvicorn --factory src.query_service:create_app --host 0.0.0.0 --port 8000
+    python -m src.query_service --port 8000
+    python -m src.query_service --query "Can I work on an F1 visa in the U.S.?"
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Optional
+
+# Not the data pipeline's logger: importing src.data_pipeline would load the whole ingestion package
+logger = logging.getLogger(__name__)
+
+DEFAULT_ANSWERER = "src.rag:answer_query"
+
+
+def load_answerer(spec: Optional[str] = None) -> Callable[[str], str]:
+    """
+    Import the answer function and warm up its module.
+
+    Args:
+        spec: module:function to import (default: QUERY_ANSWERER, or src.rag:answer_query)
+
+    Returns:
+        The function answering a query string with an answer string
+    """
+    spec = spec or os.getenv("QUERY_ANSWERER", DEFAULT_ANSWERER)
+    module_name, _, function_name = spec.partition(":")
+    module = importlib.import_module(module_name)
+    warmup = getattr(module, "warmup", None)
+    if warmup is not None and os.getenv("QUERY_SERVICE_WARMUP", "1") == "1":
+        warmup()
+    return getattr(module, function_name or "answer_query")
+
+
+def create_app(answerer: Optional[Callable[[str], str]] = None) -> Any:
+    """
+    Create the query service ASGI app.
+
+    Args:
+        answerer: Function answering a query (default: load_answerer() at startup)
+
+    Returns:
+        starlette.applications.Starlette
+    """
+    import anyio.to_thread
+    from starlette.applications import Starlette
+    from starlette.concurrency import run_in_threadpool
+    from starlette.requests import Request
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette) -> AsyncIterator[None]:
+        # answer_query blocks on network calls; QUERY_SERVICE_THREADS bounds the queries in flight
+        threads = int(os.getenv("QUERY_SERVICE_THREADS", "0"))
+        if threads:
+            anyio.to_thread.current_default_thread_limiter().total_tokens = threads
+        start = time.perf_counter()
+        app.state.answer = answerer or await run_in_threadpool(load_answerer)
+        app.state.warmup_seconds = time.perf_counter() - start
+        logger.info(f"Query service ready in {app.state.warmup_seconds:.2f}s")
+        yield
+
+    async def query(request: Request) -> JSONResponse:
+        try:
+            body = await request.json()
+        except ValueError:
+            return JSONResponse({"error": "Request body must be JSON"}, status_code=400)
+        text = body.get("query") if isinstance(body, dict) else None
+        if not isinstance(text, str) or not text.strip():
+            return JSONResponse({"error": "No query content provided"}, status_code=400)
+        answer = getattr(request.app.state, "answer", None)
+        if answer is None:
+            return JSONResponse({"error": "Query service is starting"}, status_code=503)
+        start = time.perf_counter()
+        try:
+            result = await run_in_threadpool(answer, text)
+        except Exception as e:
+            logger.error(f"Error answering query: {str(e)}")
+            return JSONResponse({"error": "Failed to process query"}, status_code=500)
+        return JSONResponse({"answer": result, "latency_ms": (time.perf_counter() - start) * 1000})
+
+    async def healthz(request: Request) -> JSONResponse:
+        if getattr(request.app.state, "answer", None) is None:
+            return JSONResponse({"status": "starting"}, status_code=503)
+        return JSONResponse({"status": "ok", "warmup_seconds": request.app.state.warmup_seconds})
+
+    app = Starlette(routes=[Route("/api/query", query, methods=["POST"]), Route("/healthz", healthz)],
+                    lifespan=lifespan)
+    app.state.answer = None
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("QUERY_SERVICE_PORT", "8000")))
+    parser.add_argument("--query", default=None, help="Answer one query, print the JSON response and exit")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    if args.query is not None:
+        answerer = load_answerer()
+        start = time.perf_counter()
+        answer = answerer(args.query)
+        print(json.dumps({"answer": answer, "latency_ms": (time.perf_counter() - start) * 1000}))
+        return
+    import uvicorn
+    uvicorn.run(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
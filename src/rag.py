@@ -64,9 +64,13 @@ Answer:"""
     )
     return response.choices[0].message.content
 
+# Open the Pinecone connection ahead of the first question (called by src/query_service.py at startup)
+def warmup():
+    index.describe_index_stats()
+
 # Test full pipeline
 if __name__ == "__main__":
-    test_query = "Can I work on an F1 visa in the U.S.?"
+    test_query = os.getenv("TEST_QUERY", "Can I work on an F1 visa in the U.S.?")
     print("User question:", test_query)
     print("Answer from GPT-4o:\n")
     print(answer_query(test_query))